@@ -44,8 +44,10 @@ except ImportError as e:
 # --- Stable-Baselines3 PPO ---
 
 try:
+    import torch
     from stable_baselines3 import PPO
-    from stable_baselines3.common.vec_env import DummyVecEnv
+    from stable_baselines3.common.callbacks import CheckpointCallback
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecEnv
 except ImportError as e:
     raise ImportError(
         "Ce script nécessite stable-baselines3.\n"
@@ -107,7 +109,7 @@ W_BALANCE = 1.5
 TOTAL_TIMESTEPS = 50_000
 LEARNING_RATE = 3e-4
 GAMMA = 0.99
-N_STEPS = 1024
+N_STEPS = 1024  # échantillons par rollout, répartis entre les n_envs environnements
 BATCH_SIZE = 64
 N_EPOCHS = 5
 CLIP_RANGE = 0.2
@@ -570,48 +572,161 @@ def impact_coach_explain(ctx: ImpactCoachContext, language: str = "fr") -> str:
 # 4. Entraînement PPO + Backtest de démo
 # ============================================================
 
-def make_env():
+VEC_ENV_KINDS = ("dummy", "subproc", "batched")
+
+
+def make_env(rank: int = 0, seed: int | None = None):
     def _init():
-        return GovernanceEnv()
+        # graine distincte par worker : pas deux environnements identiques
+        return GovernanceEnv(seed=None if seed is None else seed + rank)
     return _init
 
 
-def train_demo_model() -> PPO:
-    """Entraîne rapidement un PPO sur GovernanceEnv (local only)."""
-    env = DummyVecEnv([make_env()])
-
-    model = PPO(
-        "MlpPolicy",
-        env,
-        learning_rate=LEARNING_RATE,
-        n_steps=N_STEPS,
-        batch_size=BATCH_SIZE,
-        n_epochs=N_EPOCHS,
-        gamma=GAMMA,
-        clip_range=CLIP_RANGE,
-        verbose=1,
-    )
+def make_vec_env(n_envs: int = 1, kind: str = "dummy", seed: int | None = None) -> VecEnv:
+    """
+    n_envs environnements pour PPO :
+        - dummy   : séquentiels dans le process (DummyVecEnv)
+        - subproc : un process par environnement (SubprocVecEnv), sur tous les cœurs
+        - batched : GovernanceVecEnv, tout le lot en opérations NumPy
+    """
+    if kind == "batched":
+        from governance_vec_env import GovernanceVecEnv
+        return GovernanceVecEnv(n_envs, seed=seed)
+    env_fns = [make_env(rank, seed) for rank in range(n_envs)]
+    if kind == "subproc":
+        return SubprocVecEnv(env_fns)
+    if kind == "dummy":
+        return DummyVecEnv(env_fns)
+    raise ValueError(f"vec env inconnu : {kind} (choix : {', '.join(VEC_ENV_KINDS)})")
+
+
+def train_demo_model(
+    total_timesteps: int = TOTAL_TIMESTEPS,
+    seed: int | None = None,
+    verbose: int = 1,
+    n_envs: int = 1,
+    vec_env: str = "dummy",
+    torch_threads: int | None = None,
+    checkpoint_dir: str | None = None,
+    checkpoint_every: int = 0,
+) -> PPO:
+    """
+    Entraîne rapidement un PPO sur GovernanceEnv (local only).
 
-    if tqdm is not None:
-        pbar = tqdm(total=TOTAL_TIMESTEPS, desc="Training PPO Governance Agent")
-    else:
-        pbar = None
-
-    remaining = TOTAL_TIMESTEPS
-    chunk = 10_000
-    while remaining > 0:
-        step_chunk = min(chunk, remaining)
-        model.learn(total_timesteps=step_chunk, reset_num_timesteps=False)
-        remaining -= step_chunk
-        if pbar is not None:
-            pbar.update(step_chunk)
+    n_envs > 1 : le rollout de N_STEPS échantillons est réparti entre les
+    environnements (N_STEPS // n_envs pas chacun), mêmes mises à jour PPO
+    qu'avec un seul. torch_threads : threads de calcul du réseau (le MLP
+    est petit ; avec subproc, laisser des cœurs aux workers).
+    checkpoint_every : sauvegarde dans checkpoint_dir tous les N timesteps.
+    """
+    if torch_threads is not None:
+        torch.set_num_threads(torch_threads)
+    env = make_vec_env(n_envs, vec_env, seed)
+
+    try:
+        model = PPO(
+            "MlpPolicy",
+            env,
+            learning_rate=LEARNING_RATE,
+            n_steps=max(1, N_STEPS // n_envs),
+            batch_size=BATCH_SIZE,
+            n_epochs=N_EPOCHS,
+            gamma=GAMMA,
+            clip_range=CLIP_RANGE,
+            seed=seed,
+            verbose=verbose,
+        )
+
+        callback = None
+        if checkpoint_dir and checkpoint_every > 0:
+            # save_freq compte les appels à env.step, soit n_envs timesteps
+            callback = CheckpointCallback(
+                save_freq=max(1, checkpoint_every // n_envs),
+                save_path=checkpoint_dir,
+                name_prefix="ppo_governance",
+            )
+
+        if tqdm is not None:
+            pbar = tqdm(total=total_timesteps, desc="Training PPO Governance Agent")
+        else:
+            pbar = None
 
-    if pbar is not None:
-        pbar.close()
+        remaining = total_timesteps
+        chunk = 10_000
+        while remaining > 0:
+            step_chunk = min(chunk, remaining)
+            model.learn(total_timesteps=step_chunk, reset_num_timesteps=False, callback=callback)
+            remaining -= step_chunk
+            if pbar is not None:
+                pbar.update(step_chunk)
+
+        if pbar is not None:
+            pbar.close()
+    finally:
+        # arrête les workers SubprocVecEnv
+        env.close()
 
     return model
 
 
+def evaluate_model(model: PPO, n_episodes: int = 10, seed: int = 0) -> Dict[str, float]:
+    """
+    Récompense moyenne par épisode (politique déterministe) sur des épisodes
+    aux graines fixes : deux checkpoints sont comparés sur les mêmes régions.
+    """
+    totals = []
+    for ep in range(n_episodes):
+        env = GovernanceEnv()
+        obs, _ = env.reset(seed=seed + ep)
+        total = 0.0
+        for _ in range(EPISODE_LENGTH):
+            action, _ = model.predict(obs, deterministic=True)
+            obs, reward, terminated, truncated, _ = env.step(action)
+            total += reward
+            if terminated or truncated:
+                break
+        totals.append(total)
+    return {
+        "mean_reward": float(np.mean(totals)),
+        "std_reward": float(np.std(totals)),
+        "episodes": n_episodes,
+        "seed": seed,
+    }
+
+
+def training_config() -> Dict[str, Any]:
+    """
+    Configuration de l'environnement, de la récompense et de PPO, enregistrée
+    avec chaque checkpoint (un modèle n'est valable que pour ces dimensions
+    d'observation / action).
+    """
+    return {
+        "env": {
+            "num_regions": NUM_REGIONS,
+            "region_names": list(REGION_NAMES),
+            "obs_size": OBS_SIZE,
+            "action_size": ACTION_SIZE,
+            "episode_length": EPISODE_LENGTH,
+        },
+        "reward_weights": {
+            "impact": W_IMPACT,
+            "success": W_SUCCESS,
+            "clawback": W_CLAWBACK,
+            "delay": W_DELAY,
+            "retention": W_RETENTION,
+            "balance": W_BALANCE,
+        },
+        "ppo": {
+            "learning_rate": LEARNING_RATE,
+            "gamma": GAMMA,
+            "n_steps": N_STEPS,
+            "batch_size": BATCH_SIZE,
+            "n_epochs": N_EPOCHS,
+            "clip_range": CLIP_RANGE,
+        },
+    }
+
+
 def run_demo_episode_with_coach(model: PPO, language: str = "fr") -> None:
     """Lance un épisode complet + imprime les métriques et les explications coach."""
     env = GovernanceEnv(seed=123)
@@ -0,0 +1,112 @@
+"""
+Benchmark GovernanceEnv (scalaire) vs GovernanceVecEnv (lot de B envs)
+---------------------------------------------------------------------
+
+    python benchmark_env.py [--steps 20000] [--batch-sizes 1 8 64 256 1024] [--check 2000]
+
+Débit en pas d'environnement par seconde (actions aléatoires, reset
+automatique en fin d'épisode). --check N compare aussi les statistiques
+des deux implémentations sur N épisodes de chaque (récompense par épisode,
+métriques finales) : écarts attendus de l'ordre du bruit d'échantillonnage
+(|z| < 3).
+"""
+
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+
+from XRPL_Impact_Governance import ACTION_SIZE, EPISODE_LENGTH, GovernanceEnv
+from governance_vec_env import GovernanceVecEnv
+
+_METRICS = ("impact_score_global", "mean_success", "clawback_global", "donor_retention", "geographical_balance")
+
+
+def bench_scalar(steps: int, seed: int = 0) -> float:
+    rng = np.random.default_rng(seed)
+    actions = rng.uniform(-1.0, 1.0, size=(steps, ACTION_SIZE)).astype(np.float32)
+    env = GovernanceEnv(seed=seed)
+    env.reset()
+    t0 = time.perf_counter()
+    for t in range(steps):
+        _, _, terminated, truncated, _ = env.step(actions[t])
+        if terminated or truncated:
+            env.reset()
+    return steps / (time.perf_counter() - t0)
+
+
+def bench_vec(num_envs: int, steps: int, seed: int = 0) -> float:
+    n_calls = max(1, steps // num_envs)
+    rng = np.random.default_rng(seed)
+    actions = rng.uniform(-1.0, 1.0, size=(min(n_calls, 64), num_envs, ACTION_SIZE)).astype(np.float32)
+    env = GovernanceVecEnv(num_envs, seed=seed)
+    env.reset()
+    t0 = time.perf_counter()
+    for t in range(n_calls):
+        env.step(actions[t % len(actions)])
+    return n_calls * num_envs / (time.perf_counter() - t0)
+
+
+def _episode_stats_scalar(episodes: int, seed: int) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    env = GovernanceEnv(seed=seed + 1)
+    out = {k: np.zeros(episodes) for k in ("reward",) + _METRICS}
+    for ep in range(episodes):
+        env.reset()
+        for _ in range(EPISODE_LENGTH):
+            _, reward, _, _, info = env.step(rng.uniform(-1.0, 1.0, ACTION_SIZE).astype(np.float32))
+            out["reward"][ep] += reward
+        for k in _METRICS:
+            out[k][ep] = info[k]
+    return out
+
+
+def _episode_stats_vec(episodes: int, seed: int) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    env = GovernanceVecEnv(episodes, seed=seed + 1)
+    env.reset()
+    out = {k: np.zeros(episodes) for k in ("reward",) + _METRICS}
+    for _ in range(EPISODE_LENGTH):
+        actions = rng.uniform(-1.0, 1.0, (episodes, ACTION_SIZE)).astype(np.float32)
+        # métriques lues avant le reset automatique du dernier pas
+        _, rewards, _, _ = env.step(actions)
+        out["reward"] += rewards
+        for k in _METRICS:
+            out[k] = np.array(env.last_metrics[k])
+    return out
+
+
+def check_statistics(episodes: int, seed: int = 0) -> None:
+    scalar = _episode_stats_scalar(episodes, seed)
+    vec = _episode_stats_vec(episodes, seed + 100)
+    for k in scalar:
+        a, b = scalar[k], vec[k]
+        se = np.sqrt(a.var() / len(a) + b.var() / len(b))
+        z = (a.mean() - b.mean()) / se if se > 0 else 0.0
+        print(
+            f"[BENCH] {k:21s} scalar {a.mean():.4f} ± {a.std():.4f} | "
+            f"vec {b.mean():.4f} ± {b.std():.4f} | z = {z:+.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de GovernanceEnv vs GovernanceVecEnv")
+    parser.add_argument("--steps", type=int, default=20_000, help="pas d'environnement par mesure")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64, 256, 1024])
+    parser.add_argument("--check", type=int, default=0, help="épisodes pour la comparaison statistique")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scalar = bench_scalar(args.steps, args.seed)
+    print(f"[BENCH] GovernanceEnv          : {scalar:12,.0f} steps/s")
+    for b in args.batch_sizes:
+        rate = bench_vec(b, args.steps, args.seed)
+        print(f"[BENCH] GovernanceVecEnv B={b:<5d}: {rate:12,.0f} steps/s (x{rate / scalar:.1f})")
+
+    if args.check:
+        check_statistics(args.check, args.seed)
+
+
+if __name__ == "__main__":
+    main()
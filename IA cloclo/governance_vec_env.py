@@ -0,0 +1,261 @@
+"""
+GovernanceVecEnv : B environnements de gouvernance simulés en un appel
+---------------------------------------------------------------------
+
+GovernanceEnv simule les régions une par une (tirages Poisson / binomiaux /
+normaux scalaires) et reconstruit son observation à partir de petits
+tableaux à chaque pas : pendant l'entraînement PPO, c'est l'environnement
+qui coûte le plus. Ici l'état de B environnements indépendants est gardé
+dans des tableaux (B, NUM_REGIONS) et un pas est une poignée d'opérations
+NumPy, tirages aléatoires compris (paramètres tableaux).
+
+Même dynamique, mêmes lois que GovernanceEnv (voir benchmark_env.py
+--check) ; les trajectoires ne sont pas identiques tirage à tirage (un seul
+générateur pour tout le lot).
+
+Interface VecEnv de Stable-Baselines3 (à passer directement à PPO) :
+    - reset automatique des environnements terminés, observation finale
+      dans infos[i]["terminal_observation"]
+    - observations écrites dans un tampon préalloué, renvoyées en copie
+      (PPO garde l'observation précédente pendant le pas suivant, comme
+      avec DummyVecEnv)
+    - infos vides hors fin d'épisode ; les métriques du dernier pas sont
+      dans `last_metrics` (tableaux (B,)) plutôt que dans B dictionnaires
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from gymnasium.spaces import Box
+from stable_baselines3.common.vec_env import VecEnv
+
+from XRPL_Impact_Governance import (
+    ACTION_SIZE,
+    EPISODE_LENGTH,
+    N_REGION_METRICS,
+    NUM_REGIONS,
+    OBS_SIZE,
+    W_BALANCE,
+    W_CLAWBACK,
+    W_DELAY,
+    W_IMPACT,
+    W_RETENTION,
+    W_SUCCESS,
+)
+
+
+class GovernanceVecEnv(VecEnv):
+    def __init__(self, num_envs: int, seed: int | None = None):
+        super().__init__(
+            num_envs,
+            Box(low=0.0, high=1.0, shape=(OBS_SIZE,), dtype=np.float32),
+            Box(low=-1.0, high=1.0, shape=(ACTION_SIZE,), dtype=np.float32),
+        )
+        self.rng = np.random.default_rng(seed)
+        shape = (num_envs, NUM_REGIONS)
+
+        # État par environnement et par région
+        self.funds_ratio = np.zeros(shape)
+        self.success_rate = np.zeros(shape)
+        self.clawback_rate = np.zeros(shape)
+        self.avg_delay_norm = np.zeros(shape)
+        self.validator_rep = np.zeros(shape)
+        self.base_success = np.zeros(shape)
+        self.base_clawback = np.zeros(shape)
+        self.base_demand = np.zeros(shape)
+
+        # Métriques globales par environnement
+        self.donor_retention = np.zeros(num_envs)
+        self.impact_score_global = np.zeros(num_envs)
+        self.geographical_balance = np.zeros(num_envs)
+        self.new_donors_norm = np.zeros(num_envs)
+
+        # Projets de la dernière période (B, NUM_REGIONS)
+        self.projects_funded = np.zeros(shape, dtype=np.int64)
+        self.projects_success = np.zeros(shape, dtype=np.int64)
+        self.projects_clawback = np.zeros(shape, dtype=np.int64)
+
+        self.episode_step = np.zeros(num_envs, dtype=np.int64)
+        self.last_metrics: Dict[str, np.ndarray] = {}
+
+        # Tampon d'observations : (B, OBS_SIZE), vue (B, régions, métriques)
+        # sur sa partie régionale
+        self._obs = np.zeros((num_envs, OBS_SIZE), dtype=np.float32)
+        self._obs_regions = self._obs[:, : NUM_REGIONS * N_REGION_METRICS].reshape(
+            num_envs, NUM_REGIONS, N_REGION_METRICS
+        )
+        assert np.shares_memory(self._obs, self._obs_regions)
+        self._actions = np.zeros((num_envs, ACTION_SIZE), dtype=np.float32)
+
+    # ---------- Simulation (tous les environnements à la fois) ----------
+
+    def _init_latent_params(self, mask: np.ndarray) -> None:
+        """Réinitialise les environnements `mask` (booléens (B,))."""
+        n = int(mask.sum())
+        size = (n, NUM_REGIONS)
+        base_demand = self.rng.uniform(0.3, 1.0, size=size)
+        self.base_success[mask] = self.rng.uniform(0.55, 0.8, size=size)
+        self.base_clawback[mask] = self.rng.uniform(0.05, 0.2, size=size)
+        self.base_demand[mask] = base_demand
+
+        weights = np.clip(base_demand + self.rng.uniform(0.0, 0.3, size=size), 1e-3, None)
+        self.funds_ratio[mask] = weights / weights.sum(axis=1, keepdims=True)
+
+        self.success_rate[mask] = self.base_success[mask]
+        self.clawback_rate[mask] = self.base_clawback[mask]
+        self.avg_delay_norm[mask] = 0.3
+        self.validator_rep[mask] = 0.7
+        self.projects_funded[mask] = 0
+        self.projects_success[mask] = 0
+        self.projects_clawback[mask] = 0
+        self.episode_step[mask] = 0
+
+    def _update_global_metrics(self) -> None:
+        self.impact_score_global = np.clip(np.sum(self.success_rate * self.funds_ratio, axis=1), 0.0, 1.0)
+        clawback_global = self.clawback_rate.mean(axis=1)
+        delay_global = self.avg_delay_norm.mean(axis=1)
+
+        self.donor_retention = np.clip(0.4 + 0.4 * self.impact_score_global - 0.5 * clawback_global, 0.0, 1.0)
+        self.new_donors_norm = np.clip(0.3 + 0.5 * self.impact_score_global - 0.3 * delay_global, 0.0, 1.0)
+
+        std_funds = np.std(self.funds_ratio, axis=1)
+        self.geographical_balance = 1.0 - np.clip(std_funds * np.sqrt(NUM_REGIONS), 0.0, 1.0)
+
+    def _write_obs(self) -> None:
+        r = self._obs_regions
+        r[:, :, 0] = self.funds_ratio
+        r[:, :, 1] = self.success_rate
+        r[:, :, 2] = self.clawback_rate
+        r[:, :, 3] = self.avg_delay_norm
+        r[:, :, 4] = self.validator_rep
+        g = NUM_REGIONS * N_REGION_METRICS
+        self._obs[:, g] = self.donor_retention
+        self._obs[:, g + 1] = self.impact_score_global
+        self._obs[:, g + 2] = self.geographical_balance
+        self._obs[:, g + 3] = self.new_donors_norm
+
+    def _simulate_period(self, actions: np.ndarray) -> None:
+        """GovernanceEnv._decode_action + _simulate_projects_for_period, vectorisés."""
+        a = np.clip(actions, -1.0, 1.0).astype(np.float32)
+        matching = 0.5 + (a[:, :NUM_REGIONS] + 1.0) * 0.75  # 0.5–2.0
+        escrow_stages = np.clip(np.round(2.0 + (a[:, NUM_REGIONS + 1] + 1.0) * 1.0), 2, 4)
+        validators_per_project = np.clip(np.round(1.0 + (a[:, NUM_REGIONS + 2] + 1.0) * 1.0), 1, 3)
+
+        demand_intensity = self.base_demand * (0.5 + self.funds_ratio) * (0.7 + 0.6 * matching)
+        demand_intensity = np.clip(demand_intensity, 0.1, None)
+
+        size = matching.shape
+        funded = self.rng.poisson(lam=10.0 * demand_intensity)
+        p_success = np.clip(
+            self.base_success + 0.10 * (matching - 1.0) - 0.20 * self.base_clawback + self.rng.normal(0.0, 0.03, size),
+            0.0,
+            1.0,
+        )
+        p_claw = np.clip(
+            self.base_clawback + 0.05 * (1.5 - matching) + self.rng.normal(0.0, 0.02, size),
+            0.0,
+            1.0,
+        )
+        # binomial(0, p) = 0 : régions sans projet traitées sans branche
+        success = self.rng.binomial(funded, p_success)
+        clawback = self.rng.binomial(funded - success, p_claw)
+        self.projects_funded, self.projects_success, self.projects_clawback = funded, success, clawback
+
+        # pas de projets => mémoire amortie (taux précédents)
+        has_projects = funded > 0
+        safe_funded = np.maximum(funded, 1)
+        new_success_rate = np.where(has_projects, success / safe_funded, self.success_rate)
+        new_clawback_rate = np.where(has_projects, clawback / safe_funded, self.clawback_rate)
+
+        self.success_rate = np.clip(0.7 * self.success_rate + 0.3 * new_success_rate, 0.0, 1.0)
+        self.clawback_rate = np.clip(0.7 * self.clawback_rate + 0.3 * new_clawback_rate, 0.0, 1.0)
+
+        delay = np.clip(0.25 + 0.02 * validators_per_project + 0.03 * (escrow_stages - 2), 0.2, 0.6)
+        self.avg_delay_norm[:] = delay[:, None]
+
+        self.validator_rep = np.clip(
+            0.9 * self.validator_rep + 0.1 * (self.success_rate - self.clawback_rate), 0.0, 1.0
+        )
+
+        preference = np.clip(
+            self.base_demand * (0.5 + self.success_rate - 0.5 * self.clawback_rate), 1e-4, None
+        )
+        new_funds = preference / preference.sum(axis=1, keepdims=True)
+        funds = 0.7 * self.funds_ratio + 0.3 * new_funds
+        self.funds_ratio = funds / funds.sum(axis=1, keepdims=True)
+
+    # ---------- API VecEnv ----------
+
+    def reset(self) -> np.ndarray:
+        seeds = [s for s in self._seeds if s is not None]
+        if seeds:
+            self.rng = np.random.default_rng(seeds)
+        self._reset_seeds()
+        self._reset_options()
+        self._init_latent_params(np.ones(self.num_envs, dtype=bool))
+        self._update_global_metrics()
+        self._write_obs()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self._obs.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions[:] = np.asarray(actions, dtype=np.float32).reshape(self.num_envs, ACTION_SIZE)
+
+    def step_wait(self):
+        self.episode_step += 1
+        self._simulate_period(self._actions)
+        self._update_global_metrics()
+
+        mean_success = self.success_rate.mean(axis=1)
+        clawback_global = self.clawback_rate.mean(axis=1)
+        delay_global = self.avg_delay_norm.mean(axis=1)
+        rewards = (
+            W_IMPACT * self.impact_score_global
+            + W_SUCCESS * mean_success
+            - W_CLAWBACK * clawback_global
+            - W_DELAY * delay_global
+            + W_RETENTION * self.donor_retention
+            + W_BALANCE * self.geographical_balance
+        ).astype(np.float32)
+        self.last_metrics = {
+            "impact_score_global": self.impact_score_global,
+            "mean_success": mean_success,
+            "clawback_global": clawback_global,
+            "delay_global": delay_global,
+            "donor_retention": self.donor_retention,
+            "geographical_balance": self.geographical_balance,
+        }
+
+        dones = self.episode_step >= EPISODE_LENGTH
+        infos: List[Dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        if dones.any():
+            self._write_obs()
+            for i in np.flatnonzero(dones):
+                infos[i]["terminal_observation"] = self._obs[i].copy()
+                infos[i]["TimeLimit.truncated"] = False
+            self._init_latent_params(dones)
+            self._update_global_metrics()
+        self._write_obs()
+        return self._obs.copy(), rewards, dones, infos
+
+    def close(self) -> None:
+        pass
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        # attributs communs à tout le lot
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(self._get_indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False] * len(self._get_indices(indices))
+
+    def get_images(self) -> Sequence[np.ndarray | None]:
+        return [None] * self.num_envs
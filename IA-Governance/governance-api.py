@@ -9,6 +9,7 @@ from pydantic import BaseModel
 from typing import Dict, List, Optional
 import numpy as np
 from pathlib import Path
+import os
 import sys
 
 # Ajouter le chemin du script de gouvernance
@@ -17,7 +18,7 @@ sys.path.append(str(Path(__file__).parent.parent / "IA cloclo"))
 try:
     from XRPL_Impact_Governance import (
         GovernanceEnv,
-        train_demo_model,
+        training_config,
         NUM_REGIONS,
         REGION_NAMES,
         OBS_SIZE
@@ -27,6 +28,8 @@ except ImportError:
     print("Assurez-vous que le fichier est dans 'IA cloclo/'")
     sys.exit(1)
 
+import model_registry
+
 app = FastAPI(title="XRPL Impact Governance AI")
 
 # CORS
@@ -40,6 +43,7 @@ app.add_middleware(
 
 # Modèle PPO global
 governance_model = None
+model_metadata: Optional[Dict] = None
 env = None
 
 
@@ -75,17 +79,22 @@ class EscrowFeedback(BaseModel):
 
 @app.on_event("startup")
 async def startup_event():
-    global governance_model, env
+    global governance_model, model_metadata, env
     print("🚀 Démarrage du service Governance AI...")
-    print("📊 Entraînement du modèle PPO...")
-    
+
+    # checkpoint entraîné hors ligne (train_model.py) ; GOVERNANCE_MODEL_VERSION
+    # pour servir une version précise au lieu de LATEST
     try:
-        governance_model = train_demo_model()
+        governance_model, model_metadata = model_registry.load_checkpoint(
+            version=os.getenv("GOVERNANCE_MODEL_VERSION"),
+            expected_env=training_config()["env"],
+        )
         env = GovernanceEnv()
-        print("✅ Modèle PPO entraîné et prêt")
+        print(f"✅ Modèle PPO {model_metadata['version']} chargé")
     except Exception as e:
-        print(f"❌ Erreur lors de l'entraînement: {e}")
+        print(f"❌ Erreur lors du chargement du modèle: {e}")
         governance_model = None
+        model_metadata = None
 
 
 @app.get("/")
@@ -94,6 +103,7 @@ def root():
         "service": "XRPL Impact Governance AI",
         "version": "1.0.0",
         "model": "PPO (Stable-Baselines3)",
+        "model_version": model_metadata["version"] if model_metadata else None,
         "status": "running" if governance_model else "error"
     }
 
@@ -102,7 +112,9 @@ def root():
 def health():
     return {
         "status": "healthy" if governance_model else "unhealthy",
-        "model_loaded": governance_model is not None
+        "model_loaded": governance_model is not None,
+        "model_version": model_metadata["version"] if model_metadata else None,
+        "model_eval": model_metadata.get("eval") if model_metadata else None,
     }
 
 
@@ -0,0 +1,146 @@
+"""
+Registre des checkpoints PPO de gouvernance
+-------------------------------------------
+
+Le service ne s'entraîne plus au démarrage : train_model.py entraîne,
+évalue et enregistre un checkpoint versionné, governance-api.py charge
+celui désigné par LATEST (quelques millisecondes). Plusieurs workers
+uvicorn lisent le même fichier.
+
+Arborescence (GOVERNANCE_MODEL_DIR, défaut : IA-Governance/models) :
+
+    models/
+        LATEST                      # nom de la version servie
+        ppo-governance-v0001/
+            model.zip               # PPO.save()
+            metadata.json           # config env / récompense / PPO, score d'éval
+        ppo-governance-v0002/
+            ...
+
+Une version est écrite dans un dossier temporaire puis renommée : un
+worker ne voit jamais de checkpoint à moitié écrit. LATEST est remplacé
+atomiquement (os.replace) ; revenir en arrière = `train_model.py promote`.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from stable_baselines3 import PPO
+
+MODEL_DIR = Path(os.getenv("GOVERNANCE_MODEL_DIR", Path(__file__).parent / "models"))
+
+_PREFIX = "ppo-governance-v"
+_LATEST = "LATEST"
+_MODEL_FILE = "model.zip"
+_METADATA_FILE = "metadata.json"
+
+
+class RegistryError(Exception):
+    pass
+
+
+def list_versions(model_dir: Path = MODEL_DIR) -> List[str]:
+    """Versions complètes (model + metadata), de la plus ancienne à la plus récente."""
+    if not model_dir.is_dir():
+        return []
+    return sorted(
+        p.name
+        for p in model_dir.iterdir()
+        if p.name.startswith(_PREFIX) and (p / _METADATA_FILE).is_file()
+    )
+
+
+def latest_version(model_dir: Path = MODEL_DIR) -> str | None:
+    path = model_dir / _LATEST
+    if not path.is_file():
+        return None
+    version = path.read_text().strip()
+    return version or None
+
+
+def read_metadata(version: str, model_dir: Path = MODEL_DIR) -> Dict[str, Any]:
+    path = model_dir / version / _METADATA_FILE
+    if not path.is_file():
+        raise RegistryError(f"Version inconnue : {version}")
+    return json.loads(path.read_text())
+
+
+def promote(version: str, model_dir: Path = MODEL_DIR) -> None:
+    """Fait de `version` le checkpoint servi (pris en compte au prochain démarrage)."""
+    read_metadata(version, model_dir)
+    fd, tmp = tempfile.mkstemp(dir=model_dir, prefix=".latest-")
+    with os.fdopen(fd, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp, model_dir / _LATEST)
+
+
+def save_checkpoint(
+    model: PPO,
+    metadata: Dict[str, Any],
+    model_dir: Path = MODEL_DIR,
+    make_latest: bool = True,
+) -> str:
+    """Enregistre `model` sous une nouvelle version et renvoie son nom."""
+    model_dir.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=model_dir, prefix=".tmp-"))
+    try:
+        model.save(tmp / _MODEL_FILE)
+        while True:
+            versions = list_versions(model_dir)
+            number = int(versions[-1][len(_PREFIX):]) + 1 if versions else 1
+            version = f"{_PREFIX}{number:04d}"
+            meta = {
+                **metadata,
+                "version": version,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+            (tmp / _METADATA_FILE).write_text(json.dumps(meta, indent=2))
+            try:
+                # échoue si un autre entraînement a pris ce numéro entre-temps
+                os.rename(tmp, model_dir / version)
+                break
+            except OSError:
+                if not (model_dir / version).exists():
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    if make_latest:
+        promote(version, model_dir)
+    return version
+
+
+def load_checkpoint(
+    version: str | None = None,
+    expected_env: Dict[str, Any] | None = None,
+    model_dir: Path = MODEL_DIR,
+) -> tuple[PPO, Dict[str, Any]]:
+    """
+    Charge `version` (défaut : LATEST). `expected_env` : config de
+    l'environnement courant ; un checkpoint aux dimensions différentes est
+    refusé plutôt que de prédire des actions incohérentes.
+    """
+    version = version or latest_version(model_dir)
+    if version is None:
+        raise RegistryError(f"Aucun checkpoint dans {model_dir} (lancer train_model.py train)")
+    metadata = read_metadata(version, model_dir)
+
+    if expected_env is not None:
+        saved = metadata.get("env", {})
+        for key in ("obs_size", "action_size"):
+            if saved.get(key) != expected_env.get(key):
+                raise RegistryError(
+                    f"{version} incompatible : {key}={saved.get(key)} "
+                    f"(environnement actuel : {expected_env.get(key)})"
+                )
+
+    model = PPO.load(model_dir / version / _MODEL_FILE, device="cpu")
+    return model, metadata
@@ -0,0 +1,188 @@
+"""
+Entraînement hors ligne du modèle PPO de gouvernance
+----------------------------------------------------
+
+    python train_model.py train [--timesteps 50000] [--seed 0] [--eval-episodes 10] [--no-promote] [--if-missing]
+                                [--n-envs 0] [--vec-env subproc] [--torch-threads 1] [--checkpoint-every 10000]
+    python train_model.py scale [--cores 1 2 4 8] [--timesteps 20000] [--vec-env subproc]
+    python train_model.py list
+    python train_model.py promote ppo-governance-v0002
+
+`train` entraîne, évalue (épisodes à graines fixes) et enregistre un
+checkpoint dans le registre (model_registry.py), promu en LATEST sauf
+--no-promote. Les services governance-api.py déjà lancés le chargent au
+prochain redémarrage. --n-envs 0 = un environnement par cœur ; avec
+--checkpoint-every, des checkpoints intermédiaires sont écrits dans
+models/checkpoints/<run>/ (reprise après interruption, hors registre).
+
+`scale` entraîne le même nombre de timesteps avec 1..N environnements /
+cœurs et affiche temps, échantillons/s et accélération (rien n'est
+enregistré).
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "IA cloclo"))
+
+import stable_baselines3
+import torch
+from XRPL_Impact_Governance import (
+    TOTAL_TIMESTEPS,
+    VEC_ENV_KINDS,
+    evaluate_model,
+    train_demo_model,
+    training_config,
+)
+
+import model_registry
+
+
+def _n_envs(n: int) -> int:
+    return n if n > 0 else os.cpu_count() or 1
+
+
+def _vec_env_kind(kind: str | None, n_envs: int) -> str:
+    return kind or ("subproc" if n_envs > 1 else "dummy")
+
+
+def cmd_train(args) -> None:
+    if args.if_missing and model_registry.latest_version() is not None:
+        print(f"✅ Checkpoint présent : {model_registry.latest_version()}")
+        return
+
+    n_envs = _n_envs(args.n_envs)
+    vec_env = _vec_env_kind(args.vec_env, n_envs)
+    checkpoint_dir = None
+    if args.checkpoint_every > 0:
+        run = datetime.now().strftime("%Y%m%d-%H%M%S")
+        checkpoint_dir = str(model_registry.MODEL_DIR / "checkpoints" / run)
+
+    print(f"📊 Entraînement PPO ({args.timesteps} timesteps, {n_envs} env(s) {vec_env})...")
+    t0 = time.perf_counter()
+    model = train_demo_model(
+        total_timesteps=args.timesteps,
+        seed=args.seed,
+        verbose=args.verbose,
+        n_envs=n_envs,
+        vec_env=vec_env,
+        torch_threads=args.torch_threads,
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_every=args.checkpoint_every,
+    )
+    train_s = time.perf_counter() - t0
+    samples_per_s = model.num_timesteps / train_s
+    print(f"⏱️  {train_s:.1f} s, {samples_per_s:,.0f} échantillons/s")
+
+    evaluation = evaluate_model(model, n_episodes=args.eval_episodes, seed=args.eval_seed)
+    print(f"📈 Évaluation : {evaluation['mean_reward']:.3f} ± {evaluation['std_reward']:.3f}")
+
+    metadata = {
+        **training_config(),
+        "algorithm": "PPO",
+        "stable_baselines3": stable_baselines3.__version__,
+        "total_timesteps": args.timesteps,
+        "seed": args.seed,
+        "n_envs": n_envs,
+        "vec_env": vec_env,
+        "torch_threads": torch.get_num_threads(),
+        "train_seconds": round(train_s, 1),
+        "samples_per_s": round(samples_per_s),
+        "eval": evaluation,
+    }
+    version = model_registry.save_checkpoint(model, metadata, make_latest=not args.no_promote)
+    status = "promu en LATEST" if not args.no_promote else "non promu"
+    print(f"✅ Checkpoint {version} enregistré ({status})")
+
+
+def cmd_scale(args) -> None:
+    cpus = os.cpu_count() or 1
+    cores = args.cores or sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+    print(f"📊 Passage à l'échelle : {args.timesteps} timesteps, {cpus} cœur(s) disponibles")
+    print("n_envs | vec_env | secondes | échantillons/s | accélération")
+
+    base = None
+    for n in cores:
+        vec_env = _vec_env_kind(args.vec_env, n)
+        t0 = time.perf_counter()
+        model = train_demo_model(
+            total_timesteps=args.timesteps,
+            seed=args.seed,
+            verbose=0,
+            n_envs=n,
+            vec_env=vec_env,
+            torch_threads=args.torch_threads,
+        )
+        elapsed = time.perf_counter() - t0
+        rate = model.num_timesteps / elapsed
+        base = base or rate
+        print(f"{n:6d} | {vec_env:7s} | {elapsed:8.1f} | {rate:14,.0f} | x{rate / base:.2f}")
+
+
+def cmd_list(args) -> None:
+    latest = model_registry.latest_version()
+    versions = model_registry.list_versions()
+    if not versions:
+        print("Aucun checkpoint")
+        return
+    for version in versions:
+        meta = model_registry.read_metadata(version)
+        marker = "*" if version == latest else " "
+        print(
+            f"{marker} {version}  {meta['created_at']}  "
+            f"timesteps={meta.get('total_timesteps')}  "
+            f"eval={meta.get('eval', {}).get('mean_reward', float('nan')):.3f}"
+        )
+
+
+def cmd_promote(args) -> None:
+    model_registry.promote(args.version)
+    print(f"✅ {args.version} promu en LATEST")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre des checkpoints PPO de gouvernance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="entraîne et enregistre un checkpoint")
+    train.add_argument("--timesteps", type=int, default=TOTAL_TIMESTEPS)
+    train.add_argument("--seed", type=int, default=None)
+    train.add_argument("--eval-episodes", type=int, default=10)
+    train.add_argument("--eval-seed", type=int, default=1000)
+    train.add_argument("--verbose", type=int, default=0)
+    train.add_argument("--no-promote", action="store_true", help="ne change pas LATEST")
+    train.add_argument("--if-missing", action="store_true", help="seulement si aucun checkpoint")
+    train.add_argument("--n-envs", type=int, default=1, help="environnements parallèles (0 = un par cœur)")
+    train.add_argument("--vec-env", choices=VEC_ENV_KINDS, default=None, help="défaut : subproc si n-envs > 1")
+    train.add_argument("--torch-threads", type=int, default=None)
+    train.add_argument("--checkpoint-every", type=int, default=0, help="timesteps entre deux checkpoints intermédiaires")
+    train.set_defaults(func=cmd_train)
+
+    scale = sub.add_parser("scale", help="temps et échantillons/s de 1 à N cœurs")
+    scale.add_argument("--cores", type=int, nargs="+", default=None, help="défaut : 1, 2, 4... jusqu'au nombre de CPU")
+    scale.add_argument("--timesteps", type=int, default=20_000)
+    scale.add_argument("--seed", type=int, default=0)
+    scale.add_argument("--vec-env", choices=VEC_ENV_KINDS, default=None)
+    scale.add_argument("--torch-threads", type=int, default=None)
+    scale.set_defaults(func=cmd_scale)
+
+    sub.add_parser("list", help="versions enregistrées (* = LATEST)").set_defaults(func=cmd_list)
+
+    prom = sub.add_parser("promote", help="sert une autre version (rollback)")
+    prom.add_argument("version")
+    prom.set_defaults(func=cmd_promote)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except model_registry.RegistryError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
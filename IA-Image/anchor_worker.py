@@ -0,0 +1,221 @@
+# anchor_worker.py
+"""
+Worker d'ancrage des lots Merkle (anchoring.py).
+
+À chaque passage :
+  1. scelle un lot si des enregistrements attendent depuis ANCHOR_INTERVAL_S
+  2. suit les lots SUBMITTED : validé -> ANCHORED (ledger_index) ; jamais
+     inclus avant LastLedgerSequence -> re-signé plus tard
+  3. signe la tx AccountSet (Memo = racine) des lots PENDING, persiste
+     hash + blob (write-ahead) puis soumet
+Même cycle de vie que l'outbox des escrows (outbox_worker.py), y compris
+le bail (lease_owner / lease_until) qui empêche deux workers de signer le
+même lot.
+
+Lancement : thread démarré par main.py (ANCHORING_ENABLED), ou
+`python anchor_worker.py` pour un process séparé.
+"""
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from anchoring import build_anchor_tx, seal_anchor_batch
+from database import SessionLocal
+from models import AnchorBatch, AnchorStatus
+from settings import settings
+from tx_cache import SEQUENCE_RESYNC_RESULTS
+from tx_pipeline import TxPipeline, never_applied
+from xrpl_client import client, platform_wallet
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, 300))
+
+
+class AnchorWorker:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        wallet=platform_wallet,
+        poll_interval: float = settings.ANCHOR_POLL_INTERVAL_S,
+        max_attempts: int = settings.ANCHOR_MAX_ATTEMPTS,
+        lease_s: int = settings.ANCHOR_LEASE_S,
+        owner: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.wallet = wallet
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_s)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Transitions ----------
+
+    def _retry_later(self, batch: AnchorBatch, error: str, now: datetime) -> None:
+        batch.attempts += 1
+        batch.last_error = error
+        if batch.attempts >= self.max_attempts:
+            batch.status = AnchorStatus.FAILED
+            return
+        batch.status = AnchorStatus.PENDING
+        batch.tx_hash = None
+        batch.tx_blob = None
+        batch.next_attempt_at = now + _backoff(batch.attempts)
+
+    # ---------- Un passage ----------
+
+    def _claim(self, db: Session, now: datetime) -> List[AnchorBatch]:
+        until = now + self.lease
+        db.query(AnchorBatch).filter(
+            AnchorBatch.status.in_([AnchorStatus.PENDING, AnchorStatus.SUBMITTED]),
+            AnchorBatch.next_attempt_at <= now,
+            or_(AnchorBatch.lease_until.is_(None), AnchorBatch.lease_until < now),
+        ).update(
+            {AnchorBatch.lease_owner: self.owner, AnchorBatch.lease_until: until},
+            synchronize_session=False,
+        )
+        db.commit()
+        # seuls les lots dont CE passage a posé le bail
+        return (
+            db.query(AnchorBatch)
+            .filter(AnchorBatch.lease_owner == self.owner, AnchorBatch.lease_until == until)
+            .order_by(AnchorBatch.id)
+            .all()
+        )
+
+    def _release(self, db: Session, batches: List[AnchorBatch]) -> None:
+        db.query(AnchorBatch).filter(
+            AnchorBatch.id.in_([b.id for b in batches]),
+            AnchorBatch.lease_owner == self.owner,
+        ).update(
+            {AnchorBatch.lease_owner: None, AnchorBatch.lease_until: None},
+            synchronize_session=False,
+        )
+        db.commit()
+
+    def _run_mock(self, db: Session, batches: List[AnchorBatch], now: datetime) -> None:
+        for batch in batches:
+            batch.status = AnchorStatus.ANCHORED
+            batch.anchored_at = now
+        db.commit()
+
+    def _check_submitted(self, db: Session, pipeline: TxPipeline, batches, now) -> None:
+        if not batches:
+            return
+        validated = pipeline.validated_ledger_index()
+        for batch in batches:
+            res = pipeline.lookup_validated(batch.id, batch.tx_hash)
+            if res is None:
+                if validated > batch.last_ledger_sequence:
+                    self._retry_later(batch, "expired", now)
+                    pipeline.resync_sequence()
+                continue
+            if res.success:
+                batch.status = AnchorStatus.ANCHORED
+                batch.ledger_index = res.raw.get("ledger_index")
+                batch.anchored_at = now
+                print(f"[ANCHOR] batch {batch.id} anchored in ledger {batch.ledger_index}")
+            else:
+                # tec* : frais payés, la racine n'est pas publiée
+                self._retry_later(batch, res.engine_result, now)
+        db.commit()
+
+    def _sign_and_submit(self, db: Session, pipeline: TxPipeline, batches, now) -> None:
+        if not batches:
+            return
+        sequence = pipeline.next_sequence(len(batches))
+        fee = pipeline.open_ledger_fee()
+        last_ledger = pipeline.validated_ledger_index() + pipeline.ledger_window
+
+        for batch in batches:
+            signed = pipeline.prepare(build_anchor_tx(self.wallet, batch.root), sequence, fee, last_ledger)
+            batch.sequence = sequence
+            batch.last_ledger_sequence = last_ledger
+            batch.tx_hash = signed.get_hash()
+            batch.tx_blob = signed.blob()
+            batch.status = AnchorStatus.SUBMITTED
+            sequence += 1
+        # write-ahead : hash / blob durables avant tout envoi au réseau
+        db.commit()
+
+        for batch in batches:
+            try:
+                prelim = pipeline.submit_blob(batch.tx_blob)
+            except Exception as e:
+                print(f"[ANCHOR] submit error for batch {batch.id}: {e}")
+                continue
+            engine_result = prelim.get("engine_result", "")
+            if engine_result in SEQUENCE_RESYNC_RESULTS:
+                pipeline.resync_sequence()
+            if never_applied(engine_result):
+                self._retry_later(batch, engine_result, now)
+                pipeline.resync_sequence()
+        db.commit()
+
+    def run_once(self) -> int:
+        """Scelle / soumet / suit les lots dus. Renvoie le nombre de lots traités."""
+        db: Session = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            seal_anchor_batch(db, now)
+            batches = self._claim(db, now)
+            if not batches:
+                return 0
+
+            if settings.XRPL_MOCK:
+                self._run_mock(db, batches, now)
+            else:
+                pipeline = TxPipeline(client, self.wallet)
+                # listes figées avant le suivi : un lot expiré repasse PENDING
+                # avec son backoff, il ne doit pas être re-signé dans ce passage
+                submitted = [b for b in batches if b.status == AnchorStatus.SUBMITTED]
+                pending = [b for b in batches if b.status == AnchorStatus.PENDING]
+                self._check_submitted(db, pipeline, submitted, now)
+                self._sign_and_submit(db, pipeline, pending, now)
+            self._release(db, batches)
+            return len(batches)
+        except Exception as e:
+            db.rollback()
+            print(f"[ANCHOR] run error: {e}")
+            return 0
+        finally:
+            db.close()
+
+    # ---------- Boucle ----------
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="anchor-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+anchor_worker = AnchorWorker()
+
+
+if __name__ == "__main__":
+    print("[ANCHOR] Worker started")
+    try:
+        anchor_worker.run_forever()
+    except KeyboardInterrupt:
+        pass
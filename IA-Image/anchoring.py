@@ -0,0 +1,162 @@
+# anchoring.py
+"""
+Ancrage on-chain des verdicts et des scores IA par lots Merkle.
+
+Publier chaque verdict / score individuellement coûterait une tx XRPL par
+enregistrement. Ici :
+  - decide_project_verdict et score_pending_evidences_many ajoutent un
+    AnchorRecord (JSON canonique + feuille) dans leur propre transaction DB
+  - seal_anchor_batch (appelé par anchor_worker) regroupe les
+    enregistrements en attente dès que le plus ancien a ANCHOR_INTERVAL_S
+    (ou que ANCHOR_MAX_RECORDS sont en attente) : racine Merkle figée dans
+    un AnchorBatch
+  - anchor_worker publie la racine en Memo d'une tx AccountSet : une tx par
+    lot, quel que soit le volume
+  - anchor_proof() renvoie la preuve d'inclusion d'un enregistrement
+
+Feuille : leaf_hash("<kind>:<ref_id>:<payload>"), le payload contenant
+l'horodatage de l'enregistrement.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from xrpl.models.transactions import AccountSet, Memo
+
+from merkle import leaf_hash, merkle_proof, merkle_root
+from models import AnchorBatch, AnchorRecord, AnchorStatus, Evidence
+from settings import settings
+
+ANCHOR_MEMO_TYPE = "xrpact/anchor-root".encode().hex().upper()
+
+VERDICT = "verdict"
+ANALYSIS = "analysis"
+
+
+def record_anchor(db: Session, kind: str, ref_id: int, payload: dict, now: datetime) -> None:
+    """Ajoute l'enregistrement à la session (commit par l'appelant)."""
+    if not settings.ANCHORING_ENABLED:
+        return
+    body = json.dumps({**payload, "recorded_at": now.isoformat()}, sort_keys=True, separators=(",", ":"))
+    db.add(
+        AnchorRecord(
+            kind=kind,
+            ref_id=ref_id,
+            payload=body,
+            leaf=leaf_hash(f"{kind}:{ref_id}:{body}"),
+            created_at=now,
+        )
+    )
+
+
+def record_verdict(db: Session, project_id: int, verdict: dict, now: datetime) -> None:
+    record_anchor(db, VERDICT, project_id, {"project_id": project_id, **verdict}, now)
+
+
+def record_analysis(db: Session, evidence: Evidence, now: datetime) -> None:
+    record_anchor(
+        db,
+        ANALYSIS,
+        evidence.id,
+        {
+            "evidence_id": evidence.id,
+            "project_id": evidence.project_id,
+            "image_url": evidence.image_url,
+            "cv_score": evidence.cv_score,
+        },
+        now,
+    )
+
+
+def seal_anchor_batch(
+    db: Session,
+    now: datetime,
+    interval_s: int = settings.ANCHOR_INTERVAL_S,
+    max_records: int = settings.ANCHOR_MAX_RECORDS,
+) -> Optional[AnchorBatch]:
+    """
+    Regroupe les enregistrements en attente dans un AnchorBatch PENDING si
+    le plus ancien a dépassé l'intervalle ou si le lot est plein.
+    """
+    rows = (
+        db.query(AnchorRecord.id, AnchorRecord.leaf, AnchorRecord.created_at)
+        .filter(AnchorRecord.batch_id.is_(None))
+        .order_by(AnchorRecord.id)
+        .limit(max_records)
+        .all()
+    )
+    if not rows:
+        return None
+    if len(rows) < max_records and rows[0].created_at > now - timedelta(seconds=interval_s):
+        return None
+
+    batch = AnchorBatch(
+        root=merkle_root([r.leaf for r in rows]),
+        record_count=len(rows),
+        status=AnchorStatus.PENDING,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    db.add(batch)
+    db.flush()
+
+    ids = [r.id for r in rows]
+    claimed = (
+        db.query(AnchorRecord)
+        .filter(AnchorRecord.id.in_(ids), AnchorRecord.batch_id.is_(None))
+        .update({AnchorRecord.batch_id: batch.id}, synchronize_session=False)
+    )
+    if claimed != len(ids):
+        # un autre réplica a scellé une partie de ces enregistrements
+        db.rollback()
+        return None
+    db.commit()
+    print(f"[ANCHOR] batch {batch.id} sealed: {len(ids)} record(s), root {batch.root[:16]}...")
+    return batch
+
+
+def build_anchor_tx(wallet, root: str) -> AccountSet:
+    # AccountSet sans champ : aucun effet sur le compte, porte le Memo
+    return AccountSet(
+        account=wallet.address,
+        memos=[Memo(memo_type=ANCHOR_MEMO_TYPE, memo_data=root.upper())],
+    )
+
+
+def anchor_proof(db: Session, kind: str, ref_id: int) -> Optional[dict]:
+    """
+    Preuve d'inclusion du dernier enregistrement (kind, ref_id) dans la
+    racine de son lot. None si absent ou pas encore regroupé.
+    """
+    record = (
+        db.query(AnchorRecord)
+        .filter(AnchorRecord.kind == kind, AnchorRecord.ref_id == ref_id)
+        .order_by(AnchorRecord.id.desc())
+        .first()
+    )
+    if record is None or record.batch_id is None:
+        return None
+    batch = db.get(AnchorBatch, record.batch_id)
+
+    leaves = [
+        (rid, leaf)
+        for rid, leaf in db.query(AnchorRecord.id, AnchorRecord.leaf)
+        .filter(AnchorRecord.batch_id == batch.id)
+        .order_by(AnchorRecord.id)
+    ]
+    index = next(i for i, (rid, _) in enumerate(leaves) if rid == record.id)
+    hashes = [leaf for _, leaf in leaves]
+    return {
+        "record_id": record.id,
+        "kind": record.kind,
+        "ref_id": record.ref_id,
+        "payload": json.loads(record.payload),
+        "leaf": record.leaf,
+        "batch_id": batch.id,
+        "batch_status": batch.status,
+        "root": batch.root,
+        "tx_hash": batch.tx_hash,
+        "ledger_index": batch.ledger_index,
+        "proof": merkle_proof(hashes, index),
+    }
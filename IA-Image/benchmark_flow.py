@@ -0,0 +1,188 @@
+# benchmark_flow.py
+"""
+Benchmark hors ligne du parcours complet donate -> escrow -> evidence ->
+verdict -> finish, sur le ledger simulé (xrpl_sim.py) et une base SQLite
+temporaire. Aucun serveur uvicorn ni réseau XRPL nécessaire.
+
+    python benchmark_flow.py --projects 50 --donations 2000
+    python benchmark_flow.py --donations 5000 --latency-ms 20 --lost-rate 0.01
+
+Les variables d'environnement sont posées AVANT d'importer l'application
+(settings est lu à l'import).
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--projects", type=int, default=20)
+    p.add_argument("--donations", type=int, default=1000)
+    p.add_argument("--threads", type=int, default=16)
+    p.add_argument("--close-interval", type=float, default=0.05)
+    p.add_argument("--latency-ms", type=float, default=0.0)
+    p.add_argument("--failure-rate", type=float, default=0.0)
+    p.add_argument("--lost-rate", type=float, default=0.0)
+    return p.parse_args()
+
+
+def configure(args) -> str:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="xrpact-bench-"), "bench.db")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "XRPL_MOCK": "false",
+        "XRPL_SIMULATOR": "true",
+        "XRPL_SIM_CLOSE_INTERVAL_S": str(args.close_interval),
+        "XRPL_SIM_LATENCY_MS": str(args.latency_ms),
+        "XRPL_SIM_FAILURE_RATE": str(args.failure_rate),
+        "XRPL_SIM_LOST_RESPONSE_RATE": str(args.lost_rate),
+        # même fenêtre en secondes qu'en réel (~20 ledgers de 3,5 s) malgré
+        # des fermetures de ledger accélérées
+        "TX_LEDGER_WINDOW": str(max(20, int(70 / args.close_interval))),
+        # l'outbox est vidée explicitement pour chronométrer l'étape
+        "OUTBOX_WORKER_ENABLED": "false",
+        "OUTBOX_BATCH_SIZE": "200",
+    })
+    return db_path
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    dt = time.perf_counter() - t0
+    return result, dt
+
+
+def report(title, count, dt):
+    rate = count / dt if dt > 0 else float("inf")
+    print(f"[BENCH] {title:<22} {count:>6} en {dt:7.2f} s  ({rate:8.1f} /s)")
+
+
+def main():
+    args = parse_args()
+    db_path = configure(args)
+
+    from fastapi.testclient import TestClient
+    from xrpl.wallet import Wallet
+
+    import main as app_module
+    from database import SessionLocal
+    from models import Donation, DonationStatus, EscrowOutbox, OutboxStatus
+    from outbox_worker import outbox_worker
+    from xrpl_client import client as ledger
+
+    print(f"[BENCH] base {db_path}")
+    http = TestClient(app_module.app)
+    image = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puits_test.jpg")
+
+    # 1) projets
+    deadline = (datetime.utcnow() + timedelta(days=7)).isoformat()
+    projects = []
+    for i in range(args.projects):
+        r = http.post("/projects", json={
+            "title": f"Projet bench {i}",
+            "description": "benchmark",
+            "ong_address": Wallet.create().address,
+            "latitude": 14.69 + i * 0.01,
+            "longitude": -17.44,
+            "deadline": deadline,
+            "amount_target": 1000.0,
+        })
+        r.raise_for_status()
+        projects.append(r.json())
+
+    # 2) donations (concurrentes : group commit + outbox)
+    def _donate(i):
+        project = projects[i % len(projects)]
+        r = http.post(f"/projects/{project['id']}/donate", json={
+            "donor_address": f"rDonor{i}",
+            "amount_xrp": 10.0,
+        })
+        r.raise_for_status()
+
+    with ThreadPoolExecutor(args.threads) as pool:
+        _, dt = timed(lambda: list(pool.map(_donate, range(args.donations))))
+    report("donate (HTTP)", args.donations, dt)
+
+    # 3) création on-chain des escrows via l'outbox
+    def _drain_outbox():
+        while True:
+            outbox_worker.run_once()
+            db = SessionLocal()
+            try:
+                left = db.query(EscrowOutbox).filter(
+                    EscrowOutbox.status.in_([OutboxStatus.PENDING, OutboxStatus.SUBMITTED])
+                ).count()
+            finally:
+                db.close()
+            if left == 0:
+                return
+            time.sleep(args.close_interval)
+
+    _, dt = timed(_drain_outbox)
+    report("EscrowCreate validés", args.donations, dt)
+
+    # 4) preuves (2 validateurs proches par projet), en bulk
+    now = datetime.utcnow().isoformat()
+    items = [
+        {
+            "project_id": p["id"],
+            "validator_address": f"rBenchValidator{k}",
+            "image_url": image,
+            "latitude": p["latitude"] + 0.001,
+            "longitude": p["longitude"],
+            "timestamp": now,
+            "wallet_signature": "BENCH",
+        }
+        for p in projects
+        for k in range(2)
+    ]
+    r, dt = timed(lambda: http.post("/evidence/bulk", json=items))
+    r.raise_for_status()
+    report("evidence (bulk)", len(items), dt)
+
+    # 5) verdicts + finish / cancel pipelinés
+    def _verdicts():
+        out = []
+        for p in projects:
+            r = http.post(f"/projects/{p['id']}/verdict")
+            r.raise_for_status()
+            out.append(r.json())
+        return out
+
+    verdicts, dt = timed(_verdicts)
+    report("verdicts", len(verdicts), dt)
+    settled = sum(v["escrows"]["settled"] for v in verdicts)
+    failed = sum(v["escrows"]["failed"] for v in verdicts)
+    decisions = {}
+    for v in verdicts:
+        d = v["verdict"]["decision"]
+        decisions[d] = decisions.get(d, 0) + 1
+
+    # 6) bilan : base vs ledger simulé
+    db = SessionLocal()
+    try:
+        by_status = {
+            s.value: db.query(Donation).filter(Donation.status == s).count()
+            for s in DonationStatus
+        }
+    finally:
+        db.close()
+
+    print(f"[BENCH] décisions       {decisions}")
+    print(f"[BENCH] escrows réglés  {settled} (échecs {failed})")
+    print(f"[BENCH] donations       {by_status}")
+    print(f"[BENCH] ledger          index={ledger.ledger_index} "
+          f"escrows ouverts={len(ledger.escrows)} tx={len(ledger.txs)}")
+    print(f"[BENCH] requêtes XRPL   {ledger.stats}")
+
+    app_module.write_queue.stop()
+    ledger.stop()
+
+
+if __name__ == "__main__":
+    main()
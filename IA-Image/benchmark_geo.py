@@ -0,0 +1,107 @@
+# benchmark_geo.py
+"""
+Benchmark du noyau haversine (geo.py) : boucle Python sur l'ancienne
+fonction scalaire (math) vs lot NumPy float64 / float32, de 10^3 à 10^6
+points.
+
+  - une cible  : N points contre un projet (score GPS, top_k validateurs)
+  - M cibles   : N points contre M projets (validator_assignment)
+
+    python benchmark_geo.py [--sizes 1000 10000 100000 1000000] [--targets 100]
+"""
+import argparse
+import time
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, haversine_km_batch
+
+# au-delà, la boucle scalaire est extrapolée depuis cette taille
+_SCALAR_MAX = 100_000
+
+
+def _haversine_math(lat1, lon1, lat2, lon2) -> float:
+    # implémentation scalaire historique (référence de la boucle)
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _points(rng: np.random.Generator, n: int):
+    return rng.uniform(-90.0, 90.0, n), rng.uniform(-180.0, 180.0, n)
+
+
+def bench_one_target(rng: np.random.Generator, n: int, repeat: int) -> None:
+    lat, lon = _points(rng, n)
+    lat_l, lon_l = lat.tolist(), lon.tolist()
+    t_lat, t_lon = 14.7, -17.4
+
+    m = min(n, _SCALAR_MAX)
+    t_scalar = _best_of(lambda: [_haversine_math(t_lat, t_lon, a, b) for a, b in zip(lat_l[:m], lon_l[:m])], 1) * n / m
+    lat32, lon32 = lat.astype(np.float32), lon.astype(np.float32)
+    t64 = _best_of(lambda: haversine_km_batch(t_lat, t_lon, lat, lon), repeat)
+    t32 = _best_of(lambda: haversine_km_batch(t_lat, t_lon, lat32, lon32, dtype=np.float32), repeat)
+
+    err = np.abs(
+        haversine_km_batch(t_lat, t_lon, lat32, lon32, dtype=np.float32)
+        - haversine_km_batch(t_lat, t_lon, lat32, lon32)
+    ).max()
+    extrapolated = "*" if m < n else " "
+    print(
+        f"[BENCH] 1 target  n={n:>8}  scalar {t_scalar * 1e3:9.1f} ms{extrapolated} "
+        f"f64 {t64 * 1e3:7.2f} ms (x{t_scalar / t64:6.0f})  "
+        f"f32 {t32 * 1e3:7.2f} ms (x{t_scalar / t32:6.0f})  f32 max err {err * 1e3:.1f} m"
+    )
+
+
+def bench_many_targets(rng: np.random.Generator, n: int, targets: int, repeat: int) -> None:
+    # N points répartis en blocs de `targets` cibles : matrice (N / M, M)
+    rows = max(1, n // targets)
+    lat, lon = _points(rng, rows)
+    t_lat, t_lon = _points(rng, targets)
+    lat, lon = lat[:, None], lon[:, None]
+
+    m = min(rows, max(1, _SCALAR_MAX // targets))
+    pairs = [(a, b, c, d) for a, b in zip(lat[:m, 0].tolist(), lon[:m, 0].tolist())
+             for c, d in zip(t_lat.tolist(), t_lon.tolist())]
+    t_scalar = _best_of(lambda: [_haversine_math(*p) for p in pairs], 1) * rows / m
+    t64 = _best_of(lambda: haversine_km_batch(lat, lon, t_lat, t_lon), repeat)
+    t32 = _best_of(
+        lambda: haversine_km_batch(lat, lon, t_lat, t_lon, dtype=np.float32), repeat
+    )
+    extrapolated = "*" if m < rows else " "
+    print(
+        f"[BENCH] {targets} targets n={rows * targets:>8}  scalar {t_scalar * 1e3:9.1f} ms{extrapolated} "
+        f"f64 {t64 * 1e3:7.2f} ms (x{t_scalar / t64:6.0f})  "
+        f"f32 {t32 * 1e3:7.2f} ms (x{t_scalar / t32:6.0f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du noyau haversine")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--targets", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for n in args.sizes:
+        bench_one_target(rng, n, args.repeat)
+    for n in args.sizes:
+        bench_many_targets(rng, n, args.targets, args.repeat)
+    print("[BENCH] * scalaire extrapolé au-delà de", _SCALAR_MAX, "points")
+
+
+if __name__ == "__main__":
+    main()
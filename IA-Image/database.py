@@ -1,17 +1,88 @@
 # database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.orm import sessionmaker, declarative_base
 from settings import settings
+from db_metrics import instrument_engine
 
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False},  # pour SQLite
 )
+instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _relax_not_null(conn, table, columns, existing) -> None:
+    """Colonnes NOT NULL en base devenues nullables dans le modèle."""
+    if conn.dialect.name == "postgresql":
+        for name in columns:
+            conn.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL'))
+        return
+
+    # SQLite ne sait pas modifier une colonne : nouvelle table au schéma du
+    # modèle, copie des lignes, échange (index recréés par ensure_schema)
+    tmp = table.to_metadata(Base.metadata, name=f"{table.name}__migrate")
+    try:
+        conn.execute(CreateTable(tmp))
+    finally:
+        Base.metadata.remove(tmp)
+    copied = ", ".join(c.name for c in table.columns if c.name in existing)
+    conn.execute(text(f"INSERT INTO {tmp.name} ({copied}) SELECT {copied} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {tmp.name} RENAME TO {table.name}"))
+    print(f"[DB] {table.name} rebuilt: {', '.join(columns)} now nullable")
+
+
+def ensure_schema() -> None:
+    """
+    create_all() ne crée que les nouvelles tables (et leurs index) :
+    on ajoute les colonnes nullables et les index manquants sur une base
+    déjà existante, et on lève les NOT NULL des colonnes devenues
+    nullables (pas d'outil de migration dans le POC).
+    """
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            db_columns = {c["name"]: c for c in insp.get_columns(table.name)}
+            existing = set(db_columns)
+            relaxed = [
+                col.name
+                for col in table.columns
+                if col.name in db_columns and col.nullable and not db_columns[col.name]["nullable"]
+            ]
+            if relaxed:
+                _relax_not_null(conn, table, relaxed, existing)
+                if conn.dialect.name != "postgresql":
+                    continue  # table recréée avec toutes les colonnes du modèle
+            for col in table.columns:
+                if col.name in existing or not col.nullable:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}')
+                )
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def dialect_insert(db):
+    """insert() du dialecte courant (nécessaire pour ON CONFLICT)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        return pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    return sqlite_insert
+
+
 def get_db():
     from sqlalchemy.orm import Session
     db: Session = SessionLocal()
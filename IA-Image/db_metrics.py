@@ -0,0 +1,186 @@
+# db_metrics.py
+"""
+Instrumentation SQLAlchemy :
+  - nombre de requêtes SQL et temps DB cumulé par requête HTTP (contextvar) ;
+    les opérations de la file group-commit sont comptées pour la requête
+    qui les a déposées (attributed_to)
+  - log des requêtes lentes (paramètres masqués)
+  - compteurs agrégés par route, exposés par GET /metrics
+  - mode strict : une route qui dépasse son budget de requêtes lève
+    QueryBudgetExceeded (fait échouer les tests via TestClient)
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from settings import settings
+
+
+# Budget de requêtes SQL par route ("METHOD /path/template").
+# Les routes absentes utilisent settings.DB_QUERY_BUDGET_DEFAULT (0 = pas de budget).
+ROUTE_QUERY_BUDGETS: Dict[str, int] = {
+    "GET /projects": 1,
+    "POST /projects": 2,
+    # écritures de la file group-commit comprises (write_queue.py)
+    # projet + insertion (pool réservé en mode agrégé, statut du projet)
+    "POST /projects/{project_id}/donate": 5,
+    "GET /donations/{donation_id}": 1,
+    "GET /donations/{donation_id}/pool-proof": 3,
+    # projet(s) + upsert validateurs, projets et paires (projet, validateur)
+    # des agrégats, upsert des agrégats, insertion des evidences
+    "POST /projects/{project_id}/evidence": 6,
+    "POST /evidence/bulk": 6,
+    "GET /anchors/{kind}/{ref_id}/proof": 3,
+    # 8 (dont les pools LOCKED, enregistrement d'ancrage du verdict) + 5 de
+    # réputation (validateurs du projet, issues précédentes, upsert des
+    # issues, update validateurs, reputation_sum des projets ouverts) + 4
+    # quand des evidences restent à scorer (update evidences, enregistrements
+    # d'ancrage des scores, agrégats, refresh) + 2 pour le bail du projet
+    # (prise conditionnelle, restitution) + 3 pour le règlement (executemany
+    # donations, pools, donations des pools ; +2 si des tx échouent)
+    "POST /projects/{project_id}/verdict": 22,
+}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class RequestQueryStats:
+    queries: int = 0
+    db_time_ms: float = 0.0
+    # la requête et le thread de la file group-commit peuvent compter en même temps
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+
+@dataclass
+class RouteQueryStats:
+    requests: int = 0
+    queries: int = 0
+    db_time_ms: float = 0.0
+    max_queries: int = 0
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar(
+    "db_query_stats", default=None
+)
+
+_lock = threading.Lock()
+_routes: Dict[str, RouteQueryStats] = {}
+# requêtes hors contexte HTTP (workers, jobs, écritures déposées hors requête)
+_background = RouteQueryStats()
+
+
+# ---------- Hooks SQLAlchemy ----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000.0
+
+    stats = _current.get()
+    if stats is not None:
+        with stats.lock:
+            stats.queries += 1
+            stats.db_time_ms += elapsed_ms
+    else:
+        with _lock:
+            _background.queries += 1
+            _background.db_time_ms += elapsed_ms
+
+    if elapsed_ms >= settings.DB_SLOW_QUERY_MS:
+        print(
+            f"[DB_METRICS] slow query {elapsed_ms:.1f} ms: {' '.join(statement.split())} "
+            f"params={_redact(parameters, executemany)}"
+        )
+
+
+def _redact(parameters, executemany: bool) -> str:
+    # on ne logge jamais les valeurs (adresses, signatures, secrets d'escrow)
+    if executemany:
+        return f"<redacted: {len(parameters)} rows>"
+    return f"<redacted: {len(parameters or ())} values>"
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- Contexte par requête HTTP ----------
+
+def start_request() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    _current.set(stats)
+    return stats
+
+
+def current() -> Optional[RequestQueryStats]:
+    """Stats de la requête HTTP en cours (None hors requête)."""
+    return _current.get()
+
+
+@contextmanager
+def attributed_to(stats: Optional[RequestQueryStats]):
+    """Requêtes du bloc comptées pour `stats`, depuis n'importe quel thread."""
+    token = _current.set(stats)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def finish_request(route_key: str, stats: RequestQueryStats) -> None:
+    _current.set(None)
+
+    with _lock:
+        agg = _routes.setdefault(route_key, RouteQueryStats())
+        agg.requests += 1
+        agg.queries += stats.queries
+        agg.db_time_ms += stats.db_time_ms
+        agg.max_queries = max(agg.max_queries, stats.queries)
+
+    budget = ROUTE_QUERY_BUDGETS.get(route_key, settings.DB_QUERY_BUDGET_DEFAULT)
+    if budget and stats.queries > budget:
+        msg = f"{route_key} issued {stats.queries} SQL queries (budget {budget})"
+        if settings.DB_QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(msg)
+        print(f"[DB_METRICS] {msg}")
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "routes": {
+                key: {
+                    "requests": s.requests,
+                    "queries": s.queries,
+                    "db_time_ms": round(s.db_time_ms, 3),
+                    "avg_queries": s.queries / s.requests if s.requests else 0.0,
+                    "max_queries": s.max_queries,
+                }
+                for key, s in _routes.items()
+            },
+            "background": {
+                "queries": _background.queries,
+                "db_time_ms": round(_background.db_time_ms, 3),
+            },
+        }
+
+
+def reset() -> None:
+    global _background
+    with _lock:
+        _routes.clear()
+        _background = RouteQueryStats()
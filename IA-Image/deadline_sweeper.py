@@ -0,0 +1,334 @@
+# deadline_sweeper.py
+"""
+Verdicts et règlements automatiques à l'échéance des projets.
+
+Sans lui, un escrow LOCKED dont la deadline est passée n'est réglé que si
+quelqu'un appelle POST /projects/{id}/verdict. Le sweeper :
+  1. garde en mémoire une file de priorité (heap) des projets non soldés
+     triés par deadline, rechargée par une requête indexée
+     (ix_projects_swept_deadline) limitée à l'horizon DEADLINE_SWEEP_HORIZON_S
+  2. dort jusqu'à la prochaine deadline (ou le prochain rechargement)
+  3. prend un bail (lease_owner / lease_until) sur les projets échus par un
+     UPDATE conditionnel : plusieurs réplicas peuvent tourner sans traiter
+     deux fois le même projet
+  4. lance decide_project_verdicts (un lot) pour ceux qui n'ont pas encore
+     de verdict
+  5. soumet les finish / cancel de TOUS les projets du passage en un seul
+     lot pipeliné (settlement.settle_jobs)
+  6. marque swept_at quand plus rien n'est à régler, sinon repousse le
+     projet de DEADLINE_SWEEP_RETRY_S (donations encore PENDING, échecs)
+
+Le même bail est pris par POST /projects/{id}/verdict et /verdicts/batch
+(claim_projects / release_projects) : un projet n'est jamais tranché ni
+réglé par deux chemins à la fois.
+
+Lancement : thread démarré par main.py (DEADLINE_SWEEPER_ENABLED), ou
+`python deadline_sweeper.py` pour un process séparé.
+"""
+import heapq
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import (
+    Donation,
+    DonationStatus,
+    PooledEscrow,
+    PoolStatus,
+    Project,
+    ProjectStatus,
+)
+from settings import settings
+from settlement import build_settlement_jobs, settle_jobs
+from trust_optimizer import decide_project_verdicts
+from tx_pipeline import TxJob
+from xrpl_client import platform_wallet
+
+# verdict déjà rendu : on ne fait plus que régler les escrows restants
+_DECIDED = {
+    ProjectStatus.SUCCESS: "SUCCESS",
+    ProjectStatus.FAILED: "FAILURE",
+}
+
+_UNSETTLED_DONATIONS = (DonationStatus.PENDING, DonationStatus.LOCKED)
+_UNSETTLED_POOLS = (PoolStatus.OPEN, PoolStatus.SEALED, PoolStatus.LOCKED)
+
+
+def lease_owner(kind: Optional[str] = None) -> str:
+    """Identifiant de bail : réplica, et appel précis pour `kind` (verdict, batch)."""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{owner}:{kind}:{uuid.uuid4().hex[:8]}" if kind else owner
+
+
+def claim_projects(
+    db: Session,
+    project_ids: List[int],
+    owner: str,
+    until: datetime,
+    now: datetime,
+    *criteria,
+) -> List[Project]:
+    """
+    Bail sur les projets libres (lease_until vide ou échu) par un UPDATE
+    conditionnel, commité. Renvoie les projets obtenus par CET appel.
+    """
+    db.query(Project).filter(
+        Project.id.in_(project_ids),
+        or_(Project.lease_until.is_(None), Project.lease_until < now),
+        *criteria,
+    ).update(
+        {Project.lease_owner: owner, Project.lease_until: until},
+        synchronize_session=False,
+    )
+    db.commit()
+    # seuls les baux posés par CE passage (même owner et même échéance)
+    return (
+        db.query(Project)
+        .filter(
+            Project.id.in_(project_ids),
+            Project.lease_owner == owner,
+            Project.lease_until == until,
+        )
+        .order_by(Project.id)
+        .all()
+    )
+
+
+def release_projects(db: Session, project_ids: List[int], owner: str) -> None:
+    """Rend les baux encore détenus par `owner` (le sweeper peut repasser)."""
+    if not project_ids:
+        return
+    db.query(Project).filter(Project.id.in_(project_ids), Project.lease_owner == owner).update(
+        {Project.lease_owner: None, Project.lease_until: None},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+class DeadlineSweeper:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        wallet=platform_wallet,
+        horizon_s: int = settings.DEADLINE_SWEEP_HORIZON_S,
+        refresh_s: float = settings.DEADLINE_SWEEP_REFRESH_S,
+        batch_size: int = settings.DEADLINE_SWEEP_BATCH,
+        lease_s: int = settings.DEADLINE_SWEEP_LEASE_S,
+        retry_s: int = settings.DEADLINE_SWEEP_RETRY_S,
+        owner: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.wallet = wallet
+        self.horizon = timedelta(seconds=horizon_s)
+        self.refresh_s = refresh_s
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_s)
+        self.retry = timedelta(seconds=retry_s)
+        self.owner = owner or lease_owner()
+
+        # (échéance, project_id)
+        self._heap: List[Tuple[datetime, int]] = []
+        self._loaded_at: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- File de priorité ----------
+
+    def _refill(self, db: Session, now: datetime) -> None:
+        # projet sous bail (autre réplica, ou en attente de nouvel essai) :
+        # pas avant l'expiration du bail. Trié et borné sur cette échéance
+        # en SQL, sinon les projets repoussés en échec occupent la limite
+        # et masquent les nouvelles deadlines.
+        due_at = case(
+            (Project.lease_until > Project.deadline, Project.lease_until),
+            else_=Project.deadline,
+        )
+        until = now + self.horizon
+        rows = (
+            db.query(due_at.label("due_at"), Project.id)
+            .filter(
+                Project.swept_at.is_(None),
+                Project.deadline <= until,
+                due_at <= until,
+            )
+            .order_by(due_at, Project.id)
+            .limit(self.batch_size * 20)
+            .all()
+        )
+        self._heap = [(r.due_at, r.id) for r in rows]
+        heapq.heapify(self._heap)
+        self._loaded_at = now
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due: List[int] = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def next_wakeup(self, now: datetime) -> float:
+        """Secondes avant la prochaine deadline connue ou le prochain rechargement."""
+        wait = self.refresh_s
+        if self._heap:
+            wait = min(wait, (self._heap[0][0] - now).total_seconds())
+        return max(wait, 0.0)
+
+    # ---------- Baux ----------
+
+    def _claim(self, db: Session, project_ids: List[int], now: datetime) -> List[Project]:
+        return claim_projects(
+            db, project_ids, self.owner, now + self.lease, now, Project.swept_at.is_(None)
+        )
+
+    def _release(self, db: Session, done: List[int], retry: List[int], now: datetime) -> None:
+        if done:
+            db.query(Project).filter(Project.id.in_(done)).update(
+                {Project.swept_at: now, Project.lease_owner: None, Project.lease_until: None},
+                synchronize_session=False,
+            )
+        if retry:
+            # le bail sert de délai avant la prochaine tentative
+            db.query(Project).filter(Project.id.in_(retry)).update(
+                {Project.lease_until: now + self.retry},
+                synchronize_session=False,
+            )
+        db.commit()
+
+    # ---------- Un passage ----------
+
+    def _collect_jobs(self, db: Session, projects: List[Project], now: datetime) -> List[TxJob]:
+        decisions: Dict[int, str] = {
+            p.id: _DECIDED[p.status] for p in projects if p.status in _DECIDED
+        }
+        # verdicts manquants du passage en un lot (agrégats, IA vision, réputation)
+        undecided = [p for p in projects if p.id not in decisions]
+        if undecided:
+            for pid, verdict in decide_project_verdicts(db, undecided).items():
+                decisions[pid] = verdict["decision"]
+                print(f"[SWEEPER] project {pid} expired -> {verdict['decision']}")
+
+        ids = list(decisions)
+        donations = (
+            db.query(Donation)
+            .filter(
+                Donation.project_id.in_(ids),
+                Donation.status == DonationStatus.LOCKED,
+                Donation.pool_id.is_(None),
+            )
+            .all()
+        )
+        pools = (
+            db.query(PooledEscrow)
+            .filter(
+                PooledEscrow.project_id.in_(ids),
+                PooledEscrow.status == PoolStatus.LOCKED,
+            )
+            .all()
+        )
+
+        jobs: List[TxJob] = []
+        for d in donations + pools:
+            jobs.extend(build_settlement_jobs(self.wallet, [d], decisions[d.project_id], now))
+        return jobs
+
+    def _still_unsettled(self, db: Session, ids: List[int]) -> set:
+        pending = {
+            pid
+            for (pid,) in db.query(Donation.project_id)
+            .filter(
+                Donation.project_id.in_(ids),
+                Donation.status.in_(_UNSETTLED_DONATIONS),
+                Donation.pool_id.is_(None),
+            )
+            .distinct()
+        }
+        pending |= {
+            pid
+            for (pid,) in db.query(PooledEscrow.project_id)
+            .filter(
+                PooledEscrow.project_id.in_(ids),
+                PooledEscrow.status.in_(_UNSETTLED_POOLS),
+            )
+            .distinct()
+        }
+        return pending
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Traite un lot de projets échus. Renvoie le nombre de projets examinés."""
+        db: Session = self.session_factory()
+        try:
+            now = now or datetime.utcnow()
+            if (
+                not self._heap
+                or self._loaded_at is None
+                or (now - self._loaded_at).total_seconds() >= self.refresh_s
+            ):
+                self._refill(db, now)
+
+            due = self._pop_due(now)
+            if not due:
+                return 0
+            projects = self._claim(db, due, now)
+            if not projects:
+                return len(due)
+
+            jobs = self._collect_jobs(db, projects, now)
+            if jobs:
+                # un seul pipeline de soumission pour tout le passage
+                summary = settle_jobs(db, self.wallet, jobs)
+                print(f"[SWEEPER] {len(projects)} project(s), escrows {summary}")
+
+            ids = [p.id for p in projects]
+            db.expire_all()
+            unsettled = self._still_unsettled(db, ids)
+            self._release(
+                db,
+                done=[pid for pid in ids if pid not in unsettled],
+                retry=[pid for pid in ids if pid in unsettled],
+                now=now,
+            )
+            return len(due)
+        except Exception as e:
+            db.rollback()
+            print(f"[SWEEPER] run error: {e}")
+            return 0
+        finally:
+            db.close()
+
+    # ---------- Boucle ----------
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            if self.run_once() == 0:
+                self._stop.wait(self.next_wakeup(datetime.utcnow()))
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="deadline-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+deadline_sweeper = DeadlineSweeper()
+
+
+if __name__ == "__main__":
+    print(f"[SWEEPER] Started as {deadline_sweeper.owner}")
+    try:
+        deadline_sweeper.run_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,212 @@
+# donation_pool.py
+"""
+Escrows agrégés par projet et par période (DONATION_POOLING_ENABLED).
+
+  - donate : la donation est rattachée au PooledEscrow OPEN du projet (créé
+    au besoin, avec sa condition) ; aucune tx XRPL par donation. Dans les
+    DONATION_POOL_DEADLINE_MARGIN_S avant la deadline, escrow individuel.
+  - seal_due_pools (appelé par outbox_worker) : chaque pool dont la période
+    est écoulée est scellé -> montant figé, racine Merkle des donations,
+    EscrowCreate (Memo = racine) déposé dans l'outbox
+  - course donate / scellement : le rattachement et le scellement sont
+    des UPDATE conditionnels (status OPEN) sur la ligne du pool. Le premier
+    verrouille la ligne jusqu'au commit de la donation ; si le pool a été
+    scellé entre-temps, la donation va dans un nouveau pool. Les membres
+    scellés sont marqués (pool_sealed) : seules ces donations suivent le
+    statut du pool.
+  - verdict : un EscrowFinish / EscrowCancel par pool (settlement.py), les
+    donations du pool suivent son statut
+Les règlements sont donc en O(périodes) et non plus en O(donations).
+
+Feuille d'une donation : sha256("<id>:<donor_address>:<drops>"), feuilles
+triées par id de donation ; pool_proof() renvoie la preuve d'inclusion.
+"""
+import dataclasses
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from xrpl.models.transactions import Memo
+from xrpl.utils import xrp_to_drops
+
+from escrow_service import build_create_tx, generate_secret_and_condition
+from merkle import leaf_hash, merkle_proof, merkle_root
+from models import Donation, EscrowOutbox, PooledEscrow, PoolStatus, Project
+from settings import settings
+
+POOL_MEMO_TYPE = "xrpact/pool-root".encode().hex().upper()
+
+def _deadline_margin() -> timedelta:
+    return timedelta(seconds=settings.DONATION_POOL_DEADLINE_MARGIN_S)
+
+
+def pooling_applies(deadline: datetime, now: datetime) -> bool:
+    """
+    Mode agrégé pour cette donation ? Près de la deadline on repasse en
+    escrow individuel : le pool doit être créé on-chain avant CancelAfter.
+    """
+    return settings.DONATION_POOLING_ENABLED and deadline - now > _deadline_margin()
+
+
+def donation_leaf(donation_id: int, donor_address: str, amount_xrp: float) -> str:
+    return leaf_hash(f"{donation_id}:{donor_address}:{xrp_to_drops(amount_xrp)}")
+
+
+def open_pool_for(
+    s: Session,
+    project_id: int,
+    cancel_after: datetime,
+    owner: str,
+    now: datetime,
+) -> PooledEscrow:
+    """
+    PooledEscrow OPEN (période en cours) du projet, créé s'il n'y en a pas,
+    réservé pour une donation : la ligne reste verrouillée jusqu'au commit
+    de l'appelant, le scellement ne peut pas passer entre les deux.
+    """
+    pool = (
+        s.query(PooledEscrow)
+        .filter(
+            PooledEscrow.project_id == project_id,
+            PooledEscrow.status == PoolStatus.OPEN,
+            PooledEscrow.period_end > now,
+        )
+        .order_by(PooledEscrow.id.desc())
+        .first()
+    )
+    if pool is not None:
+        reserved = (
+            s.query(PooledEscrow)
+            .filter(PooledEscrow.id == pool.id, PooledEscrow.status == PoolStatus.OPEN)
+            .update(
+                {PooledEscrow.donation_count: func.coalesce(PooledEscrow.donation_count, 0) + 1},
+                synchronize_session=False,
+            )
+        )
+        if reserved:
+            return pool
+        # scellé depuis la lecture : nouveau pool pour cette donation
+
+    fulfillment_hex, condition_hex = generate_secret_and_condition()
+    pool = PooledEscrow(
+        project_id=project_id,
+        period_start=now,
+        # scellé (et créé on-chain) avant CancelAfter
+        period_end=min(
+            now + timedelta(seconds=settings.DONATION_POOL_PERIOD_S),
+            cancel_after - _deadline_margin(),
+        ),
+        escrow_owner=owner,
+        condition_hex=condition_hex,
+        fulfillment_hex=fulfillment_hex,
+        cancel_after=cancel_after,
+        status=PoolStatus.OPEN,
+        donation_count=1,
+    )
+    s.add(pool)
+    s.flush()
+    return pool
+
+
+def _pool_leaves(db: Session, pool_id: int, sealed_only: bool = True) -> List[tuple]:
+    q = db.query(Donation.id, Donation.donor_address, Donation.amount_xrp).filter(Donation.pool_id == pool_id)
+    if sealed_only:
+        q = q.filter(Donation.pool_sealed.is_(True))
+    rows = q.order_by(Donation.id).all()
+    return [(r.id, donation_leaf(r.id, r.donor_address, r.amount_xrp), r.amount_xrp) for r in rows]
+
+
+def seal_due_pools(db: Session, donor_wallet, now: datetime, limit: int = 100) -> int:
+    """
+    Scelle les pools OPEN dont la période est écoulée et dépose leur
+    EscrowCreate dans l'outbox (même transaction). Renvoie le nombre scellé.
+    """
+    pools = (
+        db.query(PooledEscrow)
+        .filter(
+            PooledEscrow.status == PoolStatus.OPEN,
+            PooledEscrow.period_end <= now,
+        )
+        .order_by(PooledEscrow.period_end)
+        .limit(limit)
+        .all()
+    )
+    if not pools:
+        return 0
+
+    ong_by_project = dict(
+        db.query(Project.id, Project.ong_address)
+        .filter(Project.id.in_({p.project_id for p in pools}))
+        .all()
+    )
+
+    sealed = 0
+    for pool in pools:
+        # attend le commit d'un donate qui a réservé le pool ; rowcount 0 :
+        # déjà scellé par un autre passage
+        won = (
+            db.query(PooledEscrow)
+            .filter(PooledEscrow.id == pool.id, PooledEscrow.status == PoolStatus.OPEN)
+            .update({PooledEscrow.status: PoolStatus.SEALED}, synchronize_session=False)
+        )
+        if not won:
+            continue
+        leaves = _pool_leaves(db, pool.id, sealed_only=False)
+        if not leaves:
+            pool.status = PoolStatus.FAILED
+            continue
+        sealed += 1
+        db.query(Donation).filter(Donation.id.in_([did for did, _, _ in leaves])).update(
+            {Donation.pool_sealed: True}, synchronize_session=False
+        )
+
+        drops = sum(int(xrp_to_drops(amount)) for _, _, amount in leaves)
+        pool.amount_xrp = drops / 1_000_000
+        pool.donation_count = len(leaves)
+        pool.donations_root = merkle_root([leaf for _, leaf, _ in leaves])
+        pool.status = PoolStatus.SEALED
+
+        tx = build_create_tx(
+            donor_wallet=donor_wallet,
+            ong_address=ong_by_project[pool.project_id],
+            amount_xrp=Decimal(drops) / Decimal(1_000_000),
+            cancel_after=pool.cancel_after,
+            condition_hex=pool.condition_hex,
+        )
+        # racine on-chain : la répartition est vérifiable sans notre base
+        tx = dataclasses.replace(
+            tx, memos=[Memo(memo_type=POOL_MEMO_TYPE, memo_data=pool.donations_root.upper())]
+        )
+        db.add(EscrowOutbox(pool_id=pool.id, tx_json=json.dumps(tx.to_dict())))
+
+    db.commit()
+    print(f"[POOL] {sealed} pooled escrow(s) sealed")
+    return sealed
+
+
+def pool_proof(db: Session, donation: Donation) -> Optional[dict]:
+    """Preuve d'inclusion de la donation dans la racine de son pool scellé."""
+    if donation.pool_id is None:
+        return None
+    pool = db.get(PooledEscrow, donation.pool_id)
+    if pool is None or pool.donations_root is None:
+        return None
+
+    leaves = _pool_leaves(db, pool.id)
+    index = next((i for i, (did, _, _) in enumerate(leaves) if did == donation.id), None)
+    if index is None:
+        return None
+    hashes = [leaf for _, leaf, _ in leaves]
+    return {
+        "donation_id": donation.id,
+        "pool_id": pool.id,
+        "pool_status": pool.status,
+        "escrow_owner": pool.escrow_owner,
+        "escrow_sequence": pool.escrow_sequence,
+        "donations_root": pool.donations_root,
+        "leaf": hashes[index],
+        "proof": merkle_proof(hashes, index),
+    }
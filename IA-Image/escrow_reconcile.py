@@ -0,0 +1,313 @@
+# escrow_reconcile.py
+"""
+Réconciliation en masse base <-> ledger des escrows du wallet plateforme.
+
+Vérifier les donations une par une coûterait un appel RPC par escrow. Ici :
+  1. on pagine account_objects type=escrow (marker, ledger validé figé à la
+     première page) : un appel pour ESCROW_RECONCILE_PAGE_SIZE objets
+  2. chaque page est jointe en mémoire aux lignes de la base par
+     (owner, sequence) : Donation à escrow individuel et PooledEscrow.
+     Si l'objet n'a pas de champ Sequence (rippled sans
+     fixIncludeKeyletFields), la Sequence est retrouvée par
+     PreviousTxnID = hash de l'EscrowCreate dans escrow_outbox
+  3. les escrows vus sont gardés dans un array d'entiers trié (8 octets par
+     escrow) puis les lignes LOCKED de la base sont parcourues en flux
+     (yield_per) pour trouver celles qui n'existent plus on-chain
+Mémoire bornée : une page d'objets + les numéros de séquence.
+
+Divergences (kind) :
+  - unknown_on_ledger : escrow on-chain sans ligne en base
+  - status_mismatch   : escrow on-chain mais ligne non LOCKED
+                        (repair : -> LOCKED, projet remis au sweeper).
+                        Les lignes sont lues après la page, sur un ledger
+                        plus récent : une ligne dont la tx de règlement
+                        (settle_tx_hash) est validée en tesSUCCESS a été
+                        réglée depuis, ce n'est pas une divergence
+                        (compteur settled_after_snapshot)
+  - amount_mismatch   : montant on-chain différent (signalé seulement)
+  - missing_on_ledger : ligne LOCKED sans escrow on-chain
+                        (repair : statut déduit de la tx de règlement
+                        settle_tx_hash si elle est validée en tesSUCCESS)
+
+    python escrow_reconcile.py [--repair]
+"""
+import argparse
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from xrpl.models.requests import AccountObjects, AccountObjectType, Tx
+from xrpl.utils import xrp_to_drops
+
+from database import SessionLocal
+from models import (
+    Donation,
+    DonationStatus,
+    EscrowOutbox,
+    PooledEscrow,
+    PoolStatus,
+    Project,
+)
+from settings import settings
+
+Divergence = Dict[str, object]
+
+# statut final selon le type de la tx de règlement validée
+_SETTLED_BY = {
+    "EscrowFinish": "RELEASED",
+    "EscrowCancel": "REFUNDED",
+}
+
+
+def iter_escrow_objects(client, account: str, page_size: int) -> Iterator[List[dict]]:
+    """Pages d'objets Escrow du compte, sur un même ledger validé."""
+    marker = None
+    ledger_index = "validated"
+    while True:
+        resp = client.request(
+            AccountObjects(
+                account=account,
+                type=AccountObjectType.ESCROW,
+                limit=page_size,
+                marker=marker,
+                ledger_index=ledger_index,
+            )
+        )
+        if not resp.is_successful():
+            raise RuntimeError(f"account_objects failed: {resp.result}")
+        result = resp.result
+        # pages suivantes sur le même ledger : vue cohérente malgré les fermetures
+        ledger_index = result.get("ledger_index", ledger_index)
+        yield result.get("account_objects", [])
+        marker = result.get("marker")
+        if marker is None:
+            return
+
+
+def _drops(amount_xrp: Optional[float]) -> Optional[int]:
+    return int(xrp_to_drops(amount_xrp)) if amount_xrp is not None else None
+
+
+class _Row:
+    __slots__ = ("model", "id", "project_id", "status", "drops", "settle_tx_hash")
+
+    def __init__(self, model, id, project_id, status, drops, settle_tx_hash):
+        self.model = model
+        self.id = id
+        self.project_id = project_id
+        self.status = status
+        self.drops = drops
+        self.settle_tx_hash = settle_tx_hash
+
+
+def _resolve_sequences(db: Session, objects: List[dict]) -> Dict[str, int]:
+    """PreviousTxnID -> Sequence pour les objets sans champ Sequence."""
+    hashes = [o["PreviousTxnID"] for o in objects if "Sequence" not in o and o.get("PreviousTxnID")]
+    if not hashes:
+        return {}
+    return dict(
+        db.query(EscrowOutbox.tx_hash, EscrowOutbox.sequence)
+        .filter(EscrowOutbox.tx_hash.in_(hashes))
+        .all()
+    )
+
+
+def _rows_for(db: Session, owner: str, sequences: List[int]) -> Dict[int, _Row]:
+    rows: Dict[int, _Row] = {}
+    if not sequences:
+        return rows
+    for r in db.query(
+        Donation.id, Donation.project_id, Donation.status, Donation.amount_xrp, Donation.escrow_sequence,
+        Donation.settle_tx_hash,
+    ).filter(
+        Donation.escrow_owner == owner,
+        Donation.escrow_sequence.in_(sequences),
+        Donation.pool_id.is_(None),
+    ):
+        rows[r.escrow_sequence] = _Row(
+            Donation, r.id, r.project_id, r.status, _drops(r.amount_xrp), r.settle_tx_hash
+        )
+    for r in db.query(
+        PooledEscrow.id, PooledEscrow.project_id, PooledEscrow.status, PooledEscrow.amount_xrp,
+        PooledEscrow.escrow_sequence, PooledEscrow.settle_tx_hash,
+    ).filter(
+        PooledEscrow.escrow_owner == owner,
+        PooledEscrow.escrow_sequence.in_(sequences),
+    ):
+        rows[r.escrow_sequence] = _Row(
+            PooledEscrow, r.id, r.project_id, r.status, _drops(r.amount_xrp), r.settle_tx_hash
+        )
+    return rows
+
+
+def _relock(db: Session, row: _Row) -> None:
+    model = row.model
+    db.query(model).filter(model.id == row.id).update(
+        {model.status: "LOCKED"}, synchronize_session=False
+    )
+    if model is PooledEscrow:
+        db.query(Donation).filter(Donation.pool_id == row.id, Donation.pool_sealed.is_(True)).update(
+            {Donation.status: DonationStatus.LOCKED}, synchronize_session=False
+        )
+    # le sweeper doit repasser sur ce projet
+    db.query(Project).filter(Project.id == row.project_id).update(
+        {Project.swept_at: None}, synchronize_session=False
+    )
+
+
+def _settled_status(client, tx_hash: Optional[str]) -> Optional[str]:
+    """Statut final si la tx de règlement est validée en tesSUCCESS, sinon None."""
+    if not tx_hash:
+        return None
+    resp = client.request(Tx(transaction=tx_hash))
+    r = resp.result
+    if not (resp.is_successful() and r.get("validated")):
+        return None
+    if r["meta"]["TransactionResult"] != "tesSUCCESS":
+        return None
+    tx_type = r.get("TransactionType") or r.get("tx_json", {}).get("TransactionType")
+    return _SETTLED_BY.get(tx_type)
+
+
+def _settle_from_tx(db: Session, client, model, row_id: int, tx_hash: Optional[str]) -> bool:
+    """Applique le statut final si la tx de règlement est validée en tesSUCCESS."""
+    status = _settled_status(client, tx_hash)
+    if status is None:
+        return False
+    db.query(model).filter(model.id == row_id).update(
+        {model.status: status}, synchronize_session=False
+    )
+    if model is PooledEscrow:
+        db.query(Donation).filter(
+            Donation.pool_id == row_id, Donation.status == DonationStatus.LOCKED
+        ).update({Donation.status: status}, synchronize_session=False)
+    return True
+
+
+def reconcile_escrows(
+    db: Session,
+    client,
+    account: str,
+    repair: bool = False,
+    page_size: int = settings.ESCROW_RECONCILE_PAGE_SIZE,
+    on_divergence: Optional[Callable[[Divergence], None]] = None,
+) -> Dict[str, int]:
+    """
+    Compare les escrows on-chain de account à la base. Les divergences sont
+    passées à on_divergence au fil de l'eau (rien n'est accumulé) ; renvoie
+    les compteurs par type. repair=True corrige ce qui peut l'être (commit
+    par page).
+    """
+    counts: Dict[str, int] = {"on_ledger": 0, "repaired": 0}
+    seen = array("q")
+
+    def _report(kind: str, **info) -> None:
+        counts[kind] = counts.get(kind, 0) + 1
+        if on_divergence is not None:
+            on_divergence({"kind": kind, **info})
+
+    # 1) ledger -> base, page par page
+    for objects in iter_escrow_objects(client, account, page_size):
+        counts["on_ledger"] += len(objects)
+        by_hash = _resolve_sequences(db, objects)
+
+        keyed: List[Tuple[int, dict]] = []
+        for obj in objects:
+            seq = obj.get("Sequence", by_hash.get(obj.get("PreviousTxnID")))
+            if seq is None:
+                _report("unknown_on_ledger", escrow=obj.get("index"),
+                        previous_txn_id=obj.get("PreviousTxnID"), amount=obj.get("Amount"))
+                continue
+            keyed.append((int(seq), obj))
+            seen.append(int(seq))
+
+        rows = _rows_for(db, account, [seq for seq, _ in keyed])
+        for seq, obj in keyed:
+            row = rows.get(seq)
+            if row is None:
+                _report("unknown_on_ledger", sequence=seq, escrow=obj.get("index"),
+                        amount=obj.get("Amount"), destination=obj.get("Destination"))
+                continue
+            if row.drops is not None and row.drops != int(obj["Amount"]):
+                _report("amount_mismatch", model=row.model.__tablename__, id=row.id,
+                        sequence=seq, stored=row.drops, on_ledger=int(obj["Amount"]))
+            if row.status != "LOCKED":
+                if _settled_status(client, row.settle_tx_hash) == row.status:
+                    # réglé après la page (lignes lues plus tard) : pas de relock
+                    counts["settled_after_snapshot"] = counts.get("settled_after_snapshot", 0) + 1
+                    continue
+                _report("status_mismatch", model=row.model.__tablename__, id=row.id,
+                        sequence=seq, stored=str(row.status.value), on_ledger="LOCKED")
+                if repair:
+                    _relock(db, row)
+                    counts["repaired"] += 1
+        if repair:
+            db.commit()
+
+    # 2) base -> ledger : lignes LOCKED absentes des escrows vus
+    seen = array("q", sorted(seen))
+
+    def _on_ledger(seq: int) -> bool:
+        i = bisect_left(seen, seq)
+        return i < len(seen) and seen[i] == seq
+
+    sources = (
+        (Donation, db.query(Donation.id, Donation.escrow_sequence, Donation.settle_tx_hash).filter(
+            Donation.escrow_owner == account,
+            Donation.status == DonationStatus.LOCKED,
+            Donation.pool_id.is_(None),
+        )),
+        (PooledEscrow, db.query(PooledEscrow.id, PooledEscrow.escrow_sequence, PooledEscrow.settle_tx_hash).filter(
+            PooledEscrow.escrow_owner == account,
+            PooledEscrow.status == PoolStatus.LOCKED,
+        )),
+    )
+    fixes: List[Tuple[object, int, Optional[str]]] = []
+    for model, query in sources:
+        for r in query.yield_per(1000):
+            if r.escrow_sequence is not None and _on_ledger(r.escrow_sequence):
+                continue
+            _report("missing_on_ledger", model=model.__tablename__, id=r.id,
+                    sequence=r.escrow_sequence, settle_tx_hash=r.settle_tx_hash)
+            if repair:
+                fixes.append((model, r.id, r.settle_tx_hash))
+            if len(fixes) >= page_size:
+                counts["repaired"] += sum(_settle_from_tx(db, client, *f) for f in fixes)
+                fixes = []
+
+    if repair:
+        counts["repaired"] += sum(_settle_from_tx(db, client, *f) for f in fixes)
+        db.commit()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réconciliation base / ledger des escrows")
+    parser.add_argument("--repair", action="store_true", help="corrige les divergences")
+    args = parser.parse_args()
+
+    from xrpl_client import client, platform_wallet
+
+    if client is None:
+        print("[RECONCILE] XRPL_MOCK actif : pas de ledger à réconcilier")
+        return
+
+    db = SessionLocal()
+    try:
+        counts = reconcile_escrows(
+            db,
+            client,
+            platform_wallet.address,
+            repair=args.repair,
+            on_divergence=lambda d: print(f"[RECONCILE] {d}"),
+        )
+    finally:
+        db.close()
+
+    print(f"[RECONCILE] {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,25 +3,65 @@ import secrets
 import hashlib
 import random
 from datetime import datetime, timezone
+from typing import Callable, List, Optional
 
 from xrpl.models.transactions import EscrowCreate, EscrowFinish, EscrowCancel
-from xrpl.transaction import submit_and_wait  # <- OK pour xrpl-py v2
 from xrpl.utils import xrp_to_drops
 
 from xrpl_client import client
 from settings import settings
+from tx_pipeline import TxPipeline, TxJob, TxResult, never_applied
+
+
+def _submit_and_wait(tx, donor_wallet) -> dict:
+    """
+    Soumet une tx seule via TxPipeline : fee et Sequence viennent du cache
+    local (tx_cache) au lieu de l'autofill de xrpl-py (2 requêtes de plus
+    par tx, et même Sequence lue par deux escrows concurrents).
+    """
+    res = TxPipeline(client, donor_wallet).run([(None, tx)])[0]
+    return {
+        **res.raw,
+        "hash": res.tx_hash,
+        "engine_result": res.engine_result,
+        "validated": res.engine_result not in ("expired", "unknown")
+        and not never_applied(res.engine_result),
+    }
 
 
 def generate_secret_and_condition() -> tuple[str, str]:
     """
-    Retourne (fulfillment_hex, condition_hex)
+    Retourne (fulfillment_hex, condition_hex) : crypto-condition
+    PREIMAGE-SHA-256 encodée en DER, seul format accepté par rippled
+    (fulfillment A0228020 + préimage, condition A0258020 + sha256 + coût 32).
     """
     preimage = secrets.token_bytes(32)
-    fulfillment_hex = preimage.hex()
-    condition = hashlib.sha256(preimage).hexdigest()
+    fulfillment_hex = ("A0228020" + preimage.hex()).upper()
+    condition = ("A0258020" + hashlib.sha256(preimage).hexdigest() + "810120").upper()
     return fulfillment_hex, condition
 
 
+def build_create_tx(
+    donor_wallet,
+    ong_address: str,
+    amount_xrp: float,
+    cancel_after: datetime,
+    condition_hex: str,
+) -> EscrowCreate:
+    # XRPL time = Unix time - 946684800 (secondes depuis le 01/01/2000)
+    cancel_after_ripple = int(
+        cancel_after.replace(tzinfo=timezone.utc).timestamp()
+    ) - 946684800
+
+    return EscrowCreate(
+        account=donor_wallet.address,
+        destination=ong_address,
+        amount=xrp_to_drops(amount_xrp),
+        cancel_after=cancel_after_ripple,
+        condition=condition_hex.upper(),
+    )
+
+
 def create_donation_escrow(
     donor_wallet,
     ong_address: str,
@@ -42,28 +82,33 @@ def create_donation_escrow(
             "status": "success",
         }
 
-    # XRPL time = Unix time + 946684800
-    cancel_after_ripple = int(
-        cancel_after.replace(tzinfo=timezone.utc).timestamp()
-    ) + 946684800
+    tx = build_create_tx(donor_wallet, ong_address, amount_xrp, cancel_after, condition_hex)
+
+    return _submit_and_wait(tx, donor_wallet)
 
-    tx = EscrowCreate(
+
+def build_finish_tx(
+    donor_wallet,
+    owner: str,
+    offer_sequence: int,
+    condition_hex: str,
+    fulfillment_hex: str,
+) -> EscrowFinish:
+    return EscrowFinish(
         account=donor_wallet.address,
-        destination=ong_address,
-        amount=xrp_to_drops(amount_xrp),
-        cancel_after=cancel_after_ripple,
+        owner=owner,
+        offer_sequence=offer_sequence,
         condition=condition_hex.upper(),
+        fulfillment=fulfillment_hex,
     )
 
-    # submit_and_wait s’occupe de signer + autofill + submit
-    response = submit_and_wait(
-        tx,
-        client,
-        wallet=donor_wallet,
-        check_fee=True,
-        autofill=True,
+
+def build_cancel_tx(donor_wallet, owner: str, offer_sequence: int) -> EscrowCancel:
+    return EscrowCancel(
+        account=donor_wallet.address,
+        owner=owner,
+        offer_sequence=offer_sequence,
     )
-    return response.result
 
 
 def finish_donation_escrow(
@@ -81,22 +126,9 @@ def finish_donation_escrow(
             "sequence": offer_sequence,
         }
 
-    tx = EscrowFinish(
-        account=donor_wallet.address,
-        owner=owner,
-        offer_sequence=offer_sequence,
-        condition=condition_hex.upper(),
-        fulfillment=fulfillment_hex,
-    )
+    tx = build_finish_tx(donor_wallet, owner, offer_sequence, condition_hex, fulfillment_hex)
 
-    response = submit_and_wait(
-        tx,
-        client,
-        wallet=donor_wallet,
-        check_fee=True,
-        autofill=True,
-    )
-    return response.result
+    return _submit_and_wait(tx, donor_wallet)
 
 
 def cancel_donation_escrow(
@@ -112,17 +144,33 @@ def cancel_donation_escrow(
             "sequence": offer_sequence,
         }
 
-    tx = EscrowCancel(
-        account=donor_wallet.address,
-        owner=owner,
-        offer_sequence=offer_sequence,
-    )
+    tx = build_cancel_tx(donor_wallet, owner, offer_sequence)
 
-    response = submit_and_wait(
-        tx,
-        client,
-        wallet=donor_wallet,
-        check_fee=True,
-        autofill=True,
-    )
-    return response.result
\ No newline at end of file
+    return _submit_and_wait(tx, donor_wallet)
+
+def submit_escrow_batch(
+    donor_wallet,
+    jobs: List[TxJob],
+    on_result: Optional[Callable[[TxResult], None]] = None,
+) -> List[TxResult]:
+    """
+    Soumet un lot de EscrowFinish / EscrowCancel en pipeline (séquences
+    assignées localement, validation suivie en parallèle) au lieu d'un
+    submit_and_wait par escrow. on_result est appelé à chaque résultat.
+    """
+    if settings.XRPL_MOCK:
+        results = []
+        for key, tx in jobs:
+            res = TxResult(
+                key=key,
+                tx_hash=None,
+                engine_result="tesSUCCESS",
+                success=True,
+                raw={"mock": True, "owner": tx.owner, "sequence": tx.offer_sequence},
+            )
+            results.append(res)
+            if on_result is not None:
+                on_result(res)
+        return results
+
+    return TxPipeline(client, donor_wallet).run(jobs, on_result)
@@ -0,0 +1,397 @@
+# evidence_aggregates.py
+"""
+Agrégats d'evidences par projet (table project_evidence_stats).
+
+Maintenus de façon incrémentale, dans la transaction qui écrit les evidences :
+  - à l'insertion   : count, somme GPS, somme réputation, validateurs distincts
+  - au scoring IA   : somme CV, nombre d'evidences scorées
+
+decide_project_verdict lit alors une seule ligne au lieu de recalculer
+GPS / réputation / CV sur toutes les evidences. Avec
+EVIDENCE_SIGNATURE_REQUIRED, une evidence n'entre dans les agrégats qu'une
+fois sa signature validée (signature_verifier.py). Un job de réconciliation
+(python evidence_aggregates.py [--repair]) compare les agrégats à un
+recalcul complet.
+
+reputation_sum suit le success_rate courant des validateurs tant que le
+projet n'est pas tranché (refresh_reputation_sums, appelé par
+validator_reputation.py) ; il est ensuite figé à la valeur du verdict.
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, true, update
+from sqlalchemy.orm import Session
+
+from anchoring import record_analysis
+from database import SessionLocal, dialect_insert
+from geo import haversine_km_batch
+from models import Evidence, Project, ProjectEvidenceStats, ProjectStatus, Validator
+from settings import settings
+from vision_guard import ScoreBatch, vision_guard
+
+# tolérance de comparaison des sommes flottantes
+_EPS = 1e-6
+
+# projets tranchés : reputation_sum figé
+_DECIDED = (ProjectStatus.SUCCESS, ProjectStatus.FAILED)
+
+_FIELDS = (
+    "evidence_count",
+    "gps_score_sum",
+    "cv_score_sum",
+    "cv_scored_count",
+    "reputation_sum",
+    "distinct_validators",
+)
+
+
+def evidence_gps_scores(project_lat, project_lon, lat, lon) -> np.ndarray:
+    """Score GPS d'un lot d'evidences (tableaux) : plein score si < 1 km."""
+    return np.maximum(0.0, 1.0 - haversine_km_batch(project_lat, project_lon, lat, lon) / 1.0)
+
+
+def counted_evidence():
+    """Filtre des evidences prises en compte dans les agrégats (et le verdict)."""
+    if settings.EVIDENCE_SIGNATURE_REQUIRED:
+        return Evidence.signature_valid.is_(True)
+    return true()
+
+
+# ---------- Mise à jour incrémentale ----------
+
+def record_new_evidences(
+    db: Session,
+    rows: List[dict],
+    reputations: Dict[int, float],
+) -> None:
+    """
+    À appeler AVANT l'insertion des evidences `rows` (dicts de colonnes) :
+      - calcule et pose row["gps_score"]
+      - incrémente les agrégats des projets concernés (un seul upsert),
+        sauf si la signature doit d'abord être vérifiée
+
+    reputations : {validator_id: success_rate}
+    """
+    if not rows:
+        return
+
+    project_ids = {r["project_id"] for r in rows}
+    coords = {
+        pid: (lat, lon)
+        for pid, lat, lon in db.query(Project.id, Project.latitude, Project.longitude)
+        .filter(Project.id.in_(project_ids))
+    }
+    p_lat, p_lon = zip(*(coords[r["project_id"]] for r in rows))
+    gps = evidence_gps_scores(p_lat, p_lon, [r["latitude"] for r in rows], [r["longitude"] for r in rows])
+    for r, g in zip(rows, gps.tolist()):
+        r["gps_score"] = g
+
+    if not settings.EVIDENCE_SIGNATURE_REQUIRED:
+        count_evidences(db, rows, reputations)
+
+
+def count_evidences(
+    db: Session,
+    rows: List[dict],
+    reputations: Dict[int, float],
+) -> None:
+    """
+    Ajoute aux agrégats des evidences pas encore comptées (gps_score posé) :
+    à l'insertion, ou à la validation de leur signature.
+    """
+    if not rows:
+        return
+
+    project_ids = {r["project_id"] for r in rows}
+    validator_ids = {r["validator_id"] for r in rows}
+    # couples (projet, validateur) déjà comptés -> pas un nouveau validateur distinct
+    seen = set(
+        db.query(Evidence.project_id, Evidence.validator_id)
+        .filter(
+            Evidence.project_id.in_(project_ids),
+            Evidence.validator_id.in_(validator_ids),
+            counted_evidence(),
+        )
+        .distinct()
+    )
+
+    deltas: Dict[int, dict] = defaultdict(lambda: dict.fromkeys(_FIELDS, 0))
+    for r in rows:
+        d = deltas[r["project_id"]]
+        d["evidence_count"] += 1
+        d["gps_score_sum"] += r["gps_score"]
+        d["reputation_sum"] += reputations.get(r["validator_id"]) or 0.5
+        if r.get("cv_score") is not None:
+            d["cv_score_sum"] += r["cv_score"]
+            d["cv_scored_count"] += 1
+
+        pair = (r["project_id"], r["validator_id"])
+        if pair not in seen:
+            seen.add(pair)
+            d["distinct_validators"] += 1
+
+    _upsert_deltas(db, deltas)
+
+
+def _upsert_deltas(db: Session, deltas: Dict[int, dict]) -> None:
+    now = datetime.utcnow()
+    values = [
+        {"project_id": pid, "updated_at": now, **d} for pid, d in deltas.items()
+    ]
+    table = ProjectEvidenceStats.__table__
+    stmt = dialect_insert(db)(ProjectEvidenceStats).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProjectEvidenceStats.project_id],
+        set_={
+            **{f: table.c[f] + stmt.excluded[f] for f in _FIELDS},
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def score_pending_evidences_many(
+    db: Session,
+    project_ids: List[int],
+    scorer: Optional[Callable[[str], float]] = None,
+    deadline: Optional[float] = None,
+) -> Dict[int, ScoreBatch]:
+    """
+    Score IA des evidences pas encore analysées des projets, en parallèle et
+    avant l'échéance `deadline` (vision_guard.py), et report dans les
+    agrégats ; les evidences non scorées à temps restent à NULL. Une
+    requête, un seul lot d'images (pool et échéance partagés), un seul
+    upsert des agrégats.
+    Renvoie {project_id: ScoreBatch} pour les projets ayant des evidences
+    en attente.
+    """
+    pending = (
+        db.query(Evidence)
+        .filter(
+            Evidence.project_id.in_(project_ids),
+            Evidence.cv_score.is_(None),
+            # non comptée : ni score ni appel IA
+            counted_evidence(),
+        )
+        .order_by(Evidence.project_id, Evidence.id)
+        .all()
+    )
+    if not pending:
+        return {}
+
+    if scorer is None:
+        from vision_ai import analyze_image  # import lourd (CLIP), seulement si besoin
+
+        scorer = analyze_image
+
+    batch = vision_guard.score_many([ev.image_url for ev in pending], scorer, deadline)
+
+    now = datetime.utcnow()
+    deltas: Dict[int, dict] = defaultdict(lambda: dict.fromkeys(_FIELDS, 0))
+    for i, score in sorted(batch.scores.items()):
+        ev = pending[i]
+        ev.cv_score = score
+        deltas[ev.project_id]["cv_score_sum"] += score
+        deltas[ev.project_id]["cv_scored_count"] += 1
+        record_analysis(db, ev, now)
+
+    if deltas:
+        db.flush()
+        _upsert_deltas(db, deltas)
+
+    by_project: Dict[int, List[int]] = defaultdict(list)
+    for i, ev in enumerate(pending):
+        by_project[ev.project_id].append(i)
+    return {pid: batch.subset(indices) for pid, indices in by_project.items()}
+
+
+def refresh_reputation_sums(db: Session, validator_ids: Iterable[int]) -> None:
+    """
+    Après un changement de success_rate : recalcule reputation_sum des
+    projets non tranchés où ces validateurs ont des evidences comptées
+    (ix_evidences_validator_project), en un seul UPDATE.
+    """
+    validator_ids = list(validator_ids)
+    if not validator_ids:
+        return
+    affected = (
+        select(Evidence.project_id)
+        .join(Project, Project.id == Evidence.project_id)
+        .where(
+            Evidence.validator_id.in_(validator_ids),
+            Project.status.notin_(_DECIDED),
+            counted_evidence(),
+        )
+        .distinct()
+    )
+    # `success_rate or 0.5`, comme à l'insertion
+    reputation = (
+        select(func.coalesce(func.sum(func.coalesce(func.nullif(Validator.success_rate, 0), 0.5)), 0.0))
+        .select_from(Evidence)
+        .outerjoin(Validator, Validator.id == Evidence.validator_id)
+        .where(Evidence.project_id == ProjectEvidenceStats.project_id, counted_evidence())
+        .scalar_subquery()
+    )
+    db.execute(
+        update(ProjectEvidenceStats)
+        .where(ProjectEvidenceStats.project_id.in_(affected))
+        .values(reputation_sum=reputation, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ---------- Recalcul complet / réconciliation ----------
+
+def _full_recompute(
+    db: Session,
+    project_ids: Optional[Iterable[int]] = None,
+    backfill_gps: bool = False,
+) -> Iterable[Tuple[int, dict]]:
+    """
+    Recalcule les agrégats depuis les evidences, projet par projet, en
+    streaming (mémoire bornée à un projet). Yield (project_id, agrégats).
+    """
+    q = (
+        db.query(
+            Evidence.id,
+            Evidence.project_id,
+            Evidence.validator_id,
+            Evidence.latitude,
+            Evidence.longitude,
+            Evidence.gps_score,
+            Evidence.cv_score,
+            Project.latitude,
+            Project.longitude,
+            Validator.success_rate,
+        )
+        .join(Project, Project.id == Evidence.project_id)
+        .outerjoin(Validator, Validator.id == Evidence.validator_id)
+        .filter(counted_evidence())
+    )
+    if project_ids is not None:
+        q = q.filter(Evidence.project_id.in_(list(project_ids)))
+    q = q.order_by(Evidence.project_id).yield_per(1000)
+
+    def flush(pid, evs):
+        # une passe vectorisée par projet (GPS recalculé depuis les positions)
+        ev_ids, vids, lats, lons, gps, cvs, p_lat, p_lon, rates = zip(*evs)
+        expected = evidence_gps_scores(p_lat[0], p_lon[0], lats, lons).tolist()
+        if backfill_gps:
+            gps_backfill.extend(
+                {"id": i, "gps_score": e} for i, g, e in zip(ev_ids, gps, expected) if g is None
+            )
+        scored = [cv for cv in cvs if cv is not None]
+        acc = dict.fromkeys(_FIELDS, 0)
+        acc["evidence_count"] = len(evs)
+        acc["gps_score_sum"] = sum(expected)
+        acc["reputation_sum"] = sum(r or 0.5 for r in rates)
+        acc["cv_score_sum"] = sum(scored)
+        acc["cv_scored_count"] = len(scored)
+        acc["distinct_validators"] = len(set(vids))
+        return pid, acc
+
+    current_pid = None
+    evs: List[tuple] = []
+    gps_backfill: List[dict] = []
+
+    for ev_id, pid, vid, lat, lon, gps, cv, p_lat, p_lon, success_rate in q:
+        if pid != current_pid:
+            if current_pid is not None:
+                yield flush(current_pid, evs)
+            current_pid = pid
+            evs = []
+        evs.append((ev_id, vid, lat, lon, gps, cv, p_lat, p_lon, success_rate))
+
+    if current_pid is not None:
+        yield flush(current_pid, evs)
+
+    if gps_backfill:
+        db.bulk_update_mappings(Evidence, gps_backfill)
+
+
+def rebuild_project_stats(db: Session, project_id: int) -> ProjectEvidenceStats:
+    """(Re)construit la ligne d'agrégats d'un projet (base existante, réparation)."""
+    expected = dict(_full_recompute(db, [project_id], backfill_gps=True)).get(
+        project_id, dict.fromkeys(_FIELDS, 0)
+    )
+    stats = db.get(ProjectEvidenceStats, project_id)
+    if stats is None:
+        stats = ProjectEvidenceStats(project_id=project_id)
+        db.add(stats)
+    elif db.query(Project.status).filter(Project.id == project_id).scalar() in _DECIDED:
+        # somme utilisée par le verdict, indépendante des réputations actuelles
+        expected.pop("reputation_sum")
+    for f, v in expected.items():
+        setattr(stats, f, v)
+    stats.updated_at = datetime.utcnow()
+    db.flush()
+    return stats
+
+
+def reconcile_evidence_aggregates(db: Session, repair: bool = False) -> List[dict]:
+    """
+    Compare les agrégats stockés à un recalcul complet.
+    Renvoie la liste des divergences ; si repair=True, les corrige (commit).
+    """
+    stored = {s.project_id: s for s in db.query(ProjectEvidenceStats)}
+    decided = {
+        pid
+        for (pid,) in db.query(ProjectEvidenceStats.project_id)
+        .join(Project, Project.id == ProjectEvidenceStats.project_id)
+        .filter(Project.status.in_(_DECIDED))
+    }
+    divergences: List[dict] = []
+    to_fix: List[int] = []
+
+    for pid, expected in _full_recompute(db, backfill_gps=repair):
+        s = stored.pop(pid, None)
+        diffs = {}
+        for f in _FIELDS:
+            if f == "reputation_sum" and pid in decided and s is not None:
+                continue
+            have = getattr(s, f) if s is not None else None
+            if have is None or abs(have - expected[f]) > _EPS:
+                diffs[f] = {"stored": have, "expected": expected[f]}
+        if diffs:
+            divergences.append({"project_id": pid, "fields": diffs})
+            to_fix.append(pid)
+
+    # agrégats non nuls pour des projets sans evidence
+    for pid, s in stored.items():
+        if s.evidence_count:
+            divergences.append(
+                {"project_id": pid, "fields": {"evidence_count": {"stored": s.evidence_count, "expected": 0}}}
+            )
+            to_fix.append(pid)
+
+    if repair:
+        for pid in to_fix:
+            rebuild_project_stats(db, pid)
+        db.commit()
+
+    return divergences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réconciliation des agrégats d'evidences")
+    parser.add_argument("--repair", action="store_true", help="corrige les divergences")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        divergences = reconcile_evidence_aggregates(db, repair=args.repair)
+    finally:
+        db.close()
+
+    for d in divergences:
+        print(f"[AGGREGATES] project {d['project_id']}: {d['fields']}")
+    status = "repaired" if args.repair else "found"
+    print(f"[AGGREGATES] {len(divergences)} divergence(s) {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# evidence_service.py
+"""
+Écritures d'evidences en set-based :
+  - upsert des validateurs en UN seul INSERT ... ON CONFLICT
+  - insertion des evidences en UN seul executemany (même transaction)
+  - mise à jour des agrégats par projet (evidence_aggregates.py)
+Utilisé par POST /projects/{id}/evidence et POST /evidence/bulk.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from evidence_aggregates import record_new_evidences
+from evidence_signature import utc_naive
+from models import Evidence, EvidenceCreate, Validator
+
+
+def upsert_validators(
+    db: Session,
+    validators: Iterable[Tuple[str, float, float]],
+) -> Dict[str, Tuple[int, float]]:
+    """
+    Crée les validateurs manquants et renvoie
+    {xrpl_address: (id, success_rate)} pour tous.
+
+    validators : (xrpl_address, latitude, longitude) ; la position n'est
+    utilisée qu'à la création (un validateur existant n'est pas modifié).
+    """
+    rows: Dict[str, dict] = {}
+    for address, lat, lon in validators:
+        # une même adresse ne doit apparaître qu'une fois dans l'INSERT
+        rows.setdefault(
+            address,
+            {"xrpl_address": address, "latitude": lat, "longitude": lon},
+        )
+    if not rows:
+        return {}
+
+    stmt = dialect_insert(db)(Validator).values(list(rows.values()))
+    # DO UPDATE "à vide" plutôt que DO NOTHING : RETURNING renvoie alors
+    # aussi les lignes déjà existantes, sans SELECT supplémentaire
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Validator.xrpl_address],
+        set_={"xrpl_address": stmt.excluded.xrpl_address},
+    ).returning(Validator.id, Validator.xrpl_address, Validator.success_rate)
+
+    return {address: (vid, rate) for vid, address, rate in db.execute(stmt)}
+
+
+def insert_evidences(
+    db: Session,
+    items: List[Tuple[int, EvidenceCreate]],
+) -> List[int]:
+    """
+    Upsert des validateurs, mise à jour des agrégats, puis insertion des
+    evidences (project_id, payload) en un executemany.
+    Renvoie les ids des evidences dans l'ordre des items.
+    """
+    if not items:
+        return []
+    validators = upsert_validators(
+        db, [(ev.validator_address, ev.latitude, ev.longitude) for _, ev in items]
+    )
+    rows = [
+        {
+            "project_id": project_id,
+            "validator_id": validators[ev.validator_address][0],
+            "image_url": ev.image_url,
+            "latitude": ev.latitude,
+            "longitude": ev.longitude,
+            # UTC naïf, comme le message signé : la colonne DateTime (SQLite)
+            # perdrait le décalage et garderait l'heure locale
+            "timestamp": utc_naive(ev.timestamp),
+            "wallet_signature": ev.wallet_signature,
+            "public_key": ev.public_key,
+        }
+        for project_id, ev in items
+    ]
+    # pose gps_score sur chaque ligne + incrémente les agrégats projet
+    record_new_evidences(db, rows, dict(validators.values()))
+    # pas de sort_by_parameter_order : sans colonne sentinelle, SQLite
+    # repasse alors à un INSERT par ligne. Ids rendus à leurs items par
+    # contenu (la signature couvre l'horodatage) ; deux items identiques
+    # sont interchangeables.
+    key_columns = ("project_id", "validator_id", "image_url", "latitude", "longitude", "wallet_signature")
+    result = db.execute(
+        insert(Evidence).returning(Evidence.id, *(getattr(Evidence, c) for c in key_columns)),
+        rows,
+    )
+    ids_by_key: Dict[tuple, List[int]] = defaultdict(list)
+    for eid, *key in result:
+        ids_by_key[tuple(key)].append(eid)
+    return [
+        ids_by_key[tuple(r[c] for c in key_columns)].pop(0)
+        for r in rows
+    ]
@@ -0,0 +1,79 @@
+# evidence_signature.py
+"""
+Signature wallet des evidences : message canonique et vérification.
+
+Le validateur signe avec la clé de son compte XRPL (secp256k1 ou ed25519)
+le JSON canonique de la preuve (clés triées, sans espaces) :
+  {"image_url", "latitude", "longitude", "project_id", "timestamp" (ISO,
+   UTC naïf), "validator_address"}
+et envoie wallet_signature (hex) + public_key (hex). Une adresse XRPL
+dérive de sa clé publique : la clé est acceptée si elle redonne
+validator_address, puis gardée en cache pour ce validateur.
+
+Module sans dépendance à la base : importé par les process de vérification
+(signature_verifier.py).
+"""
+import json
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from xrpl.core.keypairs import derive_classic_address, is_valid_message, sign
+
+# (message, signature hex, clé publique hex)
+VerifyTask = Tuple[bytes, str, str]
+
+
+def utc_naive(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def evidence_message(
+    project_id: int,
+    validator_address: str,
+    image_url: str,
+    latitude: float,
+    longitude: float,
+    timestamp: datetime,
+) -> bytes:
+    return json.dumps(
+        {
+            "image_url": image_url,
+            "latitude": latitude,
+            "longitude": longitude,
+            "project_id": project_id,
+            "timestamp": utc_naive(timestamp).isoformat(),
+            "validator_address": validator_address,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    ).encode()
+
+
+def sign_evidence(wallet, project_id: int, image_url: str, latitude: float, longitude: float, timestamp: datetime) -> str:
+    """Signature côté validateur (scripts de test, benchmark)."""
+    message = evidence_message(project_id, wallet.address, image_url, latitude, longitude, timestamp)
+    return sign(message, wallet.private_key)
+
+
+@lru_cache(maxsize=65536)
+def address_of(public_key: str) -> Optional[str]:
+    try:
+        return derive_classic_address(public_key)
+    except Exception:
+        return None
+
+
+def verify_one(task: VerifyTask) -> bool:
+    message, signature_hex, public_key = task
+    try:
+        return is_valid_message(message, bytes.fromhex(signature_hex), public_key)
+    except Exception:
+        # signature non hexadécimale, clé mal formée...
+        return False
+
+
+def verify_batch(tasks: Iterable[VerifyTask]) -> List[bool]:
+    return [verify_one(t) for t in tasks]
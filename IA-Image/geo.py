@@ -0,0 +1,31 @@
+# geo.py
+"""
+Noyau de distances haversine vectorisé (NumPy), partagé par le scoring GPS
+des evidences (trust_optimizer, evidence_aggregates) et la sélection /
+l'affectation des validateurs (validator_service, validator_assignment).
+
+haversine_km_batch accepte scalaires ou tableaux avec broadcasting :
+  - N points contre une cible : (N,) x scalaire -> (N,)
+  - N points contre M cibles  : (N, 1) x (M,)   -> (N, M)
+dtype=np.float32 divise par deux la mémoire / la bande passante des grands
+lots, au prix d'une erreur de quelques centaines de mètres au plus (distances
+planétaires) : suffisant pour un tri ou un filtre par rayon, pas pour le
+score GPS (plein score sous 1 km), qui reste en float64.
+haversine_km (scalaire) n'est qu'un adaptateur, plus lent que l'ancienne
+version math par appel : les boucles chaudes appellent directement la
+version tableau (voir benchmark_geo.py).
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km_batch(lat1, lon1, lat2, lon2, dtype=np.float64) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=dtype)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    # arrondis : a peut dépasser 1 d'un ulp pour des points antipodaux
+    return (2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    return float(haversine_km_batch(lat1, lon1, lat2, lon2))
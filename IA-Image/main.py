@@ -1,15 +1,18 @@
 # main.py
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Literal
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from pathlib import Path
+import time
 import uuid
 import base64
+import json
 
-from database import Base, engine, get_db
+import db_metrics
+from database import Base, engine, ensure_schema, get_db
 from models import (
     Project,
     ProjectCreate,
@@ -19,17 +22,31 @@ from models import (
     DonationOut,
     Evidence,
     EvidenceCreate,
+    EvidenceBulkItem,
+    EvidenceBulkItemResult,
     DonationStatus,
+    EscrowOutbox,
+    PooledEscrow,
+    PoolProofOut,
+    AnchorProofOut,
+    PoolStatus,
     ProjectStatus,
+    VerdictBatchRequest,
 )
-from escrow_service import (
-    generate_secret_and_condition,
-    create_donation_escrow,
-    finish_donation_escrow,
-    cancel_donation_escrow,
-)
+from anchoring import anchor_proof
+from anchor_worker import anchor_worker
+from donation_pool import open_pool_for, pool_proof, pooling_applies
+from escrow_service import build_create_tx, generate_secret_and_condition
+from evidence_service import insert_evidences
+from settlement import settle_project_donations
 from trust_optimizer import decide_project_verdict
+from verdict_batch import resolve_project_ids, run_verdict_batch
 from xrpl_client import client, platform_wallet
+from outbox_worker import outbox_worker
+from deadline_sweeper import claim_projects, deadline_sweeper, lease_owner, release_projects
+from signature_verifier import signature_verifier
+from vision_guard import vision_guard
+from write_queue import run_write, write_queue
 from settings import settings
 from vision_ai import analyze_image, explain_image
 
@@ -37,11 +54,61 @@ app = FastAPI(title="XRPL Impact Map - Smart Escrow")
 
 # Création des tables
 Base.metadata.create_all(bind=engine)
+ensure_schema()
 
 # Wallet "donateur" unique pour le POC
 donor_wallet = platform_wallet
 
 
+@app.middleware("http")
+async def count_db_queries(request: Request, call_next):
+    # nombre de requêtes SQL + temps DB de cette requête HTTP
+    stats = db_metrics.start_request()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = getattr(route, "path", request.url.path)
+    db_metrics.finish_request(f"{request.method} {path}", stats)
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    return response
+
+
+@app.on_event("startup")
+def startup_event():
+    if settings.OUTBOX_WORKER_ENABLED:
+        outbox_worker.start()
+    if settings.DEADLINE_SWEEPER_ENABLED:
+        deadline_sweeper.start()
+    if settings.ANCHORING_ENABLED:
+        anchor_worker.start()
+    if settings.EVIDENCE_VERIFIER_ENABLED:
+        signature_verifier.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    signature_verifier.stop()
+    anchor_worker.stop()
+    deadline_sweeper.stop()
+    outbox_worker.stop()
+    # vide la file group-commit avant l'arrêt
+    write_queue.stop()
+    vision_guard.stop()
+    if client is not None:
+        # ferme les websockets du pool XRPL partagé
+        client.stop()
+
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "db": db_metrics.snapshot(),
+        "write_queue": {
+            "batches": write_queue.batches,
+            "ops": write_queue.ops,
+        },
+    }
+
+
 @app.get("/projects", response_model=List[ProjectOut])
 def list_projects(db: Session = Depends(get_db)):
     projects = db.query(Project).all()
@@ -79,43 +146,93 @@ def donate_to_project(
     if project.deadline < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Project deadline passed")
 
+    project_id = project.id
+    cancel_after = project.deadline
+    now = datetime.utcnow()
+
+    def _mark_in_progress(s: Session) -> None:
+        s.query(Project).filter(Project.id == project_id).update(
+            {Project.status: ProjectStatus.IN_PROGRESS},
+            synchronize_session=False,
+        )
+
+    if pooling_applies(cancel_after, now):
+        # mode agrégé : rattachée à l'escrow commun de la période, sans tx
+        def _insert_pooled_donation(s: Session) -> Donation:
+            pool = open_pool_for(s, project_id, cancel_after, donor_wallet.address, now)
+            donation = Donation(
+                project_id=project_id,
+                donor_address=payload.donor_address,
+                amount_xrp=payload.amount_xrp,
+                escrow_owner=pool.escrow_owner,
+                escrow_sequence=None,  # celle du pool, posée au lock
+                condition_hex=pool.condition_hex,
+                fulfillment_hex=pool.fulfillment_hex,
+                cancel_after=cancel_after,
+                status=DonationStatus.PENDING,
+                pool_id=pool.id,
+            )
+            s.add(donation)
+            _mark_in_progress(s)
+            s.flush()
+            return donation
+
+        return run_write(db, _insert_pooled_donation)
+
     fulfillment_hex, condition_hex = generate_secret_and_condition()
 
     # Ici, on utilise le wallet plateforme comme "donor_wallet" POC
-    resp = create_donation_escrow(
+    tx = build_create_tx(
         donor_wallet=donor_wallet,
         ong_address=project.ong_address,
         amount_xrp=payload.amount_xrp,
         cancel_after=project.deadline,
         condition_hex=condition_hex,
     )
+    tx_json = json.dumps(tx.to_dict())
+
+    def _insert_donation(s: Session) -> Donation:
+        donation = Donation(
+            project_id=project_id,
+            donor_address=payload.donor_address,
+            amount_xrp=payload.amount_xrp,
+            escrow_owner=donor_wallet.address,
+            escrow_sequence=None,  # posé par le worker d'outbox
+            condition_hex=condition_hex,
+            fulfillment_hex=fulfillment_hex,
+            cancel_after=cancel_after,
+            status=DonationStatus.PENDING,
+        )
+        s.add(donation)
+        s.flush()
+        # l'EscrowCreate à soumettre est écrit dans la MÊME transaction
+        s.add(EscrowOutbox(donation_id=donation.id, tx_json=tx_json))
+        _mark_in_progress(s)
+        s.flush()
+        return donation
+
+    # réponse immédiate (PENDING) : l'escrow est créé on-chain par outbox_worker
+    return run_write(db, _insert_donation)
+
+
+@app.get("/donations/{donation_id}", response_model=DonationOut)
+def get_donation(donation_id: int, db: Session = Depends(get_db)):
+    donation = db.get(Donation, donation_id)
+    if not donation:
+        raise HTTPException(status_code=404, detail="Donation not found")
+    return donation
 
-    # infos escrow
-    tx_meta = resp.get("meta", {})
-    escrow_sequence = resp.get("tx_json", {}).get("Sequence")
-    if escrow_sequence is None:
-        raise HTTPException(status_code=500, detail="Escrow sequence not found in tx")
-
-    donation = Donation(
-        project_id=project.id,
-        donor_address=payload.donor_address,
-        amount_xrp=payload.amount_xrp,
-        escrow_owner=donor_wallet.address,
-        escrow_sequence=escrow_sequence,
-        condition_hex=condition_hex,
-        fulfillment_hex=fulfillment_hex,
-        cancel_after=project.deadline,
-        status=DonationStatus.LOCKED,
-    )
-    db.add(donation)
-    db.commit()
-    db.refresh(donation)
-
-    project.status = ProjectStatus.IN_PROGRESS
-    db.add(project)
-    db.commit()
 
-    return donation
+@app.get("/donations/{donation_id}/pool-proof", response_model=PoolProofOut)
+def get_donation_pool_proof(donation_id: int, db: Session = Depends(get_db)):
+    """Preuve Merkle que la donation est comptée dans son escrow agrégé."""
+    donation = db.get(Donation, donation_id)
+    if not donation:
+        raise HTTPException(status_code=404, detail="Donation not found")
+    proof = pool_proof(db, donation)
+    if proof is None:
+        raise HTTPException(status_code=404, detail="Donation not in a sealed pool")
+    return proof
 
 
 @app.post("/projects/{project_id}/evidence")
@@ -128,82 +245,140 @@ def submit_evidence(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # récup / crée validator
-    from models import Validator  # éviter import circulaire
+    project_id = project.id
 
-    validator = (
-        db.query(Validator)
-        .filter(Validator.xrpl_address == payload.validator_address)
-        .first()
-    )
-    if not validator:
-        validator = Validator(
-            xrpl_address=payload.validator_address,
-            latitude=payload.latitude,
-            longitude=payload.longitude,
-        )
-        db.add(validator)
-        db.commit()
-        db.refresh(validator)
-
-    ev = Evidence(
-        project_id=project.id,
-        validator_id=validator.id,
-        image_url=payload.image_url,
-        latitude=payload.latitude,
-        longitude=payload.longitude,
-        timestamp=payload.timestamp,
-        wallet_signature=payload.wallet_signature,
-    )
-    db.add(ev)
-    db.commit()
+    def _insert_evidence(s: Session) -> None:
+        # upsert du validateur (pas de select-then-insert) + evidence
+        insert_evidences(s, [(project_id, payload)])
+
+    # validateur + evidence commités en une fois, avec les autres requêtes du batch
+    run_write(db, _insert_evidence)
+    # signature vérifiée en tâche de fond (signature_verifier.py)
+    signature_verifier.notify()
     return {"status": "ok"}
 
 
+@app.post("/evidence/bulk", response_model=List[EvidenceBulkItemResult])
+def submit_evidence_bulk(
+    payload: List[EvidenceBulkItem],
+    db: Session = Depends(get_db),
+):
+    """
+    Ingestion groupée (sync des partenaires terrain après coupure réseau).
+    Les evidences peuvent viser plusieurs projets ; statut renvoyé par item.
+    """
+    project_ids = {item.project_id for item in payload}
+    known_projects = set()
+    if project_ids:
+        known_projects = {
+            pid
+            for (pid,) in db.query(Project.id).filter(Project.id.in_(project_ids))
+        }
+
+    results = [
+        EvidenceBulkItemResult(index=i, project_id=item.project_id, status="ok")
+        for i, item in enumerate(payload)
+    ]
+    accepted = []
+    for res, item in zip(results, payload):
+        if item.project_id not in known_projects:
+            res.status = "error"
+            res.detail = "Project not found"
+        else:
+            accepted.append((res, item))
+
+    def _insert_bulk(s: Session) -> List[int]:
+        return insert_evidences(s, [(it.project_id, it) for _, it in accepted])
+
+    if accepted:
+        # validateurs + evidences de tout le lot dans une seule transaction
+        evidence_ids = run_write(db, _insert_bulk)
+        for (res, _), eid in zip(accepted, evidence_ids):
+            res.evidence_id = eid
+        signature_verifier.notify()
+
+    return results
+
+
 @app.post("/projects/{project_id}/verdict")
 def run_verdict(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    # budget de latence : le scoring IA vision s'arrête à l'échéance
+    deadline = time.monotonic() + settings.VERDICT_DEADLINE_S
+    # même bail que deadline_sweeper / verdicts en lot : un seul règlement
+    owner = lease_owner("verdict")
+    now = datetime.utcnow()
+    until = now + timedelta(seconds=settings.DEADLINE_SWEEP_LEASE_S + settings.VERDICT_DEADLINE_S)
+    claimed = claim_projects(db, [project_id], owner, until, now)
+    if not claimed:
+        if db.get(Project, project_id) is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        raise HTTPException(status_code=409, detail="Project is being settled, retry later")
+    try:
+        return _decide_and_settle(db, claimed[0], deadline)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        release_projects(db, [project_id], owner)
+
+
+def _decide_and_settle(db: Session, project: Project, deadline: float) -> dict:
+    project_id = project.id
+    verdict = decide_project_verdict(db, project, deadline=deadline)
+
+    # seules les donations LOCKED à escrow individuel sont traitées
+    # (index project_id, status) ; les agrégées le sont via leur pool
+    donations = (
+        db.query(Donation)
+        .filter(
+            Donation.project_id == project_id,
+            Donation.status == DonationStatus.LOCKED,
+            Donation.pool_id.is_(None),
+        )
+        .all()
+    )
+    pools = (
+        db.query(PooledEscrow)
+        .filter(
+            PooledEscrow.project_id == project_id,
+            PooledEscrow.status == PoolStatus.LOCKED,
+        )
+        .all()
+    )
 
-    verdict = decide_project_verdict(db, project)
-
-    donations = db.query(Donation).filter(Donation.project_id == project.id).all()
-
-    if verdict["decision"] == "SUCCESS":
-        # finish chaque escrow
-        for d in donations:
-            if d.status != DonationStatus.LOCKED:
-                continue
-            resp = finish_donation_escrow(
-                donor_wallet=donor_wallet,
-                owner=d.escrow_owner,
-                offer_sequence=d.escrow_sequence,
-                condition_hex=d.condition_hex,
-                fulfillment_hex=d.fulfillment_hex,
-            )
-            d.status = DonationStatus.RELEASED
-            db.add(d)
-        db.commit()
-    else:
-        # refund (si deadline dépassée)
-        now = datetime.utcnow()
-        for d in donations:
-            if d.status != DonationStatus.LOCKED:
-                continue
-            if now < d.cancel_after:
-                # on ne peut pas encore cancel on-chain, on laisse en LOCKED
-                continue
-            resp = cancel_donation_escrow(
-                donor_wallet=donor_wallet,
-                owner=d.escrow_owner,
-                offer_sequence=d.escrow_sequence,
-            )
-            d.status = DonationStatus.REFUNDED
-            db.add(d)
-        db.commit()
+    # finish (SUCCESS) ou cancel (FAILURE, deadline passée) de tous les
+    # escrows en un seul lot pipeliné ; statuts persistés en une écriture
+    escrows = settle_project_donations(
+        db, donor_wallet, donations + pools, verdict["decision"]
+    )
 
-    return {"project_id": project.id, "verdict": verdict}
+    return {"project_id": project_id, "verdict": verdict, "escrows": escrows}
+
+
+@app.post("/verdicts/batch")
+def run_verdicts_batch(req: VerdictBatchRequest, db: Session = Depends(get_db)):
+    """
+    Verdicts (et règlements) de plusieurs projets par paquets, progression
+    streamée en NDJSON (voir verdict_batch.py).
+    """
+    project_ids = resolve_project_ids(db, req)
+    events = run_verdict_batch(project_ids, donor_wallet, settle=req.settle)
+    return StreamingResponse(
+        (json.dumps(e, default=str) + "\n" for e in events),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/anchors/{kind}/{ref_id}/proof", response_model=AnchorProofOut)
+def get_anchor_proof(kind: Literal["verdict", "analysis"], ref_id: int, db: Session = Depends(get_db)):
+    """
+    Preuve Merkle qu'un verdict (ref_id = project_id) ou un score IA
+    (ref_id = evidence_id) est inclus dans un lot ancré on-chain.
+    """
+    proof = anchor_proof(db, kind, ref_id)
+    if proof is None:
+        raise HTTPException(status_code=404, detail="Record not anchored yet")
+    return proof
 
 
 # =========================
@@ -0,0 +1,54 @@
+# merkle.py
+"""
+Arbre de Merkle SHA-256 minimal (racines d'ancrage + preuves d'inclusion).
+
+Préfixes distincts feuille / nœud (0x00 / 0x01) pour qu'une feuille ne
+puisse pas être présentée comme un nœud interne. Un nœud sans frère est
+remonté tel quel au niveau supérieur.
+"""
+import hashlib
+from typing import Dict, List
+
+
+def leaf_hash(payload: str) -> str:
+    return hashlib.sha256(b"\x00" + payload.encode()).hexdigest()
+
+
+def _node_hash(left: str, right: str) -> str:
+    return hashlib.sha256(b"\x01" + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _next_level(level: List[str]) -> List[str]:
+    nxt = [_node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        nxt.append(level[-1])
+    return nxt
+
+
+def merkle_root(leaves: List[str]) -> str:
+    if not leaves:
+        raise ValueError("merkle_root: aucune feuille")
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(leaves: List[str], index: int) -> List[Dict[str, str]]:
+    """Frères de la feuille index jusqu'à la racine : [{"side", "hash"}]."""
+    proof: List[Dict[str, str]] = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({"side": "L" if sibling < index else "R", "hash": level[sibling]})
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf: str, proof: List[Dict[str, str]], root: str) -> bool:
+    h = leaf
+    for step in proof:
+        h = _node_hash(step["hash"], h) if step["side"] == "L" else _node_hash(h, step["hash"])
+    return h == root
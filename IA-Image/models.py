@@ -1,15 +1,17 @@
 # models.py
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from sqlalchemy import (
     Column,
     Integer,
     String,
     Float,
+    Text,
     DateTime,
     Enum,
     Boolean,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel
@@ -29,9 +31,34 @@ class ProjectStatus(str, enum.Enum):
 
 
 class DonationStatus(str, enum.Enum):
+    PENDING = "PENDING"  # escrow en attente de soumission (outbox)
     LOCKED = "LOCKED"
     RELEASED = "RELEASED"
     REFUNDED = "REFUNDED"
+    FAILED = "FAILED"  # EscrowCreate définitivement rejeté
+
+
+class PoolStatus(str, enum.Enum):
+    OPEN = "OPEN"  # reçoit les donations de la période
+    SEALED = "SEALED"  # montant figé, EscrowCreate déposé dans l'outbox
+    LOCKED = "LOCKED"
+    RELEASED = "RELEASED"
+    REFUNDED = "REFUNDED"
+    FAILED = "FAILED"
+
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "PENDING"  # à signer / soumettre
+    SUBMITTED = "SUBMITTED"  # signée (hash connu), en attente de validation
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class AnchorStatus(str, enum.Enum):
+    PENDING = "PENDING"  # racine figée, tx d'ancrage à signer / soumettre
+    SUBMITTED = "SUBMITTED"  # signée (hash connu), en attente de validation
+    ANCHORED = "ANCHORED"
+    FAILED = "FAILED"
 
 
 # ---------- SQLAlchemy Models ----------
@@ -49,8 +76,19 @@ class Project(Base):
     amount_target = Column(Float, nullable=False)
     status = Column(Enum(ProjectStatus), default=ProjectStatus.OPEN)
 
+    # deadline_sweeper.py : verdict + règlement automatiques après deadline
+    swept_at = Column(DateTime, nullable=True)  # plus rien à régler
+    lease_owner = Column(String, nullable=True)  # réplica qui traite le projet
+    lease_until = Column(DateTime, nullable=True)
+
     donations = relationship("Donation", back_populates="project")
 
+    __table_args__ = (
+        Index("ix_projects_status_deadline", "status", "deadline"),
+        # file du sweeper : projets non soldés par deadline
+        Index("ix_projects_swept_deadline", "swept_at", "deadline"),
+    )
+
 
 class Donation(Base):
     __tablename__ = "donations"
@@ -61,15 +99,166 @@ class Donation(Base):
     amount_xrp = Column(Float, nullable=False)
 
     escrow_owner = Column(String, nullable=False)
-    escrow_sequence = Column(Integer, nullable=False)
+    escrow_sequence = Column(Integer, nullable=True)  # connu une fois l'EscrowCreate signé
     condition_hex = Column(String, nullable=False)
     fulfillment_hex = Column(String, nullable=False)
 
     cancel_after = Column(DateTime, nullable=False)
     status = Column(Enum(DonationStatus), default=DonationStatus.LOCKED)
 
+    # dernière tx de règlement (EscrowFinish / EscrowCancel) et son résultat
+    settle_tx_hash = Column(String, nullable=True)
+    settle_result = Column(String, nullable=True)
+
+    # mode agrégé : escrow commun de la période (None = escrow individuel)
+    pool_id = Column(Integer, ForeignKey("pooled_escrows.id"), nullable=True)
+    # comptée dans le montant figé / la racine Merkle au scellement du pool
+    pool_sealed = Column(Boolean, nullable=True)
+
     project = relationship("Project", back_populates="donations")
 
+    __table_args__ = (
+        # verdict : donations LOCKED d'un projet
+        Index("ix_donations_project_status", "project_id", "status"),
+        Index("ix_donations_pool", "pool_id"),
+        # réconciliation on-chain : jointure par (owner, sequence)
+        Index("ix_donations_escrow", "escrow_owner", "escrow_sequence"),
+    )
+
+
+class PooledEscrow(Base):
+    """
+    Escrow commun aux donations d'un projet sur une période
+    (DONATION_POOLING_ENABLED). Un seul EscrowCreate / EscrowFinish /
+    EscrowCancel par période au lieu d'un par donation ; donations_root
+    (racine Merkle des donations, aussi en Memo de l'EscrowCreate) rend le
+    rattachement donation -> escrow vérifiable.
+    """
+    __tablename__ = "pooled_escrows"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    period_end = Column(DateTime, nullable=False)
+
+    # figés au scellement (donation_count : compteur des rattachements tant
+    # que le pool est OPEN)
+    amount_xrp = Column(Float, nullable=True)
+    donation_count = Column(Integer, nullable=True)
+    donations_root = Column(String, nullable=True)
+
+    escrow_owner = Column(String, nullable=False)
+    escrow_sequence = Column(Integer, nullable=True)
+    condition_hex = Column(String, nullable=False)
+    fulfillment_hex = Column(String, nullable=False)
+    cancel_after = Column(DateTime, nullable=False)
+    status = Column(Enum(PoolStatus), nullable=False, default=PoolStatus.OPEN)
+
+    settle_tx_hash = Column(String, nullable=True)
+    settle_result = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_pooled_escrows_project_status", "project_id", "status"),
+        Index("ix_pooled_escrows_status_period_end", "status", "period_end"),
+        Index("ix_pooled_escrows_escrow", "escrow_owner", "escrow_sequence"),
+    )
+
+
+class EscrowOutbox(Base):
+    """
+    Transaction EscrowCreate à soumettre, écrite dans la même transaction DB
+    que la Donation (ou au scellement d'un PooledEscrow). outbox_worker.py
+    la signe, la soumet et suit sa validation.
+    """
+    __tablename__ = "escrow_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # exactement un des deux : donation individuelle ou escrow agrégé
+    donation_id = Column(Integer, ForeignKey("donations.id"), unique=True, nullable=True)
+    pool_id = Column(Integer, ForeignKey("pooled_escrows.id"), nullable=True)
+    tx_json = Column(Text, nullable=False)  # tx non signée (sans Sequence / Fee)
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # idempotence : hash + blob signés persistés AVANT la soumission
+    sequence = Column(Integer, nullable=True)
+    last_ledger_sequence = Column(Integer, nullable=True)
+    tx_hash = Column(String, nullable=True)
+    tx_blob = Column(Text, nullable=True)
+
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # bail du worker qui signe / suit l'entrée (plusieurs workers possibles)
+    lease_owner = Column(String, nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_escrow_outbox_status_next", "status", "next_attempt_at"),
+        Index("ux_escrow_outbox_pool", "pool_id", unique=True),
+        # réconciliation : objet Escrow -> EscrowCreate (PreviousTxnID)
+        Index("ix_escrow_outbox_tx_hash", "tx_hash"),
+    )
+
+
+class AnchorRecord(Base):
+    """
+    Verdict ou score IA à publier : regroupé avec les autres enregistrements
+    de l'intervalle dans un AnchorBatch dont seule la racine Merkle va
+    on-chain (anchoring.py).
+    """
+    __tablename__ = "anchor_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # "verdict" | "analysis"
+    ref_id = Column(Integer, nullable=False)  # project_id / evidence_id
+    payload = Column(Text, nullable=False)  # JSON canonique (clés triées)
+    leaf = Column(String, nullable=False)
+    # feuilles d'un lot triées par id
+    batch_id = Column(Integer, ForeignKey("anchor_batches.id"), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # enregistrements pas encore regroupés (batch_id NULL) + preuve
+        Index("ix_anchor_records_batch", "batch_id"),
+        Index("ix_anchor_records_ref", "kind", "ref_id"),
+    )
+
+
+class AnchorBatch(Base):
+    """
+    Lot d'AnchorRecord : racine Merkle publiée en Memo d'une seule tx
+    AccountSet. Même write-ahead que l'outbox (hash + blob avant envoi).
+    """
+    __tablename__ = "anchor_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    root = Column(String, nullable=False)
+    record_count = Column(Integer, nullable=False)
+    status = Column(Enum(AnchorStatus), nullable=False, default=AnchorStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    sequence = Column(Integer, nullable=True)
+    last_ledger_sequence = Column(Integer, nullable=True)
+    tx_hash = Column(String, nullable=True)
+    tx_blob = Column(Text, nullable=True)
+    ledger_index = Column(Integer, nullable=True)  # ledger validé de l'ancrage
+
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    anchored_at = Column(DateTime, nullable=True)
+
+    # bail du worker qui signe / suit le lot (comme escrow_outbox)
+    lease_owner = Column(String, nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_anchor_batches_status_next", "status", "next_attempt_at"),
+    )
+
 
 class Validator(Base):
     __tablename__ = "validators"
@@ -82,6 +271,53 @@ class Validator(Base):
     missions_completed = Column(Integer, default=0)
     missions_failed = Column(Integer, default=0)
     slashed = Column(Boolean, default=False)
+    # clé publique dont dérive xrpl_address, retenue à la 1re signature valide
+    public_key = Column(String, nullable=True)
+    # réputation à décroissance exponentielle (validator_reputation.py) :
+    # missions réussies / échouées pondérées, à l'échelle de l'époque fixe
+    reputation_ok = Column(Float, nullable=True)
+    reputation_fail = Column(Float, nullable=True)
+    reputation_at = Column(DateTime, nullable=True)  # calcul de success_rate
+    # index spatial en mémoire (validator_service.py) : relecture des modifiés
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_validators_updated_at", "updated_at"),
+    )
+
+
+class ValidatorOutcome(Base):
+    """
+    Issue d'une mission : validateur ayant des evidences comptées sur un
+    projet tranché. Journal rejoué par le recalcul complet de la réputation.
+    """
+    __tablename__ = "validator_outcomes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    validator_id = Column(Integer, ForeignKey("validators.id"), nullable=False)
+    success = Column(Boolean, nullable=False)
+    decided_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ux_validator_outcomes_project_validator", "project_id", "validator_id", unique=True),
+        Index("ix_validator_outcomes_validator", "validator_id"),
+    )
+
+
+class ValidatorAssignment(Base):
+    """Affectation validateur -> projet calculée en lot (validator_assignment.py)."""
+    __tablename__ = "validator_assignments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    validator_id = Column(Integer, ForeignKey("validators.id"), nullable=False)
+    assigned_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ux_validator_assignments_project_validator", "project_id", "validator_id", unique=True),
+        Index("ix_validator_assignments_validator", "validator_id"),
+    )
 
 
 class Evidence(Base):
@@ -95,6 +331,39 @@ class Evidence(Base):
     longitude = Column(Float, nullable=False)
     timestamp = Column(DateTime, nullable=False)
     wallet_signature = Column(String, nullable=False)
+    public_key = Column(String, nullable=True)  # clé présentée avec la signature
+    # signature_verifier.py : NULL = pas encore vérifiée
+    signature_valid = Column(Boolean, nullable=True)
+
+    # scores par evidence, agrégés dans ProjectEvidenceStats
+    gps_score = Column(Float, nullable=True)
+    cv_score = Column(Float, nullable=True)  # NULL = pas encore analysée
+
+    __table_args__ = (
+        # verdict : evidences d'un projet + jointure validateur
+        Index("ix_evidences_project_validator", "project_id", "validator_id"),
+        # réputation : projets ouverts touchés par un validateur
+        Index("ix_evidences_validator_project", "validator_id", "project_id"),
+        # file de signature_verifier (signature_valid NULL)
+        Index("ix_evidences_signature_valid", "signature_valid"),
+    )
+
+
+class ProjectEvidenceStats(Base):
+    """
+    Agrégats d'evidences par projet, maintenus à chaque insertion / scoring
+    (evidence_aggregates.py) : le verdict lit une seule ligne.
+    """
+    __tablename__ = "project_evidence_stats"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    evidence_count = Column(Integer, nullable=False, default=0)
+    gps_score_sum = Column(Float, nullable=False, default=0.0)
+    cv_score_sum = Column(Float, nullable=False, default=0.0)
+    cv_scored_count = Column(Integer, nullable=False, default=0)
+    reputation_sum = Column(Float, nullable=False, default=0.0)
+    distinct_validators = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
 
 
 # ---------- Pydantic Schemas ----------
@@ -135,15 +404,67 @@ class DonationOut(BaseModel):
     donor_address: str
     amount_xrp: float
     status: DonationStatus
+    escrow_sequence: Optional[int] = None
+    pool_id: Optional[int] = None
 
     class Config:
         orm_mode = True
 
 
+class PoolProofOut(BaseModel):
+    donation_id: int
+    pool_id: int
+    pool_status: PoolStatus
+    escrow_owner: str
+    escrow_sequence: Optional[int] = None
+    donations_root: str
+    leaf: str
+    # chemin feuille -> racine : [{"side": "L" | "R", "hash": ...}]
+    proof: List[Dict[str, str]]
+
+
+class AnchorProofOut(BaseModel):
+    record_id: int
+    kind: str
+    ref_id: int
+    payload: dict
+    leaf: str
+    batch_id: int
+    batch_status: AnchorStatus
+    root: str
+    tx_hash: Optional[str] = None
+    ledger_index: Optional[int] = None
+    # chemin feuille -> racine : [{"side": "L" | "R", "hash": ...}]
+    proof: List[Dict[str, str]]
+
+
 class EvidenceCreate(BaseModel):
     validator_address: str
     image_url: str
     latitude: float
     longitude: float
     timestamp: datetime
-    wallet_signature: str
\ No newline at end of file
+    wallet_signature: str
+    # hex ; facultative une fois la clé du validateur connue
+    public_key: Optional[str] = None
+
+
+class EvidenceBulkItem(EvidenceCreate):
+    project_id: int
+
+
+class VerdictBatchRequest(BaseModel):
+    # liste explicite, ou filtre (défaut : projets OPEN / FUNDED / IN_PROGRESS)
+    project_ids: Optional[List[int]] = None
+    statuses: Optional[List[ProjectStatus]] = None
+    deadline_before: Optional[datetime] = None
+    limit: Optional[int] = None  # plafonné à VERDICT_BATCH_MAX
+    settle: bool = True  # finish / cancel des escrows après les verdicts
+
+
+class EvidenceBulkItemResult(BaseModel):
+    index: int
+    project_id: int
+    status: str  # "ok" | "error"
+    evidence_id: Optional[int] = None
+    detail: Optional[str] = None
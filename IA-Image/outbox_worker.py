@@ -0,0 +1,298 @@
+# outbox_worker.py
+"""
+Worker de l'outbox des EscrowCreate (table escrow_outbox).
+
+POST /projects/{id}/donate écrit la Donation (PENDING) et l'entrée d'outbox
+dans la même transaction DB puis répond tout de suite. Ce worker :
+  1. signe les entrées PENDING (Sequence locale + LastLedgerSequence) et
+     persiste hash + blob signés AVANT de soumettre (write-ahead)
+  2. soumet les blobs (re-soumettre le même blob est idempotent)
+  3. suit les entrées SUBMITTED : validée -> Donation LOCKED avec son
+     escrow_sequence ; jamais incluse avant LastLedgerSequence -> re-signée
+Un crash à n'importe quelle étape laisse donc l'outbox dans un état dont
+on peut repartir sans créer deux escrows pour la même donation.
+
+Plusieurs workers (un thread par worker uvicorn, `python outbox_worker.py`)
+peuvent tourner en même temps : chaque entrée est prise par un bail
+(lease_owner / lease_until posés par un UPDATE conditionnel, comme
+deadline_sweeper), jamais signée par deux workers à la fois. Le bail est
+rendu en fin de passage ; après un crash il expire (OUTBOX_LEASE_S).
+
+En mode agrégé (donation_pool.py), le worker scelle aussi les pools dont
+la période est écoulée ; leur EscrowCreate passe ensuite par la même outbox.
+
+Lancement : thread démarré par main.py (OUTBOX_WORKER_ENABLED), ou
+`python outbox_worker.py` pour un process séparé.
+"""
+import json
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from xrpl.models.transactions import Transaction
+
+from database import SessionLocal
+from escrow_service import create_donation_escrow
+from donation_pool import seal_due_pools
+from models import (
+    Donation,
+    DonationStatus,
+    EscrowOutbox,
+    OutboxStatus,
+    PooledEscrow,
+    PoolStatus,
+)
+from settings import settings
+from tx_cache import SEQUENCE_RESYNC_RESULTS
+from tx_pipeline import TxPipeline, never_applied
+from xrpl_client import client, platform_wallet
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, 300))
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        wallet=platform_wallet,
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        poll_interval: float = settings.OUTBOX_POLL_INTERVAL_S,
+        max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+        lease_s: int = settings.OUTBOX_LEASE_S,
+        owner: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.wallet = wallet
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_s)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Transitions ----------
+
+    def _donations_of(self, db: Session, entry: EscrowOutbox):
+        # escrow agrégé : les donations scellées dans le pool suivent son statut
+        if entry.pool_id is not None:
+            return db.query(Donation).filter(
+                Donation.pool_id == entry.pool_id, Donation.pool_sealed.is_(True)
+            )
+        return db.query(Donation).filter(Donation.id == entry.donation_id)
+
+    def _mark_locked(self, db: Session, entry: EscrowOutbox, sequence: int) -> None:
+        entry.status = OutboxStatus.DONE
+        entry.sequence = sequence
+        if entry.pool_id is not None:
+            db.query(PooledEscrow).filter(PooledEscrow.id == entry.pool_id).update(
+                {PooledEscrow.status: PoolStatus.LOCKED, PooledEscrow.escrow_sequence: sequence},
+                synchronize_session=False,
+            )
+        self._donations_of(db, entry).update(
+            {Donation.status: DonationStatus.LOCKED, Donation.escrow_sequence: sequence},
+            synchronize_session=False,
+        )
+
+    def _mark_failed(self, db: Session, entry: EscrowOutbox, error: str) -> None:
+        entry.status = OutboxStatus.FAILED
+        entry.last_error = error
+        if entry.pool_id is not None:
+            db.query(PooledEscrow).filter(PooledEscrow.id == entry.pool_id).update(
+                {PooledEscrow.status: PoolStatus.FAILED}, synchronize_session=False
+            )
+        self._donations_of(db, entry).update(
+            {Donation.status: DonationStatus.FAILED}, synchronize_session=False
+        )
+
+    def _retry_later(self, db: Session, entry: EscrowOutbox, error: str, now: datetime) -> None:
+        # la tx précédente ne sera jamais incluse : on pourra re-signer
+        entry.attempts += 1
+        entry.last_error = error
+        if entry.attempts >= self.max_attempts:
+            self._mark_failed(db, entry, error)
+            return
+        entry.status = OutboxStatus.PENDING
+        entry.tx_hash = None
+        entry.tx_blob = None
+        entry.next_attempt_at = now + _backoff(entry.attempts)
+
+    # ---------- Un passage ----------
+
+    def _claim(self, db: Session, now: datetime) -> List[EscrowOutbox]:
+        free = or_(EscrowOutbox.lease_until.is_(None), EscrowOutbox.lease_until < now)
+        due = [
+            entry_id
+            for (entry_id,) in db.query(EscrowOutbox.id)
+            .filter(
+                EscrowOutbox.status.in_([OutboxStatus.PENDING, OutboxStatus.SUBMITTED]),
+                EscrowOutbox.next_attempt_at <= now,
+                free,
+            )
+            .order_by(EscrowOutbox.id)
+            .limit(self.batch_size)
+        ]
+        if not due:
+            return []
+        until = now + self.lease
+        db.query(EscrowOutbox).filter(EscrowOutbox.id.in_(due), free).update(
+            {EscrowOutbox.lease_owner: self.owner, EscrowOutbox.lease_until: until},
+            synchronize_session=False,
+        )
+        db.commit()
+        # seules les entrées dont CE passage a posé le bail
+        return (
+            db.query(EscrowOutbox)
+            .filter(
+                EscrowOutbox.id.in_(due),
+                EscrowOutbox.lease_owner == self.owner,
+                EscrowOutbox.lease_until == until,
+            )
+            .order_by(EscrowOutbox.id)
+            .all()
+        )
+
+    def _release(self, db: Session, entries: List[EscrowOutbox]) -> None:
+        db.query(EscrowOutbox).filter(
+            EscrowOutbox.id.in_([e.id for e in entries]),
+            EscrowOutbox.lease_owner == self.owner,
+        ).update(
+            {EscrowOutbox.lease_owner: None, EscrowOutbox.lease_until: None},
+            synchronize_session=False,
+        )
+        db.commit()
+
+    def _run_mock(self, db: Session, entries: List[EscrowOutbox]) -> None:
+        for entry in entries:
+            tx = json.loads(entry.tx_json)
+            resp = create_donation_escrow(
+                donor_wallet=self.wallet,
+                ong_address=tx["destination"],
+                amount_xrp=float(tx["amount"]) / 1_000_000,
+                cancel_after=datetime.utcnow(),
+                condition_hex=tx["condition"],
+            )
+            self._mark_locked(db, entry, resp["tx_json"]["Sequence"])
+        db.commit()
+
+    def _check_submitted(self, db: Session, pipeline: TxPipeline, entries, now) -> None:
+        if not entries:
+            return
+        validated = pipeline.validated_ledger_index()
+        for entry in entries:
+            res = pipeline.lookup_validated(entry.id, entry.tx_hash)
+            if res is None:
+                if validated > entry.last_ledger_sequence:
+                    self._retry_later(db, entry, "expired", now)
+                    pipeline.resync_sequence()
+                continue
+            if res.success:
+                self._mark_locked(db, entry, entry.sequence)
+            else:
+                # tec* : inclus dans un ledger mais sans effet, frais payés
+                self._mark_failed(db, entry, res.engine_result)
+        db.commit()
+
+    def _sign_and_submit(self, db: Session, pipeline: TxPipeline, entries, now) -> None:
+        if not entries:
+            return
+        # Sequences réservées d'un bloc dans le cache partagé
+        sequence = pipeline.next_sequence(len(entries))
+        fee = pipeline.open_ledger_fee()
+        last_ledger = pipeline.validated_ledger_index() + pipeline.ledger_window
+
+        for entry in entries:
+            tx = Transaction.from_dict(json.loads(entry.tx_json))
+            signed = pipeline.prepare(tx, sequence, fee, last_ledger)
+            entry.sequence = sequence
+            entry.last_ledger_sequence = last_ledger
+            entry.tx_hash = signed.get_hash()
+            entry.tx_blob = signed.blob()
+            entry.status = OutboxStatus.SUBMITTED
+            sequence += 1
+        # write-ahead : hash / blob durables avant tout envoi au réseau
+        db.commit()
+
+        for entry in entries:
+            try:
+                prelim = pipeline.submit_blob(entry.tx_blob)
+            except Exception as e:
+                # état réseau inconnu : on laisse SUBMITTED, le suivi tranchera
+                print(f"[OUTBOX] submit error for outbox {entry.id}: {e}")
+                continue
+            engine_result = prelim.get("engine_result", "")
+            if engine_result in SEQUENCE_RESYNC_RESULTS:
+                pipeline.resync_sequence()
+            if never_applied(engine_result):
+                self._retry_later(db, entry, engine_result, now)
+                pipeline.resync_sequence()
+        db.commit()
+
+    def run_once(self) -> int:
+        """Traite un lot d'entrées dues. Renvoie le nombre d'entrées traitées."""
+        db: Session = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            if settings.DONATION_POOLING_ENABLED:
+                # pools dont la période est écoulée -> EscrowCreate dans l'outbox
+                seal_due_pools(db, self.wallet, now)
+            entries = self._claim(db, now)
+            if not entries:
+                return 0
+
+            if settings.XRPL_MOCK:
+                self._run_mock(db, entries)
+            else:
+                pipeline = TxPipeline(client, self.wallet)
+                self._check_submitted(
+                    db, pipeline, [e for e in entries if e.status == OutboxStatus.SUBMITTED], now
+                )
+                self._sign_and_submit(
+                    db, pipeline, [e for e in entries if e.status == OutboxStatus.PENDING], now
+                )
+            self._release(db, entries)
+            return len(entries)
+        except Exception as e:
+            db.rollback()
+            print(f"[OUTBOX] run error: {e}")
+            return 0
+        finally:
+            db.close()
+
+    # ---------- Boucle ----------
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            if self.run_once() == 0:
+                self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="escrow-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+outbox_worker = OutboxWorker()
+
+
+if __name__ == "__main__":
+    print("[OUTBOX] Worker started")
+    try:
+        outbox_worker.run_forever()
+    except KeyboardInterrupt:
+        pass
@@ -4,14 +4,117 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     XRPL_RPC_URL: str = "https://s.altnet.rippletest.net:51234"
+    XRPL_WS_URL: str = "wss://s.altnet.rippletest.net:51233"
+    XRPL_WS_POOL_SIZE: int = 4
+    XRPL_TX_WAIT_TIMEOUT_S: float = 120.0  # attente max de la validation d'une tx (xrpl_async.py)
+    XRPL_STREAM_CHECK_S: float = 10.0  # flux muet : tx et ledger vérifiés par requête
     PLATFORM_SEED: str = "snFAKEFAKEFAKEFAKE"
     DATABASE_URL: str = "sqlite:///./impact_map.db"
 
     XRPL_MOCK: bool = True
 
+    # Ledger simulé en mémoire (xrpl_sim.py), à utiliser avec XRPL_MOCK=false
+    XRPL_SIMULATOR: bool = False
+    XRPL_SIM_CLOSE_INTERVAL_S: float = 1.0
+    XRPL_SIM_LATENCY_MS: float = 0.0
+    XRPL_SIM_FAILURE_RATE: float = 0.0
+    XRPL_SIM_LOST_RESPONSE_RATE: float = 0.0
+    XRPL_SIM_FUND_XRP: float = 1_000_000.0  # wallet plateforme + comptes inconnus
+
     # <<< NOUVEAU
     UPLOAD_DIR: str = "uploads"
 
+    # File d'écriture group-commit (evidences / donations)
+    WRITE_QUEUE_ENABLED: bool = True
+    WRITE_QUEUE_MAX_BATCH: int = 100
+    WRITE_QUEUE_MAX_DELAY_MS: float = 5.0
+
+    # Pipeline de soumission XRPL (tx_pipeline.py)
+    TX_PIPELINE_MAX_IN_FLIGHT: int = 32
+    TX_LEDGER_WINDOW: int = 20  # LastLedgerSequence = ledger validé + fenêtre
+    TX_POLL_INTERVAL_S: float = 1.0
+    XRPL_FEE_CACHE_TTL_S: float = 4.0  # client sans flux ledger (tx_cache.py)
+
+    # Outbox des EscrowCreate (outbox_worker.py)
+    OUTBOX_WORKER_ENABLED: bool = True  # thread dans le process API
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_INTERVAL_S: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_LEASE_S: int = 120  # bail sur les entrées prises par un worker
+
+    # Escrows agrégés par projet et par période (donation_pool.py)
+    DONATION_POOLING_ENABLED: bool = False
+    DONATION_POOL_PERIOD_S: int = 3600
+    DONATION_POOL_DEADLINE_MARGIN_S: int = 600  # escrow individuel au-delà
+
+    # Verdicts / remboursements automatiques après deadline (deadline_sweeper.py)
+    DEADLINE_SWEEPER_ENABLED: bool = True  # thread dans le process API
+    DEADLINE_SWEEP_HORIZON_S: int = 3600  # deadlines chargées en file à l'avance
+    DEADLINE_SWEEP_REFRESH_S: float = 60.0
+    DEADLINE_SWEEP_BATCH: int = 50
+    DEADLINE_SWEEP_LEASE_S: int = 300
+    DEADLINE_SWEEP_RETRY_S: int = 300  # projet avec escrows encore à régler
+
+    # Ancrage Merkle des verdicts et scores IA (anchoring.py, anchor_worker.py)
+    ANCHORING_ENABLED: bool = True
+    ANCHOR_INTERVAL_S: int = 600  # âge max d'un enregistrement avant ancrage
+    ANCHOR_MAX_RECORDS: int = 10000  # feuilles max par lot
+    ANCHOR_POLL_INTERVAL_S: float = 5.0
+    ANCHOR_MAX_ATTEMPTS: int = 8
+    ANCHOR_LEASE_S: int = 120  # bail sur les lots pris par un worker
+
+    # Vérification des signatures wallet des evidences (signature_verifier.py)
+    EVIDENCE_VERIFIER_ENABLED: bool = True  # thread dans le process API
+    # True : seules les evidences à signature valide comptent pour le verdict
+    # (après bascule : python evidence_aggregates.py --repair)
+    EVIDENCE_SIGNATURE_REQUIRED: bool = False
+    EVIDENCE_VERIFY_BATCH: int = 1000
+    EVIDENCE_VERIFY_PROCESSES: int = 0  # 0 = un par CPU
+    EVIDENCE_VERIFY_PARALLEL_MIN: int = 64  # en dessous : vérifié dans le thread
+    EVIDENCE_VERIFY_POLL_INTERVAL_S: float = 1.0
+
+    # Index spatial des validateurs (validator_service.py)
+    VALIDATOR_INDEX_CELL_DEG: float = 0.5  # ~55 km en latitude
+    VALIDATOR_INDEX_REFRESH_S: float = 2.0  # relecture des validateurs modifiés
+    VALIDATOR_INDEX_RELOAD_S: float = 300.0  # rechargement complet
+
+    # Affectation groupée des validateurs (validator_assignment.py)
+    VALIDATORS_PER_PROJECT: int = 3
+    VALIDATOR_CAPACITY: int = 5  # projets simultanés max par validateur
+    VALIDATOR_MAX_RADIUS_KM: float = 50.0
+    ASSIGN_CANDIDATES: int = 20  # meilleurs candidats gardés par projet
+
+    # Verdict (trust_optimizer.py ; calibrage : verdict_simulator.py)
+    VERDICT_GPS_WEIGHT: float = 0.4
+    VERDICT_REP_WEIGHT: float = 0.3
+    VERDICT_CV_WEIGHT: float = 0.3
+    VERDICT_EVIDENCE_WEIGHT: float = 0.6  # le reste : score de l'ONG
+    VERDICT_SUCCESS_THRESHOLD: float = 0.7
+    VERDICT_MIN_EVIDENCES: int = 2
+    # budget de latence du verdict, scoring IA vision compris (vision_guard.py)
+    VERDICT_DEADLINE_S: float = 10.0
+    VISION_WORKERS: int = 4
+    VISION_ITEM_TIMEOUT_S: float = 3.0  # par image, à partir de son démarrage
+    VISION_BREAKER_FAILURES: int = 5  # échecs / timeouts consécutifs -> circuit ouvert
+    VISION_BREAKER_RESET_S: float = 30.0  # avant un appel d'essai
+    VISION_CACHE_SIZE: int = 10000  # scores par image gardés en mémoire
+    # POST /verdicts/batch (verdict_batch.py)
+    VERDICT_BATCH_CHUNK: int = 100  # projets par transaction / lot IA vision
+    VERDICT_BATCH_MAX: int = 5000  # projets max par appel
+
+    # Réputation des validateurs (validator_reputation.py)
+    REPUTATION_HALF_LIFE_DAYS: float = 180.0  # poids d'une mission divisé par 2
+    REPUTATION_PRIOR: float = 1.0  # taux supposé sans historique (= défaut de success_rate)
+    REPUTATION_PRIOR_WEIGHT: float = 2.0  # en missions « fraîches »
+
+    # Réconciliation base / ledger (escrow_reconcile.py)
+    ESCROW_RECONCILE_PAGE_SIZE: int = 400  # limite account_objects par page
+
+    # Instrumentation SQL (db_metrics.py)
+    DB_SLOW_QUERY_MS: float = 100.0
+    DB_QUERY_BUDGET_DEFAULT: int = 0  # 0 = pas de budget pour les routes non listées
+    DB_QUERY_BUDGET_STRICT: bool = False  # True en tests : dépassement = exception
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,129 @@
+# settlement.py
+"""
+Règlement on-chain des donations après verdict :
+  - SUCCESS : EscrowFinish de chaque donation LOCKED
+  - FAILURE : EscrowCancel des donations LOCKED dont cancel_after est passé
+
+Toutes les tx d'un lot passent par submit_escrow_batch (pipeline) ; les
+résultats sont persistés ensemble en fin de lot, un UPDATE executemany par
+modèle (nombre de requêtes indépendant du nombre d'escrows). Une coupure
+avant cette écriture est rattrapée par escrow_reconcile.py.
+
+Les escrows agrégés (PooledEscrow, donation_pool.py) sont réglés de la même
+façon, une tx par pool ; leurs donations suivent le statut du pool.
+"""
+from datetime import datetime
+from typing import Dict, List, Union
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from escrow_service import build_cancel_tx, build_finish_tx, submit_escrow_batch
+from models import Donation, DonationStatus, PooledEscrow, PoolStatus
+from tx_pipeline import TxJob, TxResult
+from write_queue import run_write
+
+
+# escrow individuel ou agrégé : mêmes champs escrow_* / condition / cancel_after
+Escrowed = Union[Donation, PooledEscrow]
+
+_TARGET = {
+    Donation: (DonationStatus.RELEASED, DonationStatus.REFUNDED),
+    PooledEscrow: (PoolStatus.RELEASED, PoolStatus.REFUNDED),
+}
+
+
+def build_settlement_jobs(
+    donor_wallet,
+    donations: List[Escrowed],
+    decision: str,
+    now: datetime,
+) -> List[TxJob]:
+    jobs: List[TxJob] = []
+    for d in donations:
+        if d.status != "LOCKED":
+            continue
+        model = type(d)
+        released, refunded = _TARGET[model]
+        if decision == "SUCCESS":
+            tx = build_finish_tx(
+                donor_wallet,
+                owner=d.escrow_owner,
+                offer_sequence=d.escrow_sequence,
+                condition_hex=d.condition_hex,
+                fulfillment_hex=d.fulfillment_hex,
+            )
+            jobs.append(((model, d.id, released), tx))
+        else:
+            if now < d.cancel_after:
+                # on ne peut pas encore cancel on-chain, on laisse en LOCKED
+                continue
+            tx = build_cancel_tx(
+                donor_wallet,
+                owner=d.escrow_owner,
+                offer_sequence=d.escrow_sequence,
+            )
+            jobs.append(((model, d.id, refunded), tx))
+    return jobs
+
+
+def _persist_results(s: Session, results: List[TxResult]) -> None:
+    """Statuts et tx de règlement de tout le lot, un executemany par modèle et par issue."""
+    # executemany Core (le bulk update ORM n'accepte pas le critère status)
+    conn = s.connection()
+    for model in (Donation, PooledEscrow):
+        rows = [r for r in results if r.key[0] is model]
+        settled = [
+            {"b_id": r.key[1], "b_status": r.key[2], "b_hash": r.tx_hash, "b_result": r.engine_result}
+            for r in rows
+            if r.success
+        ]
+        # échec : reste LOCKED, sera retenté au prochain verdict
+        failed = [
+            {"b_id": r.key[1], "b_hash": r.tx_hash, "b_result": r.engine_result}
+            for r in rows
+            if not r.success
+        ]
+        locked = update(model).where(model.id == bindparam("b_id"), model.status == "LOCKED")
+        trace = {"settle_tx_hash": bindparam("b_hash"), "settle_result": bindparam("b_result")}
+        if settled:
+            conn.execute(locked.values(status=bindparam("b_status"), **trace), settled)
+        if failed:
+            conn.execute(locked.values(**trace), failed)
+        if model is PooledEscrow and settled:
+            # les donations scellées du pool suivent son statut
+            conn.execute(
+                update(Donation)
+                .where(Donation.pool_id == bindparam("b_id"), Donation.status == DonationStatus.LOCKED)
+                .values(status=bindparam("b_donation_status"), **trace),
+                [{**row, "b_donation_status": DonationStatus(row["b_status"].value)} for row in settled],
+            )
+
+
+def settle_jobs(db: Session, donor_wallet, jobs: List[TxJob]) -> Dict[str, int]:
+    """
+    Soumet les jobs (clé = (modèle, id, statut visé)) puis persiste tous les
+    résultats en une écriture. Renvoie un résumé {submitted, settled, failed}.
+    """
+    summary = {"submitted": len(jobs), "settled": 0, "failed": 0}
+    results: List[TxResult] = []
+
+    def _on_result(res: TxResult) -> None:
+        results.append(res)
+        summary["settled" if res.success else "failed"] += 1
+
+    submit_escrow_batch(donor_wallet, jobs, _on_result)
+
+    if results:
+        run_write(db, lambda s: _persist_results(s, results))
+    return summary
+
+
+def settle_project_donations(
+    db: Session,
+    donor_wallet,
+    donations: List[Escrowed],
+    decision: str,
+) -> Dict[str, int]:
+    jobs = build_settlement_jobs(donor_wallet, donations, decision, datetime.utcnow())
+    return settle_jobs(db, donor_wallet, jobs)
@@ -0,0 +1,223 @@
+# signature_verifier.py
+"""
+Vérification des signatures wallet des evidences, hors du chemin d'upload.
+
+POST /projects/{id}/evidence et /evidence/bulk insèrent l'evidence avec
+signature_valid NULL et réveillent ce worker, qui :
+  1. prend un lot d'evidences non vérifiées (ix_evidences_signature_valid)
+     avec l'adresse et la clé connue de leur validateur (une requête)
+  2. résout la clé publique : présentée avec la preuve ou déjà retenue pour
+     le validateur (cache mémoire + colonne validators.public_key) ; elle
+     doit redonner l'adresse du validateur
+  3. vérifie les signatures (evidence_signature.py) dans un pool de process
+     dès que le lot dépasse EVIDENCE_VERIFY_PARALLEL_MIN (~6 ms CPU par
+     signature en Python pur), sinon dans le thread
+  4. écrit signature_valid (UPDATE conditionnel : un seul réplica gagne),
+     retient les nouvelles clés, et avec EVIDENCE_SIGNATURE_REQUIRED ajoute
+     les evidences valides aux agrégats du verdict
+Le verdict ne paie donc jamais la vérification.
+
+Lancement : thread démarré par main.py (EVIDENCE_VERIFIER_ENABLED), ou
+`python signature_verifier.py` pour un process séparé.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from evidence_aggregates import count_evidences
+from evidence_signature import address_of, evidence_message, verify_batch, verify_one
+from models import Evidence, Validator
+from settings import settings
+
+
+class SignatureVerifier:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = settings.EVIDENCE_VERIFY_BATCH,
+        processes: int = settings.EVIDENCE_VERIFY_PROCESSES,
+        parallel_min: int = settings.EVIDENCE_VERIFY_PARALLEL_MIN,
+        poll_interval: float = settings.EVIDENCE_VERIFY_POLL_INTERVAL_S,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.processes = processes or os.cpu_count() or 1
+        self.parallel_min = parallel_min
+        self.poll_interval = poll_interval
+
+        # xrpl_address -> clé publique retenue
+        self._keys: Dict[str, str] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Vérification ----------
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn : pas de fork d'un process API multi-threadé
+            self._pool = ProcessPoolExecutor(
+                self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _verify(self, tasks) -> List[bool]:
+        if len(tasks) < self.parallel_min or self.processes <= 1:
+            return verify_batch(tasks)
+        chunksize = max(1, len(tasks) // (self.processes * 4))
+        return list(self._executor().map(verify_one, tasks, chunksize=chunksize))
+
+    def _key_for(self, address: str, presented: Optional[str], known: Optional[str]) -> Optional[str]:
+        key = presented or self._keys.get(address) or known
+        if key is None or address_of(key) != address:
+            return None
+        return key
+
+    # ---------- Un passage ----------
+
+    def _claim(self, db: Session):
+        return (
+            db.query(
+                Evidence.id,
+                Evidence.project_id,
+                Evidence.validator_id,
+                Evidence.image_url,
+                Evidence.latitude,
+                Evidence.longitude,
+                Evidence.timestamp,
+                Evidence.wallet_signature,
+                Evidence.public_key,
+                Evidence.gps_score,
+                Evidence.cv_score,
+                Validator.xrpl_address,
+                Validator.public_key.label("validator_key"),
+                Validator.success_rate,
+            )
+            .join(Validator, Validator.id == Evidence.validator_id)
+            .filter(Evidence.signature_valid.is_(None))
+            .order_by(Evidence.id)
+            .limit(self.batch_size)
+            .all()
+        )
+
+    def run_once(self) -> int:
+        """Vérifie un lot d'evidences. Renvoie le nombre d'evidences traitées."""
+        db: Session = self.session_factory()
+        try:
+            rows = self._claim(db)
+            if not rows:
+                return 0
+
+            keys = [self._key_for(r.xrpl_address, r.public_key, r.validator_key) for r in rows]
+            checkable = [i for i, k in enumerate(keys) if k is not None]
+            tasks = [
+                (
+                    evidence_message(
+                        rows[i].project_id, rows[i].xrpl_address, rows[i].image_url,
+                        rows[i].latitude, rows[i].longitude, rows[i].timestamp,
+                    ),
+                    rows[i].wallet_signature,
+                    keys[i],
+                )
+                for i in checkable
+            ]
+            valid = [False] * len(rows)
+            for i, ok in zip(checkable, self._verify(tasks)):
+                valid[i] = ok
+
+            if settings.EVIDENCE_SIGNATURE_REQUIRED:
+                # avant l'UPDATE : les validateurs distincts se comptent par
+                # rapport aux evidences déjà validées
+                count_evidences(
+                    db,
+                    [r._asdict() for r, ok in zip(rows, valid) if ok],
+                    {r.validator_id: r.success_rate for r in rows},
+                )
+
+            updated = db.execute(
+                update(Evidence.__table__)
+                .where(
+                    Evidence.__table__.c.id == bindparam("eid"),
+                    Evidence.__table__.c.signature_valid.is_(None),
+                )
+                .values(signature_valid=bindparam("ok")),
+                [{"eid": r.id, "ok": ok} for r, ok in zip(rows, valid)],
+            ).rowcount
+            if db.get_bind().dialect.supports_sane_multi_rowcount and updated != len(rows):
+                # lot (en partie) traité par un autre réplica
+                db.rollback()
+                return 0
+
+            new_keys = {
+                r.xrpl_address: keys[i]
+                for i, r in enumerate(rows)
+                if valid[i] and r.validator_key != keys[i]
+            }
+            if new_keys:
+                db.execute(
+                    update(Validator.__table__)
+                    .where(Validator.__table__.c.xrpl_address == bindparam("addr"))
+                    .values(public_key=bindparam("key")),
+                    [{"addr": a, "key": k} for a, k in new_keys.items()],
+                )
+
+            db.commit()
+            self._keys.update(new_keys)
+
+            n_valid = sum(valid)
+            print(f"[SIGNATURES] {len(rows)} evidence(s) checked, {n_valid} valid, {len(rows) - n_valid} invalid")
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            print(f"[SIGNATURES] run error: {e}")
+            return 0
+        finally:
+            db.close()
+
+    # ---------- Boucle ----------
+
+    def notify(self) -> None:
+        """Nouvelles evidences insérées : vérification sans attendre le poll."""
+        self._wake.set()
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            if self.run_once() == 0:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="signature-verifier", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+signature_verifier = SignatureVerifier()
+
+
+if __name__ == "__main__":
+    print("[SIGNATURES] Worker started")
+    try:
+        signature_verifier.run_forever()
+    except KeyboardInterrupt:
+        pass
+    signature_verifier.stop()
@@ -0,0 +1,58 @@
+# conftest.py
+"""
+Configuration commune des tests : base SQLite temporaire, XRPL mocké,
+workers en arrière-plan désactivés (les tests appellent run_once
+eux-mêmes). Les variables d'environnement doivent être posées avant
+l'import de settings.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_TMP = tempfile.mkdtemp(prefix="impact-map-tests-")
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite:///{_TMP}/test.db",
+        "XRPL_MOCK": "true",
+        "XRPL_SIMULATOR": "false",
+        "OUTBOX_WORKER_ENABLED": "false",
+        "DEADLINE_SWEEPER_ENABLED": "false",
+        "ANCHORING_ENABLED": "false",
+        "EVIDENCE_VERIFIER_ENABLED": "false",
+        "DB_QUERY_BUDGET_STRICT": "true",
+        "UPLOAD_DIR": f"{_TMP}/uploads",
+    }
+)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+from xrpl.wallet import Wallet  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+from xrpl_sim import SimulatedLedger  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """Session sur un schéma vide."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def ledger():
+    """Ledger simulé fermé toutes les 50 ms, wallet plateforme approvisionné."""
+    sim = SimulatedLedger(close_interval=0.05, auto_fund_drops=100_000_000_000)
+    wallet = Wallet.create()
+    sim.fund(wallet.address, 100_000_000_000)
+    sim.start()
+    try:
+        yield sim, wallet
+    finally:
+        sim.stop()
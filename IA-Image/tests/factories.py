@@ -0,0 +1,136 @@
+# factories.py
+"""Lignes de test minimales (projets, donations en attente d'escrow)."""
+import json
+from datetime import datetime, timedelta
+
+from xrpl.wallet import Wallet
+
+from escrow_service import build_create_tx, generate_secret_and_condition
+from evidence_aggregates import count_evidences, record_new_evidences
+from models import (
+    Donation,
+    DonationStatus,
+    EscrowOutbox,
+    Evidence,
+    PooledEscrow,
+    PoolStatus,
+    Project,
+    ProjectStatus,
+    Validator,
+)
+from settings import settings
+
+
+def make_project(db, status=ProjectStatus.OPEN, deadline=None, **kwargs) -> Project:
+    project = Project(
+        title=kwargs.pop("title", "Puits"),
+        ong_address=kwargs.pop("ong_address", Wallet.create().address),
+        latitude=kwargs.pop("latitude", 14.7),
+        longitude=kwargs.pop("longitude", -17.4),
+        deadline=deadline or datetime.utcnow() + timedelta(days=30),
+        amount_target=kwargs.pop("amount_target", 100.0),
+        status=status,
+        **kwargs,
+    )
+    db.add(project)
+    db.flush()
+    return project
+
+
+def make_pending_donation(db, project: Project, wallet, amount_xrp: float = 2.0) -> Donation:
+    """Donation PENDING + son entrée d'outbox, comme POST /projects/{id}/donate."""
+    fulfillment_hex, condition_hex = generate_secret_and_condition()
+    tx = build_create_tx(wallet, project.ong_address, amount_xrp, project.deadline, condition_hex)
+    donation = Donation(
+        project_id=project.id,
+        donor_address=Wallet.create().address,
+        amount_xrp=amount_xrp,
+        escrow_owner=wallet.address,
+        condition_hex=condition_hex,
+        fulfillment_hex=fulfillment_hex,
+        cancel_after=project.deadline,
+        status=DonationStatus.PENDING,
+    )
+    db.add(donation)
+    db.flush()
+    db.add(EscrowOutbox(donation_id=donation.id, tx_json=json.dumps(tx.to_dict())))
+    db.flush()
+    return donation
+
+
+def make_locked_donation(db, project: Project, wallet, sequence: int, amount_xrp: float = 2.0) -> Donation:
+    """Donation à escrow individuel déjà créé on-chain (LOCKED)."""
+    donation = make_pending_donation(db, project, wallet, amount_xrp)
+    donation.status = DonationStatus.LOCKED
+    donation.escrow_sequence = sequence
+    db.flush()
+    return donation
+
+
+def make_locked_pool(db, project: Project, wallet, sequence: int, members: int = 2) -> PooledEscrow:
+    """Escrow agrégé LOCKED et ses donations scellées."""
+    fulfillment_hex, condition_hex = generate_secret_and_condition()
+    pool = PooledEscrow(
+        project_id=project.id,
+        period_start=datetime.utcnow() - timedelta(days=1),
+        period_end=datetime.utcnow(),
+        amount_xrp=float(members),
+        donation_count=members,
+        escrow_owner=wallet.address,
+        escrow_sequence=sequence,
+        condition_hex=condition_hex,
+        fulfillment_hex=fulfillment_hex,
+        cancel_after=project.deadline,
+        status=PoolStatus.LOCKED,
+    )
+    db.add(pool)
+    db.flush()
+    db.add_all(
+        Donation(
+            project_id=project.id,
+            donor_address=Wallet.create().address,
+            amount_xrp=1.0,
+            escrow_owner=wallet.address,
+            escrow_sequence=sequence,
+            condition_hex=condition_hex,
+            fulfillment_hex=fulfillment_hex,
+            cancel_after=project.deadline,
+            status=DonationStatus.LOCKED,
+            pool_id=pool.id,
+            pool_sealed=True,
+        )
+        for _ in range(members)
+    )
+    db.flush()
+    return pool
+
+
+def make_validator(db, success_rate: float = 1.0, **kwargs) -> Validator:
+    validator = Validator(xrpl_address=Wallet.create().address, success_rate=success_rate, **kwargs)
+    db.add(validator)
+    db.flush()
+    return validator
+
+
+def add_evidences(db, project: Project, validator: Validator, n: int = 1, cv_score=0.9) -> None:
+    """n evidences signées sur le site du projet, comptées dans les agrégats."""
+    rows = [
+        {
+            "project_id": project.id,
+            "validator_id": validator.id,
+            "image_url": f"https://img.test/{project.id}-{validator.id}-{i}.jpg",
+            "latitude": project.latitude,
+            "longitude": project.longitude,
+            "timestamp": datetime.utcnow(),
+            "wallet_signature": "00",
+            "signature_valid": True,
+            "cv_score": cv_score,
+        }
+        for i in range(n)
+    ]
+    reputations = {validator.id: validator.success_rate}
+    record_new_evidences(db, rows, reputations)
+    if settings.EVIDENCE_SIGNATURE_REQUIRED:
+        count_evidences(db, rows, reputations)
+    db.add_all(Evidence(**r) for r in rows)
+    db.flush()
@@ -0,0 +1,85 @@
+# test_anchor_worker.py
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import anchor_worker as anchor_module
+from anchor_worker import AnchorWorker
+from anchoring import record_anchor, seal_anchor_batch
+from database import SessionLocal
+from models import AnchorBatch, AnchorStatus
+from settings import settings
+
+
+def _sealed_batches(db, n: int):
+    now = datetime.utcnow()
+    for i in range(n):
+        record_anchor(db, "verdict", i, {"decision": "SUCCESS"}, now)
+        db.commit()
+        seal_anchor_batch(db, now, interval_s=0)
+
+
+@pytest.fixture
+def live(ledger, monkeypatch):
+    sim, wallet = ledger
+    monkeypatch.setattr(anchor_module, "client", sim)
+    monkeypatch.setattr(settings, "XRPL_MOCK", False)
+    monkeypatch.setattr(settings, "ANCHORING_ENABLED", True)
+    return sim, wallet
+
+
+def test_claim_is_exclusive_until_lease_expires(db, live):
+    _, wallet = live
+    _sealed_batches(db, 2)
+
+    a = AnchorWorker(wallet=wallet, owner="a", lease_s=60)
+    b = AnchorWorker(wallet=wallet, owner="b", lease_s=60)
+    now = datetime.utcnow()
+    assert len(a._claim(SessionLocal(), now)) == 2
+    assert b._claim(SessionLocal(), now) == []
+    assert len(b._claim(SessionLocal(), now + timedelta(seconds=61))) == 2
+
+
+def test_concurrent_workers_anchor_each_batch_once(db, live):
+    sim, wallet = live
+    _sealed_batches(db, 6)
+    workers = [AnchorWorker(wallet=wallet, owner=f"w{i}") for i in range(3)]
+
+    def _drain(worker):
+        for _ in range(200):
+            worker.run_once()
+            with SessionLocal() as s:
+                if not s.query(AnchorBatch).filter(AnchorBatch.status != AnchorStatus.ANCHORED).count():
+                    return
+
+    threads = [threading.Thread(target=_drain, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    batches = db.query(AnchorBatch).all()
+    assert {b.status for b in batches} == {AnchorStatus.ANCHORED}
+    account_sets = [r for r in sim.txs.values() if r.tx_json["TransactionType"] == "AccountSet"]
+    assert len(account_sets) == len(batches) == 6
+    assert all(b.lease_owner is None for b in batches)
+
+
+def test_expired_batch_waits_for_backoff(db, live):
+    sim, wallet = live
+    _sealed_batches(db, 1)
+    batch = db.query(AnchorBatch).one()
+    # soumis puis jamais validé : LastLedgerSequence dépassé
+    batch.status = AnchorStatus.SUBMITTED
+    batch.tx_hash = "00" * 32
+    batch.last_ledger_sequence = 0
+    db.commit()
+
+    assert AnchorWorker(wallet=wallet, owner="a").run_once() == 1
+    db.expire_all()
+    batch = db.get(AnchorBatch, batch.id)
+    assert batch.status == AnchorStatus.PENDING and batch.last_error == "expired"
+    assert batch.next_attempt_at > datetime.utcnow()
+    assert batch.tx_hash is None
+    assert not [r for r in sim.txs.values() if r.tx_json["TransactionType"] == "AccountSet"]
@@ -0,0 +1,38 @@
+# test_deadline_sweeper.py
+from datetime import datetime, timedelta
+
+from deadline_sweeper import DeadlineSweeper
+from factories import make_project
+from models import Project
+
+
+def test_refill_orders_on_lease_expiry(db):
+    now = datetime.utcnow()
+    # projets en échec repoussés par un autre réplica : deadlines plus
+    # anciennes, mais bail encore actif (dans l'horizon ou au-delà)
+    retried = [
+        make_project(
+            db,
+            deadline=now - timedelta(days=2),
+            lease_owner="other",
+            lease_until=now + timedelta(minutes=10 if i % 2 else 120),
+        )
+        for i in range(30)
+    ]
+    fresh = make_project(db, deadline=now - timedelta(hours=1))
+    expired = make_project(
+        db, deadline=now - timedelta(days=3), lease_owner="gone", lease_until=now - timedelta(minutes=1)
+    )
+    db.commit()
+
+    sweeper = DeadlineSweeper(session_factory=None, horizon_s=3600, batch_size=1)
+    sweeper._refill(db, now)
+
+    # limite à 20 lignes : les nouvelles deadlines passent avant les baux
+    assert len(sweeper._heap) == 17
+    assert sweeper._pop_due(now) == [fresh.id]
+    assert sweeper._pop_due(now) == [expired.id]
+    assert sweeper._pop_due(now) == []
+    leased = {p.id for p in retried if p.lease_until < now + timedelta(hours=1)}
+    assert {pid for _, pid in sweeper._heap} <= leased
+    assert sweeper._heap[0][0] == db.get(Project, sorted(leased)[0]).lease_until
@@ -0,0 +1,117 @@
+# test_donation_pool.py
+import threading
+from datetime import datetime, timedelta
+
+from xrpl.wallet import Wallet
+
+from database import SessionLocal
+from donation_pool import open_pool_for, pool_proof, seal_due_pools
+from factories import make_project
+from models import Donation, DonationStatus, EscrowOutbox, PooledEscrow, PoolStatus
+from outbox_worker import OutboxWorker
+
+
+def _pooled_donation(s, project_id, cancel_after, wallet, now, amount_xrp=1.0) -> Donation:
+    """Comme le donate en mode agrégé (réservation du pool + insertion)."""
+    pool = open_pool_for(s, project_id, cancel_after, wallet.address, now)
+    donation = Donation(
+        project_id=project_id,
+        donor_address=Wallet.create().address,
+        amount_xrp=amount_xrp,
+        escrow_owner=pool.escrow_owner,
+        condition_hex=pool.condition_hex,
+        fulfillment_hex=pool.fulfillment_hex,
+        cancel_after=cancel_after,
+        status=DonationStatus.PENDING,
+        pool_id=pool.id,
+    )
+    s.add(donation)
+    s.flush()
+    return donation
+
+
+def test_seal_waits_for_donation_holding_the_pool(db):
+    wallet = Wallet.create()
+    project = make_project(db)
+    project_id, cancel_after = project.id, project.deadline
+    now = datetime.utcnow()
+    first = _pooled_donation(db, project_id, cancel_after, wallet, now)
+    db.commit()
+    period_end = db.get(PooledEscrow, first.pool_id).period_end
+
+    # donate en cours au moment où la période se termine
+    donating = SessionLocal()
+    late = _pooled_donation(donating, project_id, cancel_after, wallet, now, amount_xrp=2.0)
+    assert late.pool_id == first.pool_id
+
+    sealed = []
+    sealer = threading.Thread(
+        target=lambda: sealed.append(seal_due_pools(SessionLocal(), wallet, period_end + timedelta(seconds=1)))
+    )
+    sealer.start()
+    sealer.join(0.3)
+    assert sealer.is_alive()  # bloqué par la réservation du pool
+    donating.commit()
+    donating.close()
+    sealer.join(5)
+
+    assert sealed == [1]
+    with SessionLocal() as s:
+        pool = s.get(PooledEscrow, first.pool_id)
+        assert pool.status == PoolStatus.SEALED
+        assert pool.amount_xrp == 3.0 and pool.donation_count == 2
+        assert all(d.pool_sealed for d in s.query(Donation).filter(Donation.pool_id == pool.id))
+
+
+def test_donation_after_seal_goes_to_a_new_pool(db):
+    wallet = Wallet.create()
+    project = make_project(db)
+    now = datetime.utcnow()
+    first = _pooled_donation(db, project.id, project.deadline, wallet, now)
+    db.commit()
+    pool = db.get(PooledEscrow, first.pool_id)
+    assert seal_due_pools(db, wallet, pool.period_end + timedelta(seconds=1)) == 1
+    # un second passage ne rescelle pas
+    assert seal_due_pools(db, wallet, pool.period_end + timedelta(seconds=2)) == 0
+
+    late = _pooled_donation(db, project.id, project.deadline, wallet, now)
+    db.commit()
+    assert late.pool_id != pool.id
+    db.expire_all()
+    assert db.get(PooledEscrow, pool.id).donation_count == 1
+
+
+def test_lock_only_moves_sealed_members(db):
+    wallet = Wallet.create()
+    project = make_project(db)
+    now = datetime.utcnow()
+    member = _pooled_donation(db, project.id, project.deadline, wallet, now)
+    db.commit()
+    pool = db.get(PooledEscrow, member.pool_id)
+    seal_due_pools(db, wallet, pool.period_end + timedelta(seconds=1))
+
+    # rattachée au pool après le scellement : hors montant figé
+    outsider = Donation(
+        project_id=project.id,
+        donor_address=Wallet.create().address,
+        amount_xrp=5.0,
+        escrow_owner=wallet.address,
+        condition_hex=pool.condition_hex,
+        fulfillment_hex=pool.fulfillment_hex,
+        cancel_after=project.deadline,
+        status=DonationStatus.PENDING,
+        pool_id=pool.id,
+    )
+    db.add(outsider)
+    db.commit()
+
+    entry = db.query(EscrowOutbox).filter(EscrowOutbox.pool_id == pool.id).one()
+    OutboxWorker(wallet=wallet, owner="t")._mark_locked(db, entry, 42)
+    db.commit()
+    db.expire_all()
+
+    assert db.get(Donation, member.id).status == DonationStatus.LOCKED
+    assert db.get(Donation, outsider.id).status == DonationStatus.PENDING
+    assert db.get(PooledEscrow, pool.id).amount_xrp == 1.0
+    assert pool_proof(db, db.get(Donation, outsider.id)) is None
+    assert pool_proof(db, db.get(Donation, member.id))["donations_root"] == pool.donations_root
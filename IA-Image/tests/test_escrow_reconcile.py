@@ -0,0 +1,83 @@
+# test_escrow_reconcile.py
+from datetime import datetime
+
+from xrpl.models.requests import AccountObjects
+
+from database import SessionLocal
+from escrow_reconcile import reconcile_escrows
+from escrow_service import build_create_tx, build_finish_tx
+from factories import make_pending_donation, make_project
+from models import Donation, DonationStatus, Project
+from tx_pipeline import TxPipeline
+
+
+class _FinishAfterFirstPage:
+    """Client qui règle une donation juste après avoir servi la première page."""
+
+    def __init__(self, sim, on_first_page):
+        self.sim = sim
+        self.on_first_page = on_first_page
+
+    def request(self, request):
+        resp = self.sim.request(request)
+        if isinstance(request, AccountObjects) and self.on_first_page is not None:
+            hook, self.on_first_page = self.on_first_page, None
+            hook()
+        return resp
+
+
+def _locked_donation(db, sim, wallet) -> Donation:
+    project = make_project(db)
+    donation = make_pending_donation(db, project, wallet)
+    tx = build_create_tx(wallet, project.ong_address, donation.amount_xrp, project.deadline, donation.condition_hex)
+    res = TxPipeline(sim, wallet).run([(donation.id, tx)])[0]
+    assert res.success, res.engine_result
+    donation.escrow_sequence = sim.txs[res.tx_hash].tx_json["Sequence"]
+    donation.status = DonationStatus.LOCKED
+    project.swept_at = datetime.utcnow()
+    db.commit()
+    return donation
+
+
+def test_settled_after_snapshot_is_not_relocked(db, ledger):
+    sim, wallet = ledger
+    donation = _locked_donation(db, sim, wallet)
+    donation_id, project_id = donation.id, donation.project_id
+
+    def _finish():
+        # verdict concurrent : finish validé puis statut persisté
+        with SessionLocal() as s:
+            d = s.get(Donation, donation_id)
+            tx = build_finish_tx(wallet, d.escrow_owner, d.escrow_sequence, d.condition_hex, d.fulfillment_hex)
+            res = TxPipeline(sim, wallet).run([(d.id, tx)])[0]
+            assert res.success, res.engine_result
+            d.status = DonationStatus.RELEASED
+            d.settle_tx_hash = res.tx_hash
+            s.commit()
+
+    client = _FinishAfterFirstPage(sim, _finish)
+    divergences = []
+    counts = reconcile_escrows(db, client, wallet.address, repair=True, on_divergence=divergences.append)
+
+    assert divergences == []
+    assert counts["settled_after_snapshot"] == 1
+    db.expire_all()
+    assert db.get(Donation, donation_id).status == DonationStatus.RELEASED
+    assert db.get(Project, project_id).swept_at is not None
+
+
+def test_stale_status_is_relocked(db, ledger):
+    sim, wallet = ledger
+    donation = _locked_donation(db, sim, wallet)
+    # statut perdu : marqué REFUNDED sans tx de règlement, escrow toujours là
+    donation.status = DonationStatus.REFUNDED
+    db.commit()
+
+    divergences = []
+    counts = reconcile_escrows(db, sim, wallet.address, repair=True, on_divergence=divergences.append)
+
+    assert [d["kind"] for d in divergences] == ["status_mismatch"]
+    assert counts["repaired"] == 1
+    db.expire_all()
+    assert donation.status == DonationStatus.LOCKED
+    assert db.get(Project, donation.project_id).swept_at is None
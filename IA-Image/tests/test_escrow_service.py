@@ -0,0 +1,71 @@
+# test_escrow_service.py
+"""Helpers create / finish / cancel contre le ledger simulé (XRPL_MOCK=false)."""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from xrpl.wallet import Wallet
+
+import escrow_service
+from escrow_service import (
+    cancel_donation_escrow,
+    create_donation_escrow,
+    finish_donation_escrow,
+    generate_secret_and_condition,
+)
+from settings import settings
+from tx_cache import get_tx_cache
+
+
+@pytest.fixture
+def live(ledger, monkeypatch):
+    sim, wallet = ledger
+    monkeypatch.setattr(escrow_service, "client", sim)
+    monkeypatch.setattr(settings, "XRPL_MOCK", False)
+    return sim, wallet
+
+
+def _create(wallet, condition: str, days: float = 1) -> dict:
+    return create_donation_escrow(
+        wallet, Wallet.create().address, 2.0, datetime.utcnow() + timedelta(days=days), condition
+    )
+
+
+def test_finish_pays_fulfillment_fee(live):
+    sim, wallet = live
+    fulfillment, condition = generate_secret_and_condition()
+    created = _create(wallet, condition)
+    assert created["validated"] and created["engine_result"] == "tesSUCCESS"
+
+    sequence = created["Sequence"]
+    finished = finish_donation_escrow(wallet, wallet.address, sequence, condition, fulfillment)
+    assert finished["validated"] and finished["engine_result"] == "tesSUCCESS"
+    assert int(finished["Fee"]) == sim.base_fee * (33 + math.ceil(len(fulfillment) // 2 / 16))
+    assert not sim.escrows
+
+
+def test_cancel_pays_reference_fee(live):
+    sim, wallet = live
+    _, condition = generate_secret_and_condition()
+    created = _create(wallet, condition, days=1 / 24)
+    sim.advance_time(7200)
+    sim.close_ledger()
+
+    canceled = cancel_donation_escrow(wallet, wallet.address, created["Sequence"])
+    assert canceled["validated"] and canceled["engine_result"] == "tesSUCCESS"
+    assert int(canceled["Fee"]) == sim.base_fee
+    assert not sim.escrows
+
+
+def test_concurrent_creates_reserve_distinct_sequences(live):
+    sim, wallet = live
+    conditions = [generate_secret_and_condition()[1] for _ in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda c: _create(wallet, c), conditions))
+
+    assert all(r["engine_result"] == "tesSUCCESS" for r in results)
+    assert len({r["Sequence"] for r in results}) == 8
+    assert len(sim.escrows) == 8
+    assert get_tx_cache(sim).sequence_fetches == 1
+    assert sim.stats["account_info"] == 1
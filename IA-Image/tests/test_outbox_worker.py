@@ -0,0 +1,101 @@
+# test_outbox_worker.py
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+import outbox_worker as outbox_module
+from database import SessionLocal, engine, ensure_schema
+from factories import make_pending_donation, make_project
+from models import Donation, Project, DonationStatus, EscrowOutbox, OutboxStatus
+from outbox_worker import OutboxWorker
+from settings import settings
+
+
+@pytest.fixture
+def live(ledger, monkeypatch):
+    sim, wallet = ledger
+    monkeypatch.setattr(outbox_module, "client", sim)
+    monkeypatch.setattr(settings, "XRPL_MOCK", False)
+    return sim, wallet
+
+
+def test_claim_is_exclusive_until_lease_expires(db, ledger):
+    _, wallet = ledger
+    project = make_project(db)
+    for _ in range(3):
+        make_pending_donation(db, project, wallet)
+    db.commit()
+
+    a = OutboxWorker(wallet=wallet, owner="a", lease_s=60)
+    b = OutboxWorker(wallet=wallet, owner="b", lease_s=60)
+    now = datetime.utcnow()
+    assert len(a._claim(SessionLocal(), now)) == 3
+    assert b._claim(SessionLocal(), now) == []
+    # worker "a" mort sans rendre son bail
+    assert len(b._claim(SessionLocal(), now + timedelta(seconds=61))) == 3
+
+
+def test_concurrent_workers_create_one_escrow_per_donation(db, live):
+    sim, wallet = live
+    project = make_project(db)
+    ids = [make_pending_donation(db, project, wallet).id for _ in range(12)]
+    db.commit()
+
+    workers = [OutboxWorker(wallet=wallet, owner=f"w{i}", batch_size=5) for i in range(3)]
+
+    def _drain(worker):
+        for _ in range(200):
+            worker.run_once()
+            with SessionLocal() as s:
+                if not s.query(EscrowOutbox).filter(EscrowOutbox.status != OutboxStatus.DONE).count():
+                    return
+
+    threads = [threading.Thread(target=_drain, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    donations = db.query(Donation).filter(Donation.id.in_(ids)).all()
+    assert {d.status for d in donations} == {DonationStatus.LOCKED}
+    assert len({d.escrow_sequence for d in donations}) == len(ids)
+    assert len(sim.escrows) == len(ids)
+    assert not db.query(EscrowOutbox).filter(EscrowOutbox.lease_owner.isnot(None)).count()
+
+
+def test_ensure_schema_makes_escrow_sequence_nullable(db, ledger):
+    _, wallet = ledger
+    project_id = make_project(db).id
+    db.commit()
+    db.close()
+
+    # schéma d'avant l'outbox : donations.escrow_sequence NOT NULL
+    ddl = str(CreateTable(Donation.__table__).compile(engine))
+    assert "escrow_sequence INTEGER," in ddl
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE donations"))
+        conn.execute(text(ddl.replace("escrow_sequence INTEGER,", "escrow_sequence INTEGER NOT NULL,")))
+        conn.execute(
+            text(
+                "INSERT INTO donations (project_id, donor_address, amount_xrp, escrow_owner, "
+                "escrow_sequence, condition_hex, fulfillment_hex, cancel_after, status) "
+                "VALUES (:p, 'rDonor', 3.0, 'rOwner', 42, 'C', 'F', :t, 'LOCKED')"
+            ),
+            {"p": project_id, "t": datetime.utcnow()},
+        )
+
+    ensure_schema()
+
+    columns = {c["name"]: c for c in inspect(engine).get_columns("donations")}
+    assert columns["escrow_sequence"]["nullable"]
+    indexes = {i["name"] for i in inspect(engine).get_indexes("donations")}
+    assert "ix_donations_escrow" in indexes
+    with SessionLocal() as s:
+        old = s.query(Donation).one()
+        assert (old.escrow_sequence, old.amount_xrp) == (42, 3.0)
+        make_pending_donation(s, s.get(Project, project_id), wallet)
+        s.commit()
+        assert s.query(Donation).count() == 2
@@ -0,0 +1,110 @@
+# test_query_counts.py
+"""Nombre de requêtes SQL par route, indépendant du volume (db_metrics)."""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from xrpl.wallet import Wallet
+
+import db_metrics
+import trust_optimizer
+from factories import add_evidences, make_locked_donation, make_locked_pool, make_project, make_validator
+from main import app
+from models import Donation, DonationStatus
+from settings import settings
+
+
+@pytest.fixture
+def client():
+    db_metrics.reset()
+    return TestClient(app)
+
+
+def _verdict_queries(client, project_id: int) -> int:
+    resp = client.post(f"/projects/{project_id}/verdict")
+    assert resp.status_code == 200, resp.text
+    return int(resp.headers["X-DB-Queries"])
+
+
+@pytest.mark.parametrize(
+    "per_validator, cv_score",
+    [(1, 0.9), (3, 0.9), (2, None)],  # None : evidences à scorer par l'IA vision
+)
+def test_verdict_query_count_is_constant(db, client, monkeypatch, per_validator, cv_score):
+    monkeypatch.setattr(trust_optimizer, "analyze_image", lambda url: 0.8)
+    wallet = Wallet.create()
+    # échéance passée : finish comme cancel sont soumis, le règlement tourne
+    expired = datetime.utcnow() - timedelta(days=1)
+    small = make_project(db, deadline=expired)
+    add_evidences(db, small, make_validator(db), n=per_validator, cv_score=cv_score)
+    make_locked_donation(db, small, wallet, sequence=1)
+    make_locked_pool(db, small, wallet, sequence=2, members=1)
+
+    large = make_project(db, deadline=expired)
+    for _ in range(8):
+        add_evidences(db, large, make_validator(db, success_rate=0.9), n=5 * per_validator, cv_score=cv_score)
+    for seq in range(10, 22):
+        make_locked_donation(db, large, wallet, sequence=seq)
+    make_locked_pool(db, large, wallet, sequence=30, members=6)
+    db.commit()
+
+    queries = _verdict_queries(client, small.id)
+    assert queries == _verdict_queries(client, large.id)
+    assert queries <= db_metrics.ROUTE_QUERY_BUDGETS["POST /projects/{project_id}/verdict"]
+
+    db.expire_all()
+    settled = db.query(Donation.status).filter(Donation.project_id.in_([small.id, large.id])).all()
+    assert len(settled) == 2 + 18
+    assert {s for (s,) in settled} <= {DonationStatus.RELEASED, DonationStatus.REFUNDED}
+
+
+def _evidence(project_id=None) -> dict:
+    item = {
+        "validator_address": Wallet.create().address,
+        "image_url": "https://img.test/site.jpg",
+        "latitude": 14.7,
+        "longitude": -17.4,
+        "timestamp": datetime.utcnow().isoformat(),
+        "wallet_signature": "00",
+    }
+    if project_id is not None:
+        item["project_id"] = project_id
+    return item
+
+
+def _queries(resp) -> int:
+    assert resp.status_code == 200, resp.text
+    return int(resp.headers["X-DB-Queries"])
+
+
+@pytest.mark.parametrize("pooling", [False, True])
+def test_donate_counts_its_group_commit_writes(db, client, monkeypatch, pooling):
+    monkeypatch.setattr(settings, "WRITE_QUEUE_ENABLED", True)
+    monkeypatch.setattr(settings, "DONATION_POOLING_ENABLED", pooling)
+    project_id = make_project(db).id
+    db.commit()
+    db_metrics.reset()
+
+    payload = {"donor_address": Wallet.create().address, "amount_xrp": 1.0}
+    queries = _queries(client.post(f"/projects/{project_id}/donate", json=payload))
+    # SELECT du projet + écritures exécutées par le thread de la file
+    assert 1 < queries <= db_metrics.ROUTE_QUERY_BUDGETS["POST /projects/{project_id}/donate"]
+    assert db_metrics.snapshot()["background"]["queries"] == 0
+
+
+def test_evidence_counts_are_constant_with_group_commit(db, client, monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_QUEUE_ENABLED", True)
+    project_id = make_project(db).id
+    db.commit()
+    db_metrics.reset()
+
+    single = _queries(client.post(f"/projects/{project_id}/evidence", json=_evidence()))
+    assert 1 < single <= db_metrics.ROUTE_QUERY_BUDGETS["POST /projects/{project_id}/evidence"]
+
+    one = client.post("/evidence/bulk", json=[_evidence(project_id)])
+    many = client.post("/evidence/bulk", json=[_evidence(project_id) for _ in range(20)])
+    assert _queries(one) == _queries(many) <= db_metrics.ROUTE_QUERY_BUDGETS["POST /evidence/bulk"]
+    # chaque item reçoit l'id de sa propre ligne
+    ids = [r["evidence_id"] for r in many.json()]
+    assert len(set(ids)) == 20
+    assert db_metrics.snapshot()["background"]["queries"] == 0
@@ -0,0 +1,123 @@
+# test_signature_verifier.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from xrpl.wallet import Wallet
+
+from database import SessionLocal
+from evidence_service import insert_evidences
+from evidence_signature import sign_evidence
+from factories import make_project
+from models import Evidence, EvidenceCreate, ProjectEvidenceStats, Validator
+from settings import settings
+from signature_verifier import SignatureVerifier
+
+
+def _submit(db, project, wallet, timestamp=None, public_key="present", signature=None) -> int:
+    """Comme POST /projects/{id}/evidence : evidence signée par `wallet`."""
+    timestamp = timestamp or datetime.now(timezone.utc)
+    image_url = f"https://img.test/{project.id}-{timestamp.timestamp()}.jpg"
+    payload = EvidenceCreate(
+        validator_address=wallet.address,
+        image_url=image_url,
+        latitude=project.latitude,
+        longitude=project.longitude,
+        timestamp=timestamp,
+        wallet_signature=signature
+        or sign_evidence(wallet, project.id, image_url, project.latitude, project.longitude, timestamp),
+        public_key=wallet.public_key if public_key == "present" else public_key,
+    )
+    (eid,) = insert_evidences(db, [(project.id, payload)])
+    db.commit()
+    return eid
+
+
+def _verifier() -> SignatureVerifier:
+    return SignatureVerifier(processes=1)
+
+
+def _valid(db, eid: int):
+    db.expire_all()
+    return db.get(Evidence, eid).signature_valid
+
+
+def test_signature_with_utc_offset_is_valid(db):
+    wallet = Wallet.create()
+    project = make_project(db)
+    paris = timezone(timedelta(hours=2))
+    offset = _submit(db, project, wallet, timestamp=datetime(2026, 6, 1, 12, 0, tzinfo=paris))
+    utc = _submit(db, project, wallet, timestamp=datetime(2026, 6, 1, 10, 5, tzinfo=timezone.utc))
+
+    assert _verifier().run_once() == 2
+    assert _valid(db, offset) is True and _valid(db, utc) is True
+    # heure stockée en UTC naïf, celle du message signé
+    assert db.get(Evidence, offset).timestamp == datetime(2026, 6, 1, 10, 0)
+
+
+def test_bad_signature_and_foreign_key_are_invalid(db):
+    wallet, other = Wallet.create(), Wallet.create()
+    project = make_project(db)
+    forged = _submit(db, project, wallet, signature="00" * 64)
+    # clé d'un autre compte : ne redonne pas validator_address
+    foreign = _submit(db, project, wallet, public_key=other.public_key)
+    no_key = _submit(db, project, Wallet.create(), public_key=None)
+
+    assert _verifier().run_once() == 3
+    assert [_valid(db, e) for e in (forged, foreign, no_key)] == [False, False, False]
+
+
+def test_key_is_retained_for_later_evidences(db):
+    wallet = Wallet.create()
+    project = make_project(db)
+    first = _submit(db, project, wallet)
+    verifier = _verifier()
+    verifier.run_once()
+    assert _valid(db, first) is True
+    assert verifier._keys[wallet.address] == wallet.public_key
+    assert db.query(Validator).filter_by(xrpl_address=wallet.address).one().public_key == wallet.public_key
+
+    # sans clé présentée : cache mémoire, puis colonne validators.public_key
+    second = _submit(db, project, wallet, public_key=None)
+    verifier.run_once()
+    third = _submit(db, project, wallet, public_key=None)
+    _verifier().run_once()
+    assert _valid(db, second) is True and _valid(db, third) is True
+
+
+def test_batch_already_checked_by_another_replica_is_dropped(db):
+    wallet = Wallet.create()
+    project = make_project(db)
+    eid = _submit(db, project, wallet)
+
+    first, second = _verifier(), _verifier()
+    claimed = second._claim(SessionLocal())
+    assert [r.id for r in claimed] == [eid]
+    assert first.run_once() == 1
+
+    # le second réplica avait lu le même lot : son UPDATE conditionnel ne
+    # touche plus rien, il annule (pas de double comptage)
+    real_claim = second._claim
+    second._claim = lambda db: claimed
+    try:
+        assert second.run_once() == 0
+    finally:
+        second._claim = real_claim
+    assert _valid(db, eid) is True
+
+
+def test_required_signatures_count_only_valid_evidences(db, monkeypatch):
+    monkeypatch.setattr(settings, "EVIDENCE_SIGNATURE_REQUIRED", True)
+    wallet = Wallet.create()
+    project = make_project(db)
+    _submit(db, project, wallet)
+    _submit(db, project, wallet, signature="00" * 64)
+
+    stats = db.get(ProjectEvidenceStats, project.id)
+    assert stats is None or stats.evidence_count == 0
+    _verifier().run_once()
+
+    db.expire_all()
+    stats = db.get(ProjectEvidenceStats, project.id)
+    assert stats.evidence_count == 1
+    assert stats.distinct_validators == 1
+    assert stats.gps_score_sum == pytest.approx(1.0)
@@ -0,0 +1,25 @@
+# test_trust_optimizer.py
+from factories import add_evidences, make_project, make_validator
+from models import ProjectEvidenceStats, ProjectStatus, Validator
+from trust_optimizer import decide_project_verdicts
+
+
+def test_decided_project_keeps_reputation_used_by_its_verdict(db):
+    validator = make_validator(db, success_rate=1.0)
+    decided = make_project(db)
+    still_open = make_project(db)
+    add_evidences(db, decided, validator, n=1)  # < VERDICT_MIN_EVIDENCES -> FAILURE
+    add_evidences(db, still_open, validator, n=1)
+    db.commit()
+
+    verdict = decide_project_verdicts(db, [decided])[decided.id]
+    assert verdict["decision"] == "FAILURE"
+    assert verdict["rep_score"] == 1.0
+
+    db.expire_all()
+    rate = db.get(Validator, validator.id).success_rate
+    assert rate < 1.0
+    assert db.get(ProjectEvidenceStats, decided.id).reputation_sum == 1.0
+    # les projets encore ouverts suivent la nouvelle réputation
+    assert db.get(ProjectEvidenceStats, still_open.id).reputation_sum == rate
+    assert db.get(type(decided), decided.id).status == ProjectStatus.FAILED
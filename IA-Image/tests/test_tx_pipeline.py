@@ -0,0 +1,41 @@
+# test_tx_pipeline.py
+import math
+from datetime import datetime, timedelta
+
+from xrpl.wallet import Wallet
+
+from escrow_service import build_cancel_tx, build_create_tx, build_finish_tx, generate_secret_and_condition
+from tx_pipeline import TxPipeline, transaction_fee
+
+
+def _finish_fee(reference: int, fulfillment_hex: str) -> int:
+    return reference * (33 + math.ceil(len(fulfillment_hex) // 2 / 16))
+
+
+def test_transaction_fee_per_type():
+    wallet = Wallet.create()
+    fulfillment, condition = generate_secret_and_condition()
+    finish = build_finish_tx(wallet, wallet.address, 7, condition, fulfillment)
+    cancel = build_cancel_tx(wallet, wallet.address, 7)
+    create = build_create_tx(wallet, Wallet.create().address, 1.0, datetime.utcnow() + timedelta(days=1), condition)
+
+    assert transaction_fee(finish, "12") == str(_finish_fee(12, fulfillment))
+    assert transaction_fee(cancel, "12") == "12"
+    assert transaction_fee(create, "12") == "12"
+
+
+def test_pipeline_finish_carries_fulfillment_fee(ledger):
+    sim, wallet = ledger
+    fulfillment, condition = generate_secret_and_condition()
+    create = build_create_tx(wallet, Wallet.create().address, 5.0, datetime.utcnow() + timedelta(days=1), condition)
+
+    pipeline = TxPipeline(sim, wallet)
+    created = pipeline.run([("create", create)])[0]
+    assert created.success, created.engine_result
+    sequence = sim.txs[created.tx_hash].tx_json["Sequence"]
+
+    finish = build_finish_tx(wallet, wallet.address, sequence, condition, fulfillment)
+    finished = pipeline.run([("finish", finish)])[0]
+    assert finished.success, finished.engine_result
+    assert int(sim.txs[finished.tx_hash].tx_json["Fee"]) == _finish_fee(sim.base_fee, fulfillment)
+    assert not sim.escrows
@@ -0,0 +1,115 @@
+# test_validator_assignment.py
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import validator_assignment
+from factories import make_project, make_validator
+from validator_assignment import assign_validators, auction_assign
+from validator_service import ValidatorGridIndex
+
+EPS = 1e-4
+
+
+def _candidates(rows):
+    """rows : {indice validateur: score} par projet -> format candidate_matrix."""
+    out = []
+    for row in rows:
+        pairs = sorted(row.items(), key=lambda kv: -kv[1])
+        out.append(
+            (np.array([j for j, _ in pairs], dtype=np.int64), np.array([s for _, s in pairs], dtype=float))
+        )
+    return out
+
+
+def _total(rows, chosen):
+    return sum(rows[p][j] for p, picks in enumerate(chosen) for j in picks)
+
+
+def _check_constraints(rows, chosen, k, capacity):
+    load = {}
+    for p, picks in enumerate(chosen):
+        assert len(picks) <= k and len(set(picks)) == len(picks)
+        assert all(j in rows[p] for j in picks)
+        for j in picks:
+            load[j] = load.get(j, 0) + 1
+    assert all(n <= capacity for n in load.values())
+
+
+def _brute_force(rows, k, capacity):
+    options = [
+        [c for r in range(min(k, len(row)) + 1) for c in itertools.combinations(sorted(row), r)]
+        for row in rows
+    ]
+    best = 0.0
+    for combo in itertools.product(*options):
+        load = {}
+        for picks in combo:
+            for j in picks:
+                load[j] = load.get(j, 0) + 1
+        if all(n <= capacity for n in load.values()):
+            best = max(best, _total(rows, combo))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_auction_is_optimal_on_small_instances(seed):
+    rng = random.Random(seed)
+    n_validators, k, capacity = 4, 2, 2
+    # candidats partiels (rayon), scores de select_validators_for_project
+    rows = [
+        {j: round(rng.uniform(0.3, 1.0), 3) for j in rng.sample(range(n_validators), rng.randint(0, n_validators))}
+        for _ in range(4)
+    ]
+    chosen = auction_assign(_candidates(rows), n_validators, k, capacity, eps=EPS)
+
+    _check_constraints(rows, chosen, k, capacity)
+    # enchères à eps près : au plus k * eps par projet sous l'optimum
+    assert _total(rows, chosen) >= _brute_force(rows, k, capacity) - len(rows) * k * EPS
+
+
+def test_capacity_is_shared_by_all_projects():
+    # un validateur excellent et proche de tous : pris par `capacity` projets seulement
+    rows = [{0: 1.0, 1: 0.7, 2: 0.6, 3: 0.5} for _ in range(6)]
+    chosen = auction_assign(_candidates(rows), 4, k=2, capacity=3, eps=EPS)
+
+    _check_constraints(rows, chosen, 2, 3)
+    assert sum(0 in picks for picks in chosen) == 3
+    # 4 validateurs x 3 places = 12 = 6 projets x 2 : tout est pourvu
+    assert all(len(picks) == 2 for picks in chosen)
+
+
+def test_infeasible_projects_keep_empty_slots():
+    rows = [
+        {},  # aucun validateur dans le rayon
+        {0: 0.9},  # moins de candidats que k
+        {0: 0.8, 1: 0.6},
+        {0: 0.7, 1: 0.5},
+    ]
+    chosen = auction_assign(_candidates(rows), 2, k=2, capacity=1, eps=EPS)
+
+    _check_constraints(rows, chosen, 2, 1)
+    assert chosen[0] == []
+    # 2 places au total pour 5 demandées : pas plus de 2 affectations
+    assert sum(len(picks) for picks in chosen) == 2
+    assert _total(rows, chosen) == pytest.approx(_brute_force(rows, 2, 1), abs=4 * EPS)
+
+
+def test_assign_validators_from_open_projects(db, monkeypatch):
+    monkeypatch.setattr(validator_assignment, "validator_index", ValidatorGridIndex(refresh_s=0))
+    dakar = make_project(db, latitude=14.7, longitude=-17.4)
+    thies = make_project(db, latitude=14.79, longitude=-16.93)
+    remote = make_project(db, latitude=-30.0, longitude=140.0)
+    validators = [
+        make_validator(db, success_rate=rate, latitude=14.7 + 0.05 * i, longitude=-17.2)
+        for i, rate in enumerate([1.0, 0.9, 0.8])
+    ]
+    db.commit()
+
+    assignments = assign_validators(db, k=2, capacity=1, max_radius_km=100.0, top_m=8)
+    assert set(assignments) == {dakar.id, thies.id, remote.id}
+    assert assignments[remote.id] == []
+    picked = assignments[dakar.id] + assignments[thies.id]
+    assert len(picked) == 3 and set(picked) == {v.id for v in validators}
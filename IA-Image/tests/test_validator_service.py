@@ -0,0 +1,93 @@
+# test_validator_service.py
+import random
+
+import pytest
+
+import validator_service
+from factories import make_validator
+from geo import haversine_km
+from models import Validator
+from validator_service import ValidatorGridIndex, select_validators_for_project
+
+# (latitude, longitude) : Dakar, Paris, antiméridien, proche du pôle
+QUERIES = [(14.7, -17.4), (48.85, 2.35), (0.0, 179.95), (88.5, 40.0)]
+
+
+def _brute_force(db, lat, lon, radius_km, k):
+    """Sélection de référence : scan complet de la table."""
+    scored = []
+    for v in db.query(Validator).filter(Validator.slashed.is_(False)):
+        if v.latitude is None or v.longitude is None:
+            continue
+        d = haversine_km(lat, lon, v.latitude, v.longitude)
+        if d > radius_km:
+            continue
+        scored.append((0.6 * (v.success_rate or 0.5) + 0.4 * max(0.0, 1.0 - d / radius_km), v.id))
+    scored.sort(key=lambda s: (-s[0], s[1]))
+    return scored[:k]
+
+
+def _populate(db, n_per_site=40, seed=7):
+    rng = random.Random(seed)
+    for lat, lon in QUERIES:
+        for _ in range(n_per_site):
+            v_lon = lon + rng.uniform(-1.5, 1.5)
+            make_validator(
+                db,
+                success_rate=rng.choice([None, 0.0, rng.random(), rng.random()]),
+                latitude=min(89.9, lat + rng.uniform(-1.0, 1.0)),
+                longitude=(v_lon + 180.0) % 360.0 - 180.0,
+                slashed=rng.random() < 0.1,
+            )
+    make_validator(db)  # sans position : jamais sélectionné
+    db.commit()
+
+
+def _assert_matches(db, index):
+    for lat, lon in QUERIES:
+        for radius_km, k in [(20.0, 3), (80.0, 5), (250.0, 12)]:
+            expected = _brute_force(db, lat, lon, radius_km, k)
+            got = index.top_k(lat, lon, radius_km, k)
+            assert [vid for _, vid in got] == [vid for _, vid in expected], (lat, lon, radius_km)
+            assert [s for s, _ in got] == pytest.approx([s for s, _ in expected])
+
+
+def test_grid_index_matches_full_scan(db):
+    _populate(db)
+    index = ValidatorGridIndex(cell_deg=0.25, refresh_s=0, reload_s=3600)
+    index.sync(db)
+    _assert_matches(db, index)
+
+
+def test_grid_index_follows_updated_validators(db):
+    _populate(db)
+    index = ValidatorGridIndex(cell_deg=0.25, refresh_s=0, reload_s=3600)
+    index.sync(db)
+
+    validators = db.query(Validator).filter(Validator.latitude.isnot(None)).order_by(Validator.id).all()
+    moved, slashed, promoted = validators[0], validators[1], validators[2]
+    # déplacé de Dakar à Paris, slashé, réputation modifiée : relus par updated_at
+    moved.latitude, moved.longitude, moved.slashed = 48.86, 2.34, False
+    slashed.slashed = True
+    promoted.success_rate, promoted.slashed = 1.0, False
+    db.commit()
+
+    index.sync(db)
+    assert index._cell_of[moved.id] == index.cell_key(48.86, 2.34)
+    assert slashed.id not in index._cell_of
+    _assert_matches(db, index)
+
+
+def test_select_prefers_reputation_within_radius(db, monkeypatch):
+    monkeypatch.setattr(validator_service, "validator_index", ValidatorGridIndex(refresh_s=0))
+    lat, lon = 14.7, -17.4
+    near_weak = make_validator(db, success_rate=0.2, latitude=lat, longitude=lon)
+    far_strong = make_validator(db, success_rate=1.0, latitude=lat + 0.3, longitude=lon)  # ~33 km
+    outside = make_validator(db, success_rate=1.0, latitude=lat + 1.0, longitude=lon)  # ~111 km
+    make_validator(db, success_rate=1.0, latitude=lat, longitude=lon, slashed=True)
+    db.commit()
+
+    chosen = select_validators_for_project(db, lat, lon, max_radius_km=50.0, k=3)
+    assert [v.id for v in chosen] == [far_strong.id, near_weak.id]
+    assert outside.id not in {v.id for v in chosen}
+    assert [v.id for v in select_validators_for_project(db, lat, lon, max_radius_km=50.0, k=1)] == [far_strong.id]
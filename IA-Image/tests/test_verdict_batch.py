@@ -0,0 +1,107 @@
+# test_verdict_batch.py
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from xrpl.wallet import Wallet
+
+import evidence_aggregates
+import trust_optimizer
+import verdict_batch
+from factories import add_evidences, make_pending_donation, make_project, make_validator
+from models import Donation, DonationStatus, Project, ProjectStatus
+from settings import settings
+from verdict_batch import run_verdict_batch
+from vision_guard import GuardedScorer
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    """Pool IA vision dédié : 4 threads, 0,3 s par image."""
+    guard = GuardedScorer(workers=4, item_timeout_s=0.3)
+    monkeypatch.setattr(evidence_aggregates, "vision_guard", guard)
+    monkeypatch.setattr(settings, "VISION_WORKERS", 4)
+    monkeypatch.setattr(settings, "VISION_ITEM_TIMEOUT_S", 0.3)
+    yield guard
+    guard.stop()
+
+
+def _events(project_ids, kind=None, **kwargs):
+    events = list(run_verdict_batch(project_ids, Wallet.create(), **kwargs))
+    return [e for e in events if kind is None or e["event"] == kind]
+
+
+def test_chunk_deadline_covers_all_pending_images(db, scorer, monkeypatch):
+    # 8 images à 0,2 s sur 4 threads : ~0,4 s, plus qu'un budget de verdict
+    monkeypatch.setattr(settings, "VERDICT_DEADLINE_S", 0.25)
+    monkeypatch.setattr(trust_optimizer, "analyze_image", lambda url: time.sleep(0.2) or 0.9)
+    validator = make_validator(db)
+    projects = [make_project(db) for _ in range(2)]
+    for p in projects:
+        add_evidences(db, p, validator, n=4, cv_score=None)
+    db.commit()
+
+    verdicts = _events([p.id for p in projects], "verdict", settle=False)
+    assert len(verdicts) == 2
+    assert all(e["verdict"]["degraded"] == [] for e in verdicts)
+
+
+def test_degraded_verdicts_are_deferred(db, scorer, monkeypatch):
+    monkeypatch.setattr(settings, "VERDICT_DEADLINE_S", 0.0)
+    monkeypatch.setattr(trust_optimizer, "analyze_image", lambda url: time.sleep(0.5) or 0.9)
+    validator = make_validator(db)
+    slow = make_project(db)
+    scored = make_project(db)
+    add_evidences(db, slow, validator, n=2, cv_score=None)
+    add_evidences(db, scored, validator, n=2, cv_score=0.9)
+    db.commit()
+
+    events = _events([slow.id, scored.id], settle=False)
+    assert [e["project_ids"] for e in events if e["event"] == "deferred"] == [[slow.id]]
+    assert [e["project_id"] for e in events if e["event"] == "verdict"] == [scored.id]
+    assert events[-1]["deferred"] == 1
+
+    db.expire_all()
+    assert db.get(Project, slow.id).status == ProjectStatus.OPEN
+    assert db.get(Project, scored.id).status != ProjectStatus.OPEN
+
+
+def test_leased_projects_are_skipped_and_leases_released(db):
+    free = make_project(db)
+    swept = make_project(db, lease_owner="sweeper", lease_until=datetime.utcnow() + timedelta(minutes=5))
+    db.commit()
+
+    events = _events([free.id, swept.id], settle=False)
+    assert [e["project_ids"] for e in events if e["event"] == "skipped"] == [[swept.id]]
+    assert [e["project_id"] for e in events if e["event"] == "verdict"] == [free.id]
+    assert events[-1]["skipped"] == 1
+
+    db.expire_all()
+    assert db.get(Project, free.id).lease_owner is None
+    assert db.get(Project, swept.id).lease_owner == "sweeper"
+    assert db.get(Project, swept.id).status == ProjectStatus.OPEN
+
+
+def test_settlement_failure_keeps_committed_verdicts(db, monkeypatch):
+    wallet = Wallet.create()
+    project = make_project(db, deadline=datetime.utcnow() - timedelta(days=1))
+    donation = make_pending_donation(db, project, wallet)
+    donation.status = DonationStatus.LOCKED
+    donation.escrow_sequence = 7
+    db.commit()
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("node unreachable")
+
+    monkeypatch.setattr(verdict_batch, "settle_jobs", _fail)
+    events = _events([project.id])
+    kinds = [e["event"] for e in events]
+    assert "error" not in kinds
+    assert [e["project_ids"] for e in events if e["event"] == "settle_error"] == [[project.id]]
+    assert events[-1]["errors"] == 0 and events[-1]["failure"] == 1
+
+    db.expire_all()
+    assert db.get(Project, project.id).status == ProjectStatus.FAILED
+    assert db.get(Project, project.id).lease_owner is None
+    # réglée plus tard par deadline_sweeper
+    assert db.get(Donation, donation.id).status == DonationStatus.LOCKED
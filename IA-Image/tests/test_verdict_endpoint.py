@@ -0,0 +1,40 @@
+# test_verdict_endpoint.py
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from factories import make_project
+from main import app
+from models import Project, ProjectStatus
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_verdict_refused_while_sweeper_holds_the_lease(db, client):
+    project = make_project(db, lease_owner="sweeper", lease_until=datetime.utcnow() + timedelta(minutes=5))
+    db.commit()
+
+    resp = client.post(f"/projects/{project.id}/verdict")
+    assert resp.status_code == 409
+    db.expire_all()
+    assert db.get(Project, project.id).status == ProjectStatus.OPEN
+    assert db.get(Project, project.id).lease_owner == "sweeper"
+
+
+def test_verdict_takes_an_expired_lease_and_releases_it(db, client):
+    project = make_project(db, lease_owner="sweeper", lease_until=datetime.utcnow() - timedelta(seconds=1))
+    db.commit()
+
+    assert client.post(f"/projects/{project.id}/verdict").status_code == 200
+    db.expire_all()
+    assert db.get(Project, project.id).status == ProjectStatus.FAILED
+    assert db.get(Project, project.id).lease_owner is None
+    assert db.get(Project, project.id).lease_until is None
+
+
+def test_verdict_unknown_project(db, client):
+    assert client.post("/projects/999999/verdict").status_code == 404
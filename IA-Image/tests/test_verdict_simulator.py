@@ -0,0 +1,42 @@
+# test_verdict_simulator.py
+import itertools
+
+import numpy as np
+from xrpl.wallet import Wallet
+
+from factories import add_evidences, make_pending_donation, make_project, make_validator
+from trust_optimizer import decide_project_verdicts
+from verdict_simulator import current_config, decide, load_inputs, simulate
+
+
+def test_simulator_reproduces_current_verdicts(db):
+    wallet = Wallet.create()
+    # réputations et scores CV loin du seuil : pas d'égalité flottante
+    validators = {rate: make_validator(db, success_rate=rate) for rate in (0.25, 0.65, 0.95)}
+    projects, volumes = [], {}
+    for i, (rate, cv, n) in enumerate(itertools.product(validators, (0.15, 0.55, 0.85), (0, 1, 2, 3))):
+        project = make_project(db)
+        if n:
+            add_evidences(db, project, validators[rate], n=n, cv_score=cv)
+        if i % 3:
+            make_pending_donation(db, project, wallet, amount_xrp=float(i))
+            volumes[project.id] = float(i)
+        projects.append(project)
+    db.commit()
+
+    # lu avant le verdict : il modifie la réputation des validateurs
+    inputs = load_inputs(db)
+    simulated = decide(inputs, current_config(), ong_score=0.7)[:, 0]
+    results = simulate(inputs, current_config())
+
+    verdicts = decide_project_verdicts(db, projects)
+    expected = np.array([verdicts[pid]["decision"] == "SUCCESS" for pid in inputs.project_ids])
+
+    assert list(inputs.project_ids) == [p.id for p in projects]
+    assert 0 < expected.sum() < len(projects)
+    assert (simulated == expected).all()
+    assert results["successes"][0] == expected.sum()
+    assert results["flips_to_success"][0] == results["flips_to_failure"][0] == 0
+    released = sum(volumes.get(int(pid), 0.0) for pid, ok in zip(inputs.project_ids, expected) if ok)
+    assert results["released_xrp"][0] == released
+    assert results["refunded_xrp"][0] == sum(volumes.values()) - released
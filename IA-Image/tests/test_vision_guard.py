@@ -0,0 +1,56 @@
+# test_vision_guard.py
+import threading
+import time
+
+from vision_guard import CircuitBreaker, GuardedScorer
+
+
+def _urls(prefix: str, n: int):
+    return [f"{prefix}-{i}.jpg" for i in range(n)]
+
+
+def test_saturated_pool_opens_breaker():
+    release = threading.Event()
+    hang = lambda url: release.wait() and 0.9  # noqa: E731
+    guard = GuardedScorer(
+        workers=2,
+        item_timeout_s=0.1,
+        breaker=CircuitBreaker(failure_threshold=100, reset_s=0.05),
+    )
+    try:
+        first = guard.score_many(_urls("a", 4), hang, deadline=time.monotonic() + 1.0)
+        assert first.timed_out == 2 and first.scored == 0
+        assert guard.saturated and guard.breaker.is_open
+
+        # plus de thread libre : le lot suivant n'attend pas son échéance
+        t0 = time.monotonic()
+        second = guard.score_many(_urls("b", 4), hang, deadline=time.monotonic() + 1.0)
+        assert time.monotonic() - t0 < 0.1
+        assert second.skipped == 4
+
+        # les appels figés finissent : appel d'essai puis circuit refermé
+        release.set()
+        time.sleep(0.1)
+        assert not guard.saturated
+        third = guard.score_many(["c-0.jpg"], lambda url: 0.7)
+        assert third.scores == {0: 0.7}
+        assert not guard.breaker.is_open
+    finally:
+        release.set()
+        guard.stop()
+
+
+def test_long_queue_on_healthy_pool_keeps_breaker_closed():
+    guard = GuardedScorer(workers=2, item_timeout_s=0.1, breaker=CircuitBreaker(failure_threshold=1))
+
+    def slow(url):
+        time.sleep(0.03)
+        return 0.8
+
+    try:
+        # les dernières images attendent en file bien plus que item_timeout_s
+        batch = guard.score_many(_urls("q", 20), slow, deadline=time.monotonic() + 5.0)
+        assert batch.scored == 20 and not batch.degraded
+        assert not guard.breaker.is_open
+    finally:
+        guard.stop()
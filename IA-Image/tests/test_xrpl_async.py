@@ -0,0 +1,183 @@
+# test_xrpl_async.py
+"""XRPLConnectionPool contre un faux rippled websocket (websockets.serve)."""
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+
+import pytest
+from websockets.asyncio.server import serve
+
+from xrpl_async import XRPLConnectionPool
+
+
+class StubRippled:
+    """Répond à subscribe / tx / ledger et pousse ledgerClosed / transaction."""
+
+    def __init__(self):
+        self.ledger_index = 100
+        self.validated = {}  # tx_hash -> TransactionResult
+        self.subscribes = []
+        self.subscribers = set()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = self._call(self._serve())
+        self.url = f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def _serve(self):
+        return await serve(self._handler, "127.0.0.1", 0)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    async def _handler(self, ws):
+        try:
+            async for raw in ws:
+                req = json.loads(raw)
+                command = req["command"]
+                if command == "subscribe":
+                    self.subscribes.append(req)
+                    self.subscribers.add(ws)
+                    result = {"ledger_index": self.ledger_index, "fee_base": 10}
+                elif command == "tx" and req["transaction"] in self.validated:
+                    outcome = self.validated[req["transaction"]]
+                    result = {"hash": req["transaction"], "validated": True, "meta": {"TransactionResult": outcome}}
+                elif command == "tx":
+                    result = {"validated": False}
+                else:  # ledger
+                    result = {"ledger_index": self.ledger_index, "validated": True}
+                await ws.send(json.dumps({"id": req["id"], "status": "success", "type": "response", "result": result}))
+        finally:
+            self.subscribers.discard(ws)
+
+    async def _broadcast(self, messages):
+        for ws in list(self.subscribers):
+            for msg in messages:
+                await ws.send(json.dumps(msg))
+
+    def close_ledger(self, txs=None, push: bool = True) -> None:
+        """Ferme un ledger contenant `txs` {hash: résultat} ; push=False : flux muet."""
+        self.ledger_index += 1
+        self.validated.update(txs or {})
+        if push:
+            messages = [{"type": "ledgerClosed", "ledger_index": self.ledger_index, "fee_base": 10}]
+            messages += [
+                {"type": "transaction", "validated": True, "hash": h, "meta": {"TransactionResult": r}}
+                for h, r in (txs or {}).items()
+            ]
+            self._call(self._broadcast(messages))
+
+    def drop_stream(self) -> None:
+        async def _drop():
+            for ws in list(self.subscribers):
+                await ws.close()
+
+        self._call(_drop())
+
+    def stop(self) -> None:
+        self.server.close()
+        self._call(self.server.wait_closed())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def stub():
+    server = StubRippled()
+    yield server
+    server.stop()
+
+
+def _pool(stub, **kwargs) -> XRPLConnectionPool:
+    opts = {"size": 1, "accounts": ["rPlatform"], "reconnect_delay": 0.05}
+    pool = XRPLConnectionPool(stub.url, **{**opts, **kwargs})
+    pool.start()
+    return pool
+
+
+def _wait_in_thread(pool, tx_hash: str, last_ledger: int) -> concurrent.futures.Future:
+    executor = concurrent.futures.ThreadPoolExecutor(1)
+    fut = executor.submit(pool.wait_validated, tx_hash, last_ledger)
+    executor.shutdown(wait=False)
+    for _ in range(100):
+        if tx_hash in pool._tx_waiters:
+            break
+        time.sleep(0.01)
+    return fut
+
+
+def _until(predicate, timeout: float = 5.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_subscribe_and_validation_pushed_by_stream(stub):
+    pool = _pool(stub)
+    try:
+        assert stub.subscribes[0]["streams"] == ["ledger"]
+        assert stub.subscribes[0]["accounts"] == ["rPlatform"]
+        assert pool.ledger_index == 100 and pool.fee_base == 10
+
+        fut = _wait_in_thread(pool, "H1", last_ledger=110)
+        stub.close_ledger({"H1": "tesSUCCESS"})
+        assert fut.result(2)[0] == "tesSUCCESS"
+        assert pool.ledger_index == 101
+    finally:
+        pool.stop()
+
+
+def test_resubscribes_after_stream_drop_and_catches_missed_validation(stub):
+    pool = _pool(stub)
+    try:
+        fut = _wait_in_thread(pool, "H2", last_ledger=110)
+        stub.drop_stream()
+        # validée pendant la coupure : jamais poussée par le flux
+        stub.close_ledger({"H2": "tesSUCCESS"}, push=False)
+
+        assert fut.result(3)[0] == "tesSUCCESS"
+        assert len(stub.subscribes) == 2
+        assert stub.subscribes[1]["accounts"] == ["rPlatform"]
+
+        # le nouveau flux est bien consommé
+        assert _until(lambda: len(stub.subscribers) == 1)
+        stub.close_ledger()
+        assert _until(lambda: pool.ledger_index == stub.ledger_index)
+    finally:
+        pool.stop()
+
+
+def test_silent_stream_still_expires_at_last_ledger(stub):
+    pool = _pool(stub, stream_check_s=0.1)
+    try:
+        fut = _wait_in_thread(pool, "H3", last_ledger=101)
+        for _ in range(2):
+            stub.close_ledger(push=False)
+        assert fut.result(2) == ("expired", {})
+    finally:
+        pool.stop()
+
+
+def test_wait_is_bounded_by_wall_clock(stub):
+    pool = _pool(stub, stream_check_s=0.1, tx_wait_timeout=0.3)
+    try:
+        t0 = time.monotonic()
+        # le ledger n'avance plus : ni validation ni expiration observables
+        assert pool.wait_validated("H4", last_ledger=110) == ("unknown", {})
+        assert time.monotonic() - t0 < 1.0
+        assert not pool._tx_waiters
+    finally:
+        pool.stop()
+
+
+def test_run_has_a_timeout(stub):
+    pool = _pool(stub)
+    try:
+        with pytest.raises(concurrent.futures.TimeoutError):
+            pool.run(asyncio.sleep(5), timeout=0.1)
+    finally:
+        pool.stop()
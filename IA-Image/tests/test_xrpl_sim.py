@@ -0,0 +1,76 @@
+# test_xrpl_sim.py
+import dataclasses
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+
+from escrow_service import build_create_tx, build_finish_tx, generate_secret_and_condition
+from tx_pipeline import TxPipeline
+
+
+def _signed_blob(pipeline: TxPipeline, tx, fee: int) -> str:
+    filled = dataclasses.replace(
+        tx,
+        sequence=pipeline.next_sequence(),
+        fee=str(fee),
+        last_ledger_sequence=pipeline.validated_ledger_index() + 20,
+    )
+    return sign(filled, pipeline.wallet).blob()
+
+
+def _create_escrow(sim, wallet, condition: str) -> int:
+    create = build_create_tx(wallet, Wallet.create().address, 5.0, datetime.utcnow() + timedelta(days=1), condition)
+    created = TxPipeline(sim, wallet).run([("create", create)])[0]
+    assert created.success, created.engine_result
+    return sim.txs[created.tx_hash].tx_json["Sequence"]
+
+
+def test_finish_with_flat_fee_is_rejected(ledger):
+    sim, wallet = ledger
+    fulfillment, condition = generate_secret_and_condition()
+    sequence = _create_escrow(sim, wallet, condition)
+
+    pipeline = TxPipeline(sim, wallet)
+    finish = build_finish_tx(wallet, wallet.address, sequence, condition, fulfillment)
+    result = pipeline.submit_blob(_signed_blob(pipeline, finish, sim.base_fee))
+    assert result["engine_result"] == "telINSUF_FEE_P"
+    assert len(sim.escrows) == 1
+
+
+def test_create_with_raw_condition_is_malformed(ledger):
+    sim, wallet = ledger
+    pipeline = TxPipeline(sim, wallet)
+    preimage = secrets.token_bytes(32)
+    raw_condition = hashlib.sha256(preimage).hexdigest().upper()
+    create = build_create_tx(
+        wallet, Wallet.create().address, 5.0, datetime.utcnow() + timedelta(days=1), raw_condition
+    )
+    result = pipeline.submit_blob(_signed_blob(pipeline, create, sim.base_fee))
+    assert result["engine_result"] == "temMALFORMED"
+    assert not sim.escrows
+
+
+def test_finish_with_raw_fulfillment_is_malformed(ledger):
+    sim, wallet = ledger
+    fulfillment, condition = generate_secret_and_condition()
+    sequence = _create_escrow(sim, wallet, condition)
+
+    pipeline = TxPipeline(sim, wallet)
+    finish = build_finish_tx(wallet, wallet.address, sequence, condition, fulfillment[8:])
+    result = pipeline.submit_blob(_signed_blob(pipeline, finish, sim.base_fee * 40))
+    assert result["engine_result"] == "temMALFORMED"
+
+
+def test_finish_with_wrong_preimage_fails(ledger):
+    sim, wallet = ledger
+    _, condition = generate_secret_and_condition()
+    other_fulfillment, _ = generate_secret_and_condition()
+    sequence = _create_escrow(sim, wallet, condition)
+
+    finish = build_finish_tx(wallet, wallet.address, sequence, condition, other_fulfillment)
+    result = TxPipeline(sim, wallet).run([("finish", finish)])[0]
+    assert result.engine_result == "tecCRYPTOCONDITION_ERROR"
+    assert len(sim.escrows) == 1
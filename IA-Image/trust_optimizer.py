@@ -1,11 +1,22 @@
 # trust_optimizer.py
+import time
 from datetime import datetime
-from typing import List, Literal, Tuple
+from typing import Dict, List, Literal, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
-from models import Project, Donation, Evidence, Validator, ProjectStatus, DonationStatus
-from validator_service import haversine_km
+from anchoring import record_verdict
+from evidence_aggregates import rebuild_project_stats, score_pending_evidences_many
+from models import (
+    Project,
+    Donation,
+    ProjectEvidenceStats,
+    ProjectStatus,
+    DonationStatus,
+)
+from settings import settings
+from validator_reputation import record_project_outcomes
+from vision_guard import ScoreBatch
 from vision_ai import analyze_image
 
 
@@ -20,46 +31,28 @@ def compute_ong_trust_score(project: Project) -> float:
     return base
 
 
-def compute_evidence_components(
-    project: Project,
-    evidences: List[Evidence],
-    validators: List[Validator],
+def compute_components_from_stats(
+    stats: ProjectEvidenceStats,
 ) -> Tuple[float, float, float, float]:
     """
-    Retourne (total_score, gps_score, rep_score, cv_score)
-    - gps_score : proximité géographique
-    - rep_score : réputation moyenne des validateurs
-    - cv_score  : score IA vision moyen sur les images
-    - total_score : mix 0.4*gps + 0.3*rep + 0.3*cv
+    Retourne (total_score, gps_score, rep_score, cv_score) en O(1) à partir
+    des agrégats maintenus par evidence_aggregates.
     """
-    if not evidences:
+    n = stats.evidence_count or 0
+    if n == 0:
         return 0.0, 0.0, 0.5, 0.5
 
-    # 1) GPS
-    gps_scores = []
-    for ev in evidences:
-        d = haversine_km(project.latitude, project.longitude, ev.latitude, ev.longitude)
-        gps_scores.append(max(0.0, 1.0 - d / 1.0))  # plein score si < 1 km
-
-    gps_score = sum(gps_scores) / len(gps_scores)
-
-    # 2) Réputation validateurs
-    rep_scores = [v.success_rate or 0.5 for v in validators]
-    rep_score = sum(rep_scores) / len(rep_scores) if rep_scores else 0.5
-
-    # 3) IA vision (CLIP)
-    cv_scores = []
-    for ev in evidences:
-        try:
-            score = analyze_image(ev.image_url)
-            cv_scores.append(score)
-        except Exception as e:
-            print(f"[TRUST_OPT] Error analyzing image {ev.image_url}: {e}")
-            continue
-
-    cv_score = sum(cv_scores) / len(cv_scores) if cv_scores else 0.5
+    gps_score = stats.gps_score_sum / n
+    rep_score = stats.reputation_sum / n
+    cv_score = (
+        stats.cv_score_sum / stats.cv_scored_count if stats.cv_scored_count else 0.5
+    )
 
-    total = 0.4 * gps_score + 0.3 * rep_score + 0.3 * cv_score
+    total = (
+        settings.VERDICT_GPS_WEIGHT * gps_score
+        + settings.VERDICT_REP_WEIGHT * rep_score
+        + settings.VERDICT_CV_WEIGHT * cv_score
+    )
 
     print(
         f"[TRUST_OPT] gps={gps_score:.3f}, rep={rep_score:.3f}, cv={cv_score:.3f}, total={total:.3f}"
@@ -71,45 +64,97 @@ def compute_evidence_components(
 def decide_project_verdict(
     db: Session,
     project: Project,
+    deadline: Optional[float] = None,
 ) -> dict:
-    evidences = db.query(Evidence).filter(Evidence.project_id == project.id).all()
-
-    # map validator_id -> Validator
-    validators_map = {
-        v.id: v for v in db.query(Validator).all()
-    }
-    validators_used = []
-    for ev in evidences:
-        v = validators_map.get(ev.validator_id)
-        if v:
-            validators_used.append(v)
-
-    ong_score = compute_ong_trust_score(project)
-    evidence_score, gps_score, rep_score, cv_score = compute_evidence_components(
-        project,
-        evidences,
-        validators_used,
-    )
+    """
+    deadline : échéance (time.monotonic()) du scoring IA vision, par défaut
+    VERDICT_DEADLINE_S. Les evidences non scorées à temps sont ignorées du
+    cv_score et signalées dans verdict["degraded"].
+    """
+    return decide_project_verdicts(db, [project], deadline)[project.id]
 
-    combined = 0.6 * evidence_score + 0.4 * ong_score
 
-    if combined >= 0.7 and len(evidences) >= 2:
-        decision: Literal["SUCCESS", "FAILURE"] = "SUCCESS"
-        project.status = ProjectStatus.SUCCESS
-    else:
-        decision = "FAILURE"
-        project.status = ProjectStatus.FAILED
+def decide_project_verdicts(
+    db: Session,
+    projects: List[Project],
+    deadline: Optional[float] = None,
+    finalize_degraded: bool = True,
+) -> Dict[int, dict]:
+    """
+    Verdicts de plusieurs projets en une transaction : agrégats, evidences à
+    scorer (un seul lot d'images), réputation et ancrage chargés / écrits
+    par requêtes groupées. Renvoie {project_id: verdict}.
 
-    db.add(project)
+    finalize_degraded=False : un projet dont des images n'ont pas été
+    scorées à temps reste sans verdict (absent du résultat) ; les scores
+    obtenus sont gardés pour le prochain passage.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + settings.VERDICT_DEADLINE_S
+    ids = [p.id for p in projects]
+    stats = {
+        s.project_id: s
+        for s in db.query(ProjectEvidenceStats).filter(ProjectEvidenceStats.project_id.in_(ids))
+    }
+    for pid in ids:
+        if pid not in stats:
+            # base antérieure aux agrégats : reconstruction une fois pour ce projet
+            stats[pid] = rebuild_project_stats(db, pid)
+
+    # seules les evidences pas encore analysées passent par l'IA vision
+    scoring = score_pending_evidences_many(db, ids, scorer=analyze_image, deadline=deadline)
+    rescored = [pid for pid, batch in scoring.items() if batch.scored]
+    if rescored:
+        db.query(ProjectEvidenceStats).filter(
+            ProjectEvidenceStats.project_id.in_(rescored)
+        ).populate_existing().all()
+
+    verdicts: Dict[int, dict] = {}
+    for project in projects:
+        s = stats[project.id]
+        batch = scoring.get(project.id) or ScoreBatch()
+        if batch.degraded and not finalize_degraded:
+            continue
+        ong_score = compute_ong_trust_score(project)
+        evidence_score, gps_score, rep_score, cv_score = compute_components_from_stats(s)
+        nb_evidences = s.evidence_count
+        nb_validators = s.distinct_validators
+
+        w = settings.VERDICT_EVIDENCE_WEIGHT
+        combined = w * evidence_score + (1 - w) * ong_score
+
+        if combined >= settings.VERDICT_SUCCESS_THRESHOLD and nb_evidences >= settings.VERDICT_MIN_EVIDENCES:
+            decision: Literal["SUCCESS", "FAILURE"] = "SUCCESS"
+            project.status = ProjectStatus.SUCCESS
+        else:
+            decision = "FAILURE"
+            project.status = ProjectStatus.FAILED
+
+        verdicts[project.id] = {
+            "decision": decision,
+            "combined_score": combined,
+            "evidence_score": evidence_score,
+            "ong_score": ong_score,
+            "gps_score": gps_score,
+            "rep_score": rep_score,
+            "cv_score": cv_score,
+            "nb_evidences": nb_evidences,
+            "nb_validators": nb_validators,
+            # composantes calculées en mode dégradé (budget de latence, disjoncteur)
+            "degraded": ["cv"] if batch.degraded else [],
+            "cv_unscored": len(batch.unscored),
+        }
+        db.add(project)
+
+    now = datetime.utcnow()
+    # statuts écrits avant la réputation (autoflush=False) : refresh_reputation_sums
+    # ne touche que les projets non tranchés, pas ceux décidés ici
+    db.flush()
+    # missions des validateurs des projets -> success_rate (même transaction)
+    record_project_outcomes(db, {pid: v["decision"] == "SUCCESS" for pid, v in verdicts.items()}, now)
+    for pid, verdict in verdicts.items():
+        # publié on-chain avec les autres verdicts de l'intervalle (racine Merkle)
+        record_verdict(db, pid, verdict, now)
     db.commit()
 
-    return {
-        "decision": decision,
-        "combined_score": combined,
-        "evidence_score": evidence_score,
-        "ong_score": ong_score,
-        "gps_score": gps_score,
-        "rep_score": rep_score,
-        "cv_score": cv_score,
-        "nb_evidences": len(evidences),
-    }
\ No newline at end of file
+    return verdicts
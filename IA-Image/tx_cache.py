@@ -0,0 +1,109 @@
+# tx_cache.py
+"""
+Cache local des paramètres d'autofill XRPL (fee + Sequence).
+
+Sans cache, chaque transaction coûte deux allers-retours (fee, account_info)
+avant même d'être signée, et deux escrows créés en même temps lisent la
+même Sequence (le second est rejeté en tefPAST_SEQ).
+
+TxParamCache :
+  - fee du ledger ouvert : relu une fois par fermeture de ledger (flux du
+    pool xrpl_async) ou, pour un client sans flux, toutes les
+    XRPL_FEE_CACHE_TTL_S secondes
+  - Sequence par wallet signataire : lue une fois sur le ledger courant puis
+    incrémentée localement sous verrou (réservation atomique)
+  - resync(address) : oublie la Sequence locale, relue au prochain appel
+    (tefPAST_SEQ, tx jamais appliquée ou expirée). Pas sur terPRE_SEQ :
+    une Sequence inférieure est encore en vol (soumissions concurrentes),
+    relire le ledger redonnerait des Sequences déjà réservées
+
+Un cache par client XRPL (get_tx_cache) : tous les TxPipeline d'un process
+partagent donc les mêmes compteurs.
+"""
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+from xrpl.models.requests import AccountInfo, Fee, Ledger
+
+from settings import settings
+
+# la Sequence locale n'est plus fiable : relire le ledger
+SEQUENCE_RESYNC_RESULTS = ("tefPAST_SEQ",)
+
+
+class TxParamCache:
+    def __init__(self, client, fee_ttl: float = settings.XRPL_FEE_CACHE_TTL_S):
+        self.client = client
+        self.fee_ttl = fee_ttl
+        self._lock = threading.Lock()
+
+        self._sequences: Dict[str, int] = {}
+        self._fee: Optional[str] = None
+        self._fee_ledger: Optional[int] = None
+        self._fee_at = 0.0
+
+        # petites stats pour le debug / monitoring
+        self.fee_fetches = 0
+        self.sequence_fetches = 0
+
+    def _stream_ledger(self) -> int:
+        # dernier ledger fermé vu par le flux du pool (0 = pas de flux)
+        return int(getattr(self.client, "ledger_index", 0) or 0)
+
+    # ---------- Fee ----------
+
+    def open_ledger_fee(self) -> str:
+        with self._lock:
+            ledger = self._stream_ledger()
+            if self._fee is not None:
+                if ledger and ledger == self._fee_ledger:
+                    return self._fee
+                if not ledger and time.monotonic() - self._fee_at < self.fee_ttl:
+                    return self._fee
+
+            resp = self.client.request(Fee())
+            self._fee = str(resp.result["drops"]["open_ledger_fee"])
+            self._fee_ledger = ledger or None
+            self._fee_at = time.monotonic()
+            self.fee_fetches += 1
+            return self._fee
+
+    def validated_ledger_index(self) -> int:
+        ledger = self._stream_ledger()
+        if ledger:
+            return ledger
+        resp = self.client.request(Ledger(ledger_index="validated"))
+        return int(resp.result["ledger_index"])
+
+    # ---------- Sequence ----------
+
+    def reserve_sequence(self, address: str, count: int = 1) -> int:
+        """Réserve count Sequences consécutives et renvoie la première."""
+        with self._lock:
+            sequence = self._sequences.get(address)
+            if sequence is None:
+                resp = self.client.request(
+                    AccountInfo(account=address, ledger_index="current")
+                )
+                sequence = int(resp.result["account_data"]["Sequence"])
+                self.sequence_fetches += 1
+            self._sequences[address] = sequence + count
+            return sequence
+
+    def resync(self, address: str) -> None:
+        with self._lock:
+            self._sequences.pop(address, None)
+
+
+_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_tx_cache(client) -> TxParamCache:
+    with _caches_lock:
+        cache = _caches.get(client)
+        if cache is None:
+            cache = _caches[client] = TxParamCache(client)
+        return cache
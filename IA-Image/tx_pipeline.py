@@ -0,0 +1,208 @@
+# tx_pipeline.py
+"""
+Pipeline de soumission XRPL pour les lots de transactions (finish / cancel
+d'escrows au verdict).
+
+Au lieu d'un submit_and_wait par transaction (une fermeture de ledger
+chacune, ~3-5 s), on :
+  1. prend le fee et la séquence du compte dans le cache partagé (tx_cache) ;
+     le fee de référence est ajusté au type de tx (transaction_fee)
+  2. assigne les Sequence localement (seq, seq+1, ...) + LastLedgerSequence
+  3. signe et soumet chaque tx sans attendre sa validation
+  4. suit la validation de toutes les tx en parallèle (threads) ; avec le
+     pool partagé (xrpl_async) ou le simulateur (xrpl_sim) la validation est
+     notifiée, sinon polling
+Les résultats sont remontés au fil de l'eau via un callback, dans le
+thread appelant (on peut donc y utiliser la session DB de la requête).
+"""
+import dataclasses
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from xrpl.core.binarycodec import encode
+from xrpl.models.requests import SubmitOnly, Tx
+from xrpl.models.transactions import EscrowFinish, Transaction
+from xrpl.transaction import sign
+
+from settings import settings
+from tx_cache import SEQUENCE_RESYNC_RESULTS, TxParamCache, get_tx_cache
+
+# (clé métier, transaction non signée sans Sequence/Fee)
+TxJob = Tuple[Any, Transaction]
+
+
+@dataclass
+class TxResult:
+    key: Any
+    tx_hash: Optional[str]
+    engine_result: str  # TransactionResult final, rejet préliminaire ou "expired"
+    success: bool
+    raw: dict = field(default_factory=dict)
+
+
+def transaction_fee(tx: Transaction, reference_fee: str) -> str:
+    """
+    Fee d'une tx à partir du fee de référence (open_ledger_fee, tx
+    standard), comme l'autofill de xrpl-py : un EscrowFinish avec
+    Fulfillment coûte reference * (33 + ceil(taille du fulfillment / 16)),
+    sinon rippled le rejette (telINSUF_FEE_P).
+    """
+    fee = int(reference_fee)
+    if isinstance(tx, EscrowFinish) and tx.fulfillment:
+        fulfillment_bytes = len(tx.fulfillment) // 2  # hex
+        fee *= 33 + math.ceil(fulfillment_bytes / 16)
+    return str(fee)
+
+
+def never_applied(engine_result: str) -> bool:
+    # tem / tef / tel : la tx n'entrera jamais dans un ledger, sa
+    # Sequence n'est pas consommée
+    return engine_result.startswith(("tem", "tef", "tel"))
+
+
+class TxPipeline:
+    def __init__(
+        self,
+        client,
+        wallet,
+        max_in_flight: int = settings.TX_PIPELINE_MAX_IN_FLIGHT,
+        ledger_window: int = settings.TX_LEDGER_WINDOW,
+        poll_interval: float = settings.TX_POLL_INTERVAL_S,
+        cache: Optional[TxParamCache] = None,
+    ):
+        self.client = client
+        self.cache = cache if cache is not None else get_tx_cache(client)
+        self.wallet = wallet
+        self.max_in_flight = max_in_flight
+        self.ledger_window = ledger_window
+        self.poll_interval = poll_interval
+
+    # ---------- Accès ledger ----------
+
+    def next_sequence(self, count: int = 1) -> int:
+        """Réserve count Sequences du wallet (cache local) et renvoie la première."""
+        return self.cache.reserve_sequence(self.wallet.address, count)
+
+    def resync_sequence(self) -> None:
+        self.cache.resync(self.wallet.address)
+
+    def open_ledger_fee(self) -> str:
+        return self.cache.open_ledger_fee()
+
+    def validated_ledger_index(self) -> int:
+        return self.cache.validated_ledger_index()
+
+    # ---------- Soumission ----------
+
+    def prepare(self, tx: Transaction, sequence: int, reference_fee: str, last_ledger: int):
+        """Signe tx ; reference_fee = open_ledger_fee(), ajusté au type de tx."""
+        filled = dataclasses.replace(
+            tx,
+            sequence=sequence,
+            fee=transaction_fee(tx, reference_fee),
+            last_ledger_sequence=last_ledger,
+        )
+        return sign(filled, self.wallet)
+
+    def submit_signed(self, signed: Transaction) -> dict:
+        return self.submit_blob(encode(signed.to_xrpl()))
+
+    def submit_blob(self, tx_blob: str) -> dict:
+        # soumettre deux fois le même blob signé est idempotent
+        resp = self.client.request(SubmitOnly(tx_blob=tx_blob))
+        return resp.result
+
+    def lookup_validated(self, key: Any, tx_hash: str) -> Optional[TxResult]:
+        """Résultat final de la tx si elle est dans un ledger validé, sinon None."""
+        resp = self.client.request(Tx(transaction=tx_hash))
+        r = resp.result
+        if resp.is_successful() and r.get("validated"):
+            engine_result = r["meta"]["TransactionResult"]
+            return TxResult(key, tx_hash, engine_result, engine_result == "tesSUCCESS", r)
+        return None
+
+    def _wait_validated(self, key: Any, tx_hash: str, last_ledger: int) -> TxResult:
+        if hasattr(self.client, "wait_validated"):
+            # pool xrpl_async (flux ledger / transactions) ou simulateur :
+            # notifié à la validation, sans polling
+            engine_result, raw = self.client.wait_validated(
+                tx_hash, last_ledger, self.wallet.address
+            )
+            return TxResult(key, tx_hash, engine_result, engine_result == "tesSUCCESS", raw)
+
+        while True:
+            res = self.lookup_validated(key, tx_hash)
+            if res is not None:
+                return res
+            # plus de chance d'être incluse au-delà de LastLedgerSequence
+            if self.validated_ledger_index() > last_ledger:
+                return TxResult(key, tx_hash, "expired", False)
+            time.sleep(self.poll_interval)
+
+    def run(
+        self,
+        jobs: Iterable[TxJob],
+        on_result: Optional[Callable[[TxResult], None]] = None,
+    ) -> List[TxResult]:
+        jobs = list(jobs)
+        if not jobs:
+            return []
+
+        fee = self.open_ledger_fee()
+        last_ledger = self.validated_ledger_index() + self.ledger_window
+
+        results: List[TxResult] = []
+
+        def _emit(res: TxResult) -> None:
+            results.append(res)
+            if on_result is not None:
+                on_result(res)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            trackers: Dict[Future, Tuple[Any, str]] = {}
+            for key, tx in jobs:
+                # une seconde chance si la Sequence locale était périmée
+                for attempt in range(2):
+                    signed = self.prepare(tx, self.next_sequence(), fee, last_ledger)
+                    tx_hash = signed.get_hash()
+                    try:
+                        prelim = self.submit_signed(signed)
+                    except Exception as e:
+                        # état inconnu côté serveur : on suit quand même le hash
+                        print(f"[TX_PIPELINE] submit error for {key}: {e}")
+                        prelim = {"engine_result": "terSUBMIT_ERROR"}
+
+                    engine_result = prelim.get("engine_result", "")
+                    if engine_result in SEQUENCE_RESYNC_RESULTS:
+                        self.resync_sequence()
+                    if engine_result == "tefPAST_SEQ" and attempt == 0:
+                        continue
+                    break
+
+                if never_applied(engine_result):
+                    _emit(TxResult(key, tx_hash, engine_result, False, prelim))
+                    # séquence non consommée : on repart de l'état du ledger
+                    self.resync_sequence()
+                    continue
+
+                # terPRE_SEQ compris : la tx reste en attente côté serveur et
+                # peut encore passer avant LastLedgerSequence, on la suit
+                fut = pool.submit(self._wait_validated, key, tx_hash, last_ledger)
+                trackers[fut] = (key, tx_hash)
+
+            for fut in as_completed(trackers):
+                try:
+                    res = fut.result()
+                    if res.engine_result == "expired":
+                        # Sequence jamais consommée : les suivantes sont décalées
+                        self.resync_sequence()
+                    _emit(res)
+                except Exception as e:
+                    key, tx_hash = trackers[fut]
+                    print(f"[TX_PIPELINE] tracking error for {key} ({tx_hash}): {e}")
+                    _emit(TxResult(key, tx_hash, "unknown", False))
+
+        return results
@@ -0,0 +1,211 @@
+# validator_assignment.py
+"""
+Affectation groupée des validateurs aux projets ouverts, sous contrainte de
+capacité.
+
+select_validators_for_project choisit projet par projet : le même
+validateur très bien noté part sur des dizaines de projets à la fois. Ici
+on résout l'affectation de tous les projets d'un coup :
+  1. candidats : projets regroupés par cellule de l'index spatial
+     (validator_service.validator_index) ; pour chaque cellule, matrice
+     distance / score (haversine NumPy) contre les seuls validateurs des
+     cellules voisines ; on garde les ASSIGN_CANDIDATES meilleurs par projet.
+     Score identique à select_validators_for_project.
+  2. enchères (Bertsekas, problème de transport) : chaque place libre d'un
+     projet enchérit sur son meilleur validateur (score - prix) parmi ceux
+     qu'il n'a pas encore ; un validateur garde ses VALIDATOR_CAPACITY
+     meilleures offres, son prix est la plus basse quand il est plein.
+     Une place dont la meilleure valeur nette est <= 0 reste vide (option
+     « aucun validateur »). Résultat à k * eps du score total optimal.
+
+    python validator_assignment.py [--save] [--k 3] [--capacity 5]
+"""
+import argparse
+import heapq
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Project, ProjectStatus, ValidatorAssignment
+from settings import settings
+from geo import haversine_km_batch
+from validator_service import validator_index, validator_scores
+
+_OPEN = (ProjectStatus.OPEN, ProjectStatus.FUNDED, ProjectStatus.IN_PROGRESS)
+
+# (indices validateurs, scores) triés par score décroissant
+Candidates = Tuple[np.ndarray, np.ndarray]
+
+
+def candidate_matrix(
+    projects: List[Tuple[int, float, float]],
+    max_radius_km: float,
+    top_m: int,
+) -> Tuple[np.ndarray, List[Candidates]]:
+    """
+    projects : (id, lat, lon). Renvoie (ids des validateurs, candidats par
+    projet) ; les candidats référencent les validateurs par indice.
+    """
+    cells = validator_index.snapshot()
+    if not cells:
+        return np.empty(0, dtype=np.int64), [(np.empty(0, dtype=np.int64), np.empty(0))] * len(projects)
+
+    # indice global de chaque validateur : tableaux concaténés par cellule
+    keys = list(cells)
+    offsets: Dict[Tuple[int, int], int] = {}
+    start = 0
+    for key in keys:
+        offsets[key] = start
+        start += len(cells[key])
+    table = np.concatenate([cells[key] for key in keys])
+    validator_ids = table[:, 0].astype(np.int64)
+
+    by_cell: Dict[Tuple[int, int], List[int]] = {}
+    for i, (_, lat, lon) in enumerate(projects):
+        by_cell.setdefault(validator_index.cell_key(lat, lon), []).append(i)
+
+    out: List[Candidates] = [None] * len(projects)
+    for cell, rows in by_cell.items():
+        near = validator_index.cells_near_cell(cell, max_radius_km)
+        if not near:
+            for i in rows:
+                out[i] = (np.empty(0, dtype=np.int64), np.empty(0))
+            continue
+        idx = np.concatenate([np.arange(offsets[c], offsets[c] + len(cells[c])) for c in near])
+        p_lat = np.array([projects[i][1] for i in rows])[:, None]
+        p_lon = np.array([projects[i][2] for i in rows])[:, None]
+
+        dist = haversine_km_batch(p_lat, p_lon, table[idx, 1], table[idx, 2])
+        score = validator_scores(dist, table[idx, 3], max_radius_km)
+
+        m = min(top_m, score.shape[1])
+        top = np.argpartition(-score, m - 1, axis=1)[:, :m] if m < score.shape[1] else np.tile(np.arange(m), (len(rows), 1))
+        for r, i in enumerate(rows):
+            cols = top[r]
+            s = score[r, cols]
+            keep = np.isfinite(s)
+            cols, s = cols[keep], s[keep]
+            order = np.argsort(-s, kind="stable")
+            out[i] = (idx[cols[order]], s[order])
+    return validator_ids, out
+
+
+def auction_assign(
+    candidates: List[Candidates],
+    n_validators: int,
+    k: int,
+    capacity: int,
+    eps: float = 1e-3,
+) -> List[List[int]]:
+    """
+    Affectation maximisant le score total : chaque projet reçoit au plus k
+    validateurs distincts, chaque validateur au plus capacity projets.
+    Renvoie, par projet, les indices des validateurs retenus.
+    """
+    price = np.zeros(n_validators)
+    holders: List[List[Tuple[float, int]]] = [[] for _ in range(n_validators)]  # tas (offre, projet)
+    mine: List[set] = [set() for _ in candidates]
+    queue = deque(p for p, (vi, _) in enumerate(candidates) for _ in range(min(k, len(vi))))
+
+    while queue:
+        p = queue.popleft()
+        vi, sc = candidates[p]
+        values = sc - price[vi]
+        best_j, best_v, second_v = -1, 0.0, 0.0
+        for o in np.argsort(-values, kind="stable"):
+            j = vi[o]
+            if j in mine[p]:
+                continue
+            if best_j < 0:
+                best_j, best_v = j, values[o]
+            else:
+                second_v = max(values[o], 0.0)
+                break
+        if best_j < 0 or best_v <= 0.0:
+            # plus aucun validateur rentable : la place reste vide
+            continue
+
+        bid = price[best_j] + best_v - second_v + eps
+        heap = holders[best_j]
+        heapq.heappush(heap, (bid, p))
+        mine[p].add(best_j)
+        if len(heap) > capacity:
+            _, loser = heapq.heappop(heap)
+            mine[loser].discard(best_j)
+            queue.append(loser)
+        if len(heap) >= capacity:
+            price[best_j] = heap[0][0]
+
+    return [sorted(m) for m in mine]
+
+
+def assign_validators(
+    db: Session,
+    k: int = settings.VALIDATORS_PER_PROJECT,
+    capacity: int = settings.VALIDATOR_CAPACITY,
+    max_radius_km: float = settings.VALIDATOR_MAX_RADIUS_KM,
+    top_m: int = settings.ASSIGN_CANDIDATES,
+) -> Dict[int, List[int]]:
+    """{project_id: [validator_id, ...]} pour tous les projets ouverts."""
+    validator_index.sync(db)
+    projects = [
+        (pid, lat, lon)
+        for pid, lat, lon in db.query(Project.id, Project.latitude, Project.longitude)
+        .filter(Project.status.in_(_OPEN), Project.deadline > datetime.utcnow())
+    ]
+    validator_ids, candidates = candidate_matrix(projects, max_radius_km, top_m)
+    chosen = auction_assign(candidates, len(validator_ids), k, capacity)
+    return {
+        pid: [int(validator_ids[j]) for j in picks]
+        for (pid, _, _), picks in zip(projects, chosen)
+    }
+
+
+def save_assignments(db: Session, assignments: Dict[int, List[int]]) -> None:
+    """Remplace les affectations des projets traités (une transaction)."""
+    now = datetime.utcnow()
+    db.query(ValidatorAssignment).filter(
+        ValidatorAssignment.project_id.in_(list(assignments))
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(
+        ValidatorAssignment,
+        [
+            {"project_id": pid, "validator_id": vid, "assigned_at": now}
+            for pid, vids in assignments.items()
+            for vid in vids
+        ],
+    )
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Affectation groupée des validateurs")
+    parser.add_argument("--k", type=int, default=settings.VALIDATORS_PER_PROJECT)
+    parser.add_argument("--capacity", type=int, default=settings.VALIDATOR_CAPACITY)
+    parser.add_argument("--radius-km", type=float, default=settings.VALIDATOR_MAX_RADIUS_KM)
+    parser.add_argument("--save", action="store_true", help="enregistre les affectations")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        assignments = assign_validators(db, args.k, args.capacity, args.radius_km)
+        dt = time.perf_counter() - t0
+        slots = sum(len(v) for v in assignments.values())
+        short = sum(1 for v in assignments.values() if len(v) < args.k)
+        print(f"[ASSIGN] {len(assignments)} project(s), {slots} assignment(s), "
+              f"{short} project(s) under {args.k} validators, {dt:.2f} s")
+        if args.save:
+            save_assignments(db, assignments)
+            print("[ASSIGN] saved")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
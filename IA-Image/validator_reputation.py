@@ -0,0 +1,266 @@
+# validator_reputation.py
+"""
+Réputation des validateurs (success_rate, missions_completed / failed),
+maintenue de façon incrémentale dans la transaction du verdict.
+
+À chaque verdict, chaque validateur ayant des evidences comptées sur le
+projet reçoit une mission réussie (SUCCESS) ou échouée (FAILURE), journalisée
+dans validator_outcomes. Les missions pèsent 2^(-âge / demi-vie) :
+  - compteurs stockés à l'échelle d'une époque fixe (poids 2^((t - époque) /
+    demi-vie)) : ajouter une mission est une simple addition atomique en SQL,
+    et la retirer (verdict rejoué, issue inversée) est exact
+  - success_rate = (ok + PRIOR * W) / (ok + fail + W), compteurs ramenés à
+    la date du calcul ; W = REPUTATION_PRIOR_WEIGHT missions fraîches
+Le verdict et la sélection des validateurs lisent success_rate tel quel ;
+reputation_sum des projets ouverts est mis à jour dans la même transaction
+(evidence_aggregates.refresh_reputation_sums).
+
+Vérification périodique (cron) : python validator_reputation.py [--repair]
+rejoue le journal et compare aux compteurs stockés.
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, dialect_insert
+from evidence_aggregates import counted_evidence, refresh_reputation_sums
+from models import Evidence, Validator, ValidatorOutcome
+from settings import settings
+
+_EPOCH = datetime(2024, 1, 1)
+
+# tolérance relative sur les compteurs pondérés
+_REL_EPS = 1e-9
+
+
+def mission_weight(at: datetime, half_life_days: float = settings.REPUTATION_HALF_LIFE_DAYS) -> float:
+    """Poids d'une mission à la date `at`, à l'échelle de l'époque."""
+    return 2.0 ** ((at - _EPOCH).total_seconds() / (half_life_days * 86400.0))
+
+
+def success_rate_at(ok: float, fail: float, at: datetime) -> float:
+    scale = 1.0 / mission_weight(at)
+    w = settings.REPUTATION_PRIOR_WEIGHT
+    return (ok * scale + settings.REPUTATION_PRIOR * w) / ((ok + fail) * scale + w)
+
+
+def _apply_deltas(db: Session, deltas: List[dict], now: datetime) -> None:
+    """Un UPDATE (executemany) : compteurs += deltas, success_rate recalculé."""
+    t = Validator.__table__
+    ok = func.coalesce(t.c.reputation_ok, 0.0) + bindparam("d_ok")
+    fail = func.coalesce(t.c.reputation_fail, 0.0) + bindparam("d_fail")
+    scale = 1.0 / mission_weight(now)
+    w = settings.REPUTATION_PRIOR_WEIGHT
+    db.execute(
+        update(t)
+        .where(t.c.id == bindparam("vid"))
+        .values(
+            reputation_ok=ok,
+            reputation_fail=fail,
+            missions_completed=func.coalesce(t.c.missions_completed, 0) + bindparam("d_completed"),
+            missions_failed=func.coalesce(t.c.missions_failed, 0) + bindparam("d_failed"),
+            success_rate=(ok * scale + settings.REPUTATION_PRIOR * w) / ((ok + fail) * scale + w),
+            reputation_at=now,
+            updated_at=now,
+        ),
+        deltas,
+    )
+
+
+def record_project_outcome(db: Session, project_id: int, success: bool, now: datetime) -> int:
+    """
+    À appeler dans la transaction du verdict (avant commit). Idempotent : un
+    verdict rejoué avec la même issue ne change rien, une issue inversée
+    retire l'ancienne mission avant d'ajouter la nouvelle.
+    Renvoie le nombre de validateurs mis à jour.
+    """
+    return record_project_outcomes(db, {project_id: success}, now)
+
+
+def record_project_outcomes(db: Session, outcomes: Dict[int, bool], now: datetime) -> int:
+    """
+    record_project_outcome pour plusieurs projets {project_id: success} :
+    mêmes 5 requêtes quel que soit le nombre de projets, deltas cumulés par
+    validateur.
+    """
+    pairs = (
+        db.query(Evidence.project_id, Evidence.validator_id)
+        .filter(Evidence.project_id.in_(list(outcomes)), counted_evidence())
+        .distinct()
+        .all()
+    )
+    if not pairs:
+        return 0
+    previous = {
+        (pid, vid): (ok, decided_at)
+        for pid, vid, ok, decided_at in db.query(
+            ValidatorOutcome.project_id,
+            ValidatorOutcome.validator_id,
+            ValidatorOutcome.success,
+            ValidatorOutcome.decided_at,
+        ).filter(ValidatorOutcome.project_id.in_(list(outcomes)))
+    }
+
+    weight = mission_weight(now)
+    deltas: Dict[int, dict] = {}
+    changed: List[dict] = []
+    for pid, vid in pairs:
+        success = outcomes[pid]
+        old = previous.get((pid, vid))
+        if old is not None and old[0] == success:
+            continue
+        d = deltas.setdefault(vid, {"vid": vid, "d_ok": 0.0, "d_fail": 0.0, "d_completed": 0, "d_failed": 0})
+        if old is not None:
+            old_weight = mission_weight(old[1])
+            if old[0]:
+                d["d_ok"] -= old_weight
+                d["d_completed"] -= 1
+            else:
+                d["d_fail"] -= old_weight
+                d["d_failed"] -= 1
+        if success:
+            d["d_ok"] += weight
+            d["d_completed"] += 1
+        else:
+            d["d_fail"] += weight
+            d["d_failed"] += 1
+        changed.append({"project_id": pid, "validator_id": vid, "success": success, "decided_at": now})
+    if not changed:
+        return 0
+
+    stmt = dialect_insert(db)(ValidatorOutcome).values(changed)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ValidatorOutcome.project_id, ValidatorOutcome.validator_id],
+            set_={"success": stmt.excluded.success, "decided_at": stmt.excluded.decided_at},
+        )
+    )
+    _apply_deltas(db, list(deltas.values()), now)
+    refresh_reputation_sums(db, list(deltas))
+    return len(deltas)
+
+
+# ---------- Recalcul complet / réconciliation ----------
+
+def _replay_outcomes(db: Session) -> Dict[int, dict]:
+    """Compteurs attendus par validateur, rejoués depuis validator_outcomes."""
+    expected: Dict[int, dict] = defaultdict(
+        lambda: {"reputation_ok": 0.0, "reputation_fail": 0.0, "missions_completed": 0, "missions_failed": 0}
+    )
+    q = db.query(ValidatorOutcome.validator_id, ValidatorOutcome.success, ValidatorOutcome.decided_at)
+    for vid, ok, decided_at in q.yield_per(5000):
+        e = expected[vid]
+        if ok:
+            e["reputation_ok"] += mission_weight(decided_at)
+            e["missions_completed"] += 1
+        else:
+            e["reputation_fail"] += mission_weight(decided_at)
+            e["missions_failed"] += 1
+    return expected
+
+
+def _differs(have, want) -> bool:
+    if isinstance(want, int):
+        return (have or 0) != want
+    return abs((have or 0.0) - want) > _REL_EPS * max(1.0, abs(want))
+
+
+def reconcile_reputations(db: Session, repair: bool = False) -> List[dict]:
+    """
+    Compare les compteurs de réputation stockés au rejeu du journal.
+    Renvoie les divergences ; si repair=True, les corrige (success_rate
+    recalculé à maintenant) et commit.
+    """
+    expected = _replay_outcomes(db)
+    divergences: List[dict] = []
+    fixes: List[dict] = []
+
+    rows = db.query(
+        Validator.id,
+        Validator.reputation_ok,
+        Validator.reputation_fail,
+        Validator.missions_completed,
+        Validator.missions_failed,
+        Validator.success_rate,
+        Validator.reputation_at,
+    )
+    for row in rows:
+        e = expected.pop(row.id, None)
+        if e is None:
+            # jamais tranché : compteurs vides, success_rate laissé tel quel
+            if not any(getattr(row, f) for f in ("reputation_ok", "reputation_fail", "missions_completed", "missions_failed")):
+                continue
+            e = {"reputation_ok": 0.0, "reputation_fail": 0.0, "missions_completed": 0, "missions_failed": 0}
+        diffs = {
+            f: {"stored": getattr(row, f), "expected": want}
+            for f, want in e.items()
+            if _differs(getattr(row, f), want)
+        }
+        if not diffs and row.reputation_at is not None:
+            want = success_rate_at(e["reputation_ok"], e["reputation_fail"], row.reputation_at)
+            if _differs(row.success_rate, want):
+                diffs["success_rate"] = {"stored": row.success_rate, "expected": want}
+        if diffs:
+            divergences.append({"validator_id": row.id, "fields": diffs})
+            fixes.append({"vid": row.id, **e})
+
+    # issues de validateurs supprimés
+    for vid in expected:
+        divergences.append({"validator_id": vid, "fields": {"missing": True}})
+
+    if repair and fixes:
+        now = datetime.utcnow()
+        t = Validator.__table__
+        db.execute(
+            update(t)
+            .where(t.c.id == bindparam("vid"))
+            .values(
+                reputation_ok=bindparam("ok"),
+                reputation_fail=bindparam("fail"),
+                missions_completed=bindparam("completed"),
+                missions_failed=bindparam("failed"),
+                success_rate=bindparam("rate"),
+                reputation_at=now,
+                updated_at=now,
+            ),
+            [
+                {
+                    "vid": f["vid"],
+                    "ok": f["reputation_ok"],
+                    "fail": f["reputation_fail"],
+                    "completed": f["missions_completed"],
+                    "failed": f["missions_failed"],
+                    "rate": success_rate_at(f["reputation_ok"], f["reputation_fail"], now),
+                }
+                for f in fixes
+            ],
+        )
+        refresh_reputation_sums(db, [f["vid"] for f in fixes])
+        db.commit()
+
+    return divergences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réconciliation de la réputation des validateurs")
+    parser.add_argument("--repair", action="store_true", help="corrige les divergences")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        divergences = reconcile_reputations(db, repair=args.repair)
+    finally:
+        db.close()
+
+    for d in divergences:
+        print(f"[REPUTATION] validator {d['validator_id']}: {d['fields']}")
+    status = "repaired" if args.repair else "found"
+    print(f"[REPUTATION] {len(divergences)} divergence(s) {status}")
+
+
+if __name__ == "__main__":
+    main()
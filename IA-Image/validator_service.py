@@ -1,19 +1,221 @@
 # validator_service.py
-from typing import List
-from math import radians, cos, sin, asin, sqrt
+import threading
+import time
+from datetime import datetime, timedelta
+from math import radians, degrees, cos, sin, asin, floor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 from sqlalchemy.orm import Session
 
+from geo import EARTH_RADIUS_KM, haversine_km, haversine_km_batch
 from models import Validator
+from settings import settings
+
+
+def validator_scores(dist_km: np.ndarray, success_rate: np.ndarray, max_radius_km: float) -> np.ndarray:
+    """
+    Score de sélection : 0.6 * success_rate + 0.4 * proximité, -inf hors
+    rayon. success_rate NaN ou 0 -> 0.5 (`success_rate or 0.5`).
+    """
+    rate = np.nan_to_num(success_rate, nan=0.5)
+    rate = np.where(rate == 0, 0.5, rate)
+    score = 0.6 * rate + 0.4 * np.maximum(0.0, 1.0 - dist_km / max_radius_km)
+    return np.where(dist_km > max_radius_km, -np.inf, score)
+
+
+# (id, latitude, longitude, success_rate)
+_Entry = Tuple[int, float, float, Optional[float]]
+
+
+class ValidatorGridIndex:
+    """
+    Grille lat / lon en mémoire des validateurs non slashés avec position.
+
+    Une requête (rayon, top-k) ne visite que les cellules couvrant la
+    calotte sphérique du rayon (boîte englobante exacte, antiméridien et
+    pôles compris) au lieu de scanner toute la table. Synchronisation avec
+    la table validators :
+      - relecture des lignes modifiées depuis le dernier passage
+        (ix_validators_updated_at) au plus toutes les VALIDATOR_INDEX_REFRESH_S
+      - rechargement complet toutes les VALIDATOR_INDEX_RELOAD_S (lignes
+        sans updated_at, commits tardifs)
+    """
+
+    def __init__(
+        self,
+        cell_deg: float = settings.VALIDATOR_INDEX_CELL_DEG,
+        refresh_s: float = settings.VALIDATOR_INDEX_REFRESH_S,
+        reload_s: float = settings.VALIDATOR_INDEX_RELOAD_S,
+    ):
+        # nombre entier de cellules sur 360° (bouclage en longitude)
+        self.n_lon = max(1, round(360.0 / cell_deg))
+        self.cell_deg = 360.0 / self.n_lon
+        self.refresh_s = refresh_s
+        self.reload_s = reload_s
+
+        self._cells: Dict[Tuple[int, int], Dict[int, _Entry]] = {}
+        self._cell_of: Dict[int, Tuple[int, int]] = {}
+        # cellule -> tableau (n, 4) id, lat, lon, success_rate (NaN = inconnu),
+        # reconstruit à la première requête après modification
+        self._arrays: Dict[Tuple[int, int], np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._synced_until: Optional[datetime] = None
+        self._checked_at: Optional[float] = None
+        self._loaded_at: Optional[float] = None
+
+    # ---------- Contenu ----------
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = floor(lat / self.cell_deg)
+        col = floor((lon + 180.0) / self.cell_deg) % self.n_lon
+        return row, col
+
+    def _discard(self, validator_id: int) -> None:
+        cell = self._cell_of.pop(validator_id, None)
+        if cell is not None:
+            self._arrays.pop(cell, None)
+            bucket = self._cells[cell]
+            del bucket[validator_id]
+            if not bucket:
+                del self._cells[cell]
+
+    def _put(self, vid, lat, lon, success_rate, slashed) -> None:
+        self._discard(vid)
+        if slashed or lat is None or lon is None:
+            return
+        cell = self._cell(lat, lon)
+        self._arrays.pop(cell, None)
+        self._cells.setdefault(cell, {})[vid] = (vid, lat, lon, success_rate)
+        self._cell_of[vid] = cell
+
+    # ---------- Synchronisation ----------
+
+    def _rows(self, db: Session, since: Optional[datetime]):
+        q = db.query(
+            Validator.id,
+            Validator.latitude,
+            Validator.longitude,
+            Validator.success_rate,
+            Validator.slashed,
+            Validator.updated_at,
+        )
+        if since is not None:
+            q = q.filter(Validator.updated_at >= since)
+        return q
+
+    def sync(self, db: Session, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_s:
+            return
+        full = force or self._loaded_at is None or now - self._loaded_at >= self.reload_s
+
+        # marge : commits de transactions commencées juste avant le passage
+        since = None
+        if not full and self._synced_until is not None:
+            since = self._synced_until - timedelta(seconds=max(self.refresh_s, 1.0) * 2)
+        rows = self._rows(db, since).all()
+
+        with self._lock:
+            if full:
+                self._cells = {}
+                self._cell_of = {}
+                self._arrays = {}
+            latest = self._synced_until
+            for vid, lat, lon, rate, slashed, updated_at in rows:
+                self._put(vid, lat, lon, rate, slashed)
+                if updated_at is not None and (latest is None or updated_at > latest):
+                    latest = updated_at
+            self._synced_until = latest or datetime.utcnow()
+            self._checked_at = now
+            if full:
+                self._loaded_at = now
+
+    # ---------- Requêtes ----------
+
+    def _candidate_cells(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, int]]:
+        angular = radius_km / EARTH_RADIUS_KM
+        dlat = degrees(angular)
+        lat_lo, lat_hi = lat - dlat, lat + dlat
+        if lat_lo <= -90.0 or lat_hi >= 90.0 or angular >= 1.5:
+            # calotte contenant un pôle : toutes les longitudes
+            cols = range(self.n_lon)
+        else:
+            dlon = degrees(asin(min(1.0, sin(angular) / cos(radians(lat)))))
+            first = floor((lon - dlon + 180.0) / self.cell_deg)
+            last = floor((lon + dlon + 180.0) / self.cell_deg)
+            if last - first + 1 >= self.n_lon:
+                cols = range(self.n_lon)
+            else:
+                cols = [c % self.n_lon for c in range(first, last + 1)]
+        rows = range(floor(max(lat_lo, -90.0) / self.cell_deg), floor(min(lat_hi, 90.0) / self.cell_deg) + 1)
+
+        if len(rows) * len(cols) > len(self._cells):
+            # grand rayon : moins de cellules occupées que de cellules visées
+            rows_set, cols_set = set(rows), set(cols)
+            return [(r, c) for (r, c) in self._cells if r in rows_set and c in cols_set]
+        return [(r, c) for r in rows for c in cols if (r, c) in self._cells]
+
+    # ---------- Accès par cellule (traitements vectorisés) ----------
+
+    def _array(self, cell: Tuple[int, int]) -> np.ndarray:
+        arr = self._arrays.get(cell)
+        if arr is None:
+            arr = np.array(
+                [(vid, lat, lon, np.nan if rate is None else rate) for vid, lat, lon, rate in self._cells[cell].values()],
+                dtype=float,
+            )
+            self._arrays[cell] = arr
+        return arr
+
+    def cell_key(self, lat: float, lon: float) -> Tuple[int, int]:
+        return self._cell(lat, lon)
+
+    def snapshot(self) -> Dict[Tuple[int, int], np.ndarray]:
+        """Copie des cellules en tableaux (n, 4) : id, lat, lon, success_rate (NaN = inconnu)."""
+        with self._lock:
+            # tableaux jamais modifiés en place : partage sans copie
+            return {cell: self._array(cell) for cell in self._cells}
+
+    def cells_near_cell(self, cell: Tuple[int, int], radius_km: float) -> List[Tuple[int, int]]:
+        """
+        Cellules occupées pouvant contenir un validateur à moins de radius_km
+        d'un point QUELCONQUE de cell (rayon élargi de la demi-diagonale).
+        """
+        row, col = cell
+        lat = (row + 0.5) * self.cell_deg
+        lon = (col + 0.5) * self.cell_deg - 180.0
+        half_diag_km = haversine_km(0.0, 0.0, self.cell_deg / 2, self.cell_deg / 2)
+        with self._lock:
+            return self._candidate_cells(lat, lon, radius_km + half_diag_km)
+
+    def top_k(self, lat: float, lon: float, max_radius_km: float, k: int) -> List[Tuple[float, int]]:
+        """
+        Les k meilleurs (score, validator_id) dans le rayon, score identique à
+        la sélection historique : 0.6 * success_rate + 0.4 * proximité.
+        Égalités départagées par id croissant (ordre du scan SQL).
+        """
+        with self._lock:
+            cells = self._candidate_cells(lat, lon, max_radius_km)
+            if not cells:
+                return []
+            table = np.concatenate([self._array(cell) for cell in cells])
+        dist = haversine_km_batch(lat, lon, table[:, 1], table[:, 2])
+        score = validator_scores(dist, table[:, 3], max_radius_km)
+        inside = np.flatnonzero(np.isfinite(score))
+        if len(inside) > k:
+            # présélection des k meilleurs scores (égalités au seuil incluses)
+            kth = np.partition(score[inside], len(inside) - k)[len(inside) - k]
+            inside = inside[score[inside] >= kth]
+        ids = table[inside, 0]
+        order = np.lexsort((ids, -score[inside]))[:k]
+        return [(float(score[inside[i]]), int(ids[i])) for i in order]
 
 
-def haversine_km(lat1, lon1, lat2, lon2) -> float:
-    # rayon Terre en km
-    R = 6371.0
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    return R * c
+validator_index = ValidatorGridIndex()
 
 
 def select_validators_for_project(
@@ -23,18 +225,14 @@ def select_validators_for_project(
     max_radius_km: float = 50.0,
     k: int = 3,
 ) -> List[Validator]:
-    candidates = db.query(Validator).filter(Validator.slashed == False).all()
-
-    scored = []
-    for val in candidates:
-        if val.latitude is None or val.longitude is None:
-            continue
-        dist = haversine_km(project_lat, project_lon, val.latitude, val.longitude)
-        if dist > max_radius_km:
-            continue
-        success_rate = val.success_rate or 0.5
-        score = 0.6 * success_rate + 0.4 * max(0.0, 1.0 - dist / max_radius_km)
-        scored.append((score, val))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [val for _, val in scored[:k]]
\ No newline at end of file
+    # index spatial en mémoire (cellules proches seulement), puis chargement
+    # des k validateurs retenus par clé primaire
+    validator_index.sync(db)
+    best = validator_index.top_k(project_lat, project_lon, max_radius_km, k)
+    if not best:
+        return []
+    by_id = {
+        v.id: v
+        for v in db.query(Validator).filter(Validator.id.in_([vid for _, vid in best]))
+    }
+    return [by_id[vid] for _, vid in best if vid in by_id]
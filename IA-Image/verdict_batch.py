@@ -0,0 +1,226 @@
+# verdict_batch.py
+"""
+Verdicts de fin de mois en lot (POST /verdicts/batch).
+
+Enchaîner des centaines de POST /projects/{id}/verdict répète par projet le
+chargement des agrégats, l'appel à l'IA vision et la soumission des
+escrows. Ici, par paquet de VERDICT_BATCH_CHUNK projets :
+  0. bail pris sur les projets du paquet (comme deadline_sweeper) : ceux
+     tenus par le sweeper ou un autre verdict sont sautés
+  1. projets, agrégats d'evidences et journal de réputation chargés par
+     requêtes groupées (trust_optimizer.decide_project_verdicts)
+  2. evidences non scorées de tout le paquet passées en un seul lot au pool
+     IA vision (vision_guard), avec une échéance proportionnelle au nombre
+     d'images en attente ; un projet dont des images n'ont pas été scorées
+     à temps n'est ni tranché ni réglé (reporté)
+  3. donations et pools LOCKED du paquet en 2 requêtes, finish / cancel
+     soumis en un seul lot pipeliné (settlement.settle_jobs)
+La progression est diffusée en NDJSON, un objet par ligne :
+  {"event": "start", "projects": n}
+  {"event": "skipped", "project_ids": [...], "detail": ...}  (bail tenu ailleurs)
+  {"event": "deferred", "project_ids": [...], "detail": ...}  (IA vision incomplète)
+  {"event": "verdict", "project_id": ..., "verdict": {...}}
+  {"event": "error", "project_ids": [...], "detail": ...}  (paquet annulé)
+  {"event": "settle_error", "project_ids": [...], "detail": ...}  (verdicts commités)
+  {"event": "progress", "done": k, "projects": n, "escrows": {...}}
+  {"event": "done", "projects": n, "success": s, "failure": f, "errors": e,
+   "skipped": k, "deferred": d, "escrows": {...}}
+Un paquet en erreur est annulé (rollback) sans arrêter les suivants. Un
+échec de règlement ne défait pas les verdicts : les escrows restent LOCKED
+et seront réglés par deadline_sweeper.
+"""
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from deadline_sweeper import claim_projects, lease_owner, release_projects
+from evidence_aggregates import counted_evidence
+from models import (
+    Donation,
+    DonationStatus,
+    Evidence,
+    PooledEscrow,
+    PoolStatus,
+    Project,
+    ProjectStatus,
+    VerdictBatchRequest,
+)
+from settings import settings
+from settlement import build_settlement_jobs, settle_jobs
+from trust_optimizer import decide_project_verdicts
+from tx_pipeline import TxJob
+
+# filtre par défaut : projets sans verdict
+_UNDECIDED = (ProjectStatus.OPEN, ProjectStatus.FUNDED, ProjectStatus.IN_PROGRESS)
+
+
+def resolve_project_ids(db: Session, req: VerdictBatchRequest) -> List[int]:
+    """Projets visés par la requête (une requête), par id croissant."""
+    q = db.query(Project.id)
+    if req.project_ids is not None:
+        q = q.filter(Project.id.in_(req.project_ids))
+        if req.statuses is not None:
+            q = q.filter(Project.status.in_(req.statuses))
+    else:
+        q = q.filter(Project.status.in_(req.statuses or _UNDECIDED))
+    if req.deadline_before is not None:
+        q = q.filter(Project.deadline < req.deadline_before)
+    limit = min(req.limit or settings.VERDICT_BATCH_MAX, settings.VERDICT_BATCH_MAX)
+    return [pid for (pid,) in q.order_by(Project.id).limit(limit)]
+
+
+def _chunk_budget(db: Session, project_ids: List[int]) -> float:
+    """
+    Budget IA vision du paquet : celui d'un verdict, plus le temps de passer
+    toutes ses images en attente sur le pool (chacune au pire jusqu'à son
+    timeout).
+    """
+    pending = (
+        db.query(Evidence.id)
+        .filter(
+            Evidence.project_id.in_(project_ids),
+            Evidence.cv_score.is_(None),
+            counted_evidence(),
+        )
+        .count()
+    )
+    rounds = math.ceil(pending / settings.VISION_WORKERS)
+    return settings.VERDICT_DEADLINE_S + rounds * settings.VISION_ITEM_TIMEOUT_S
+
+
+def _settlement_jobs(
+    db: Session,
+    wallet,
+    decisions: Dict[int, str],
+    now: datetime,
+) -> List[TxJob]:
+    ids = list(decisions)
+    donations = (
+        db.query(Donation)
+        .filter(
+            Donation.project_id.in_(ids),
+            Donation.status == DonationStatus.LOCKED,
+            Donation.pool_id.is_(None),
+        )
+        .all()
+    )
+    pools = (
+        db.query(PooledEscrow)
+        .filter(
+            PooledEscrow.project_id.in_(ids),
+            PooledEscrow.status == PoolStatus.LOCKED,
+        )
+        .all()
+    )
+    jobs: List[TxJob] = []
+    for d in donations + pools:
+        jobs.extend(build_settlement_jobs(wallet, [d], decisions[d.project_id], now))
+    return jobs
+
+
+def run_verdict_batch(
+    project_ids: List[int],
+    wallet,
+    settle: bool = True,
+    chunk_size: int = settings.VERDICT_BATCH_CHUNK,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Iterator[dict]:
+    """
+    Générateur d'événements (voir le docstring du module). Ouvre sa propre
+    session : il est consommé par la réponse streamée, après la fermeture
+    de celle de la requête.
+    """
+    totals = {"SUCCESS": 0, "FAILURE": 0}
+    escrows = {"submitted": 0, "settled": 0, "failed": 0}
+    errors = skipped = deferred = 0
+    owner = lease_owner("batch")
+    yield {"event": "start", "projects": len(project_ids)}
+
+    db = session_factory()
+    try:
+        for lo in range(0, len(project_ids), chunk_size):
+            chunk = project_ids[lo:lo + chunk_size]
+            claimed: List[int] = []
+            try:
+                try:
+                    budget = _chunk_budget(db, chunk)
+                    now = datetime.utcnow()
+                    until = now + timedelta(seconds=settings.DEADLINE_SWEEP_LEASE_S + budget)
+                    projects = claim_projects(db, chunk, owner, until, now)
+                except Exception as e:
+                    db.rollback()
+                    errors += len(chunk)
+                    print(f"[VERDICT_BATCH] chunk {chunk[0]}..{chunk[-1]} lease failed: {e}")
+                    yield {"event": "error", "project_ids": chunk, "detail": str(e)}
+                    continue
+                claimed = [p.id for p in projects]
+                held = sorted(set(chunk) - set(claimed))
+                if held:
+                    skipped += len(held)
+                    yield {"event": "skipped", "project_ids": held, "detail": "project lease held elsewhere"}
+
+                verdicts: Dict[int, dict] = {}
+                if projects:
+                    try:
+                        verdicts = decide_project_verdicts(
+                            db, projects, deadline=time.monotonic() + budget, finalize_degraded=False
+                        )
+                    except Exception as e:
+                        db.rollback()
+                        errors += len(claimed)
+                        print(f"[VERDICT_BATCH] chunk {chunk[0]}..{chunk[-1]} failed: {e}")
+                        yield {"event": "error", "project_ids": claimed, "detail": str(e)}
+                        continue
+
+                late = [pid for pid in claimed if pid not in verdicts]
+                if late:
+                    deferred += len(late)
+                    yield {"event": "deferred", "project_ids": late, "detail": "vision scoring incomplete"}
+                for pid, verdict in verdicts.items():
+                    totals[verdict["decision"]] += 1
+                    yield {"event": "verdict", "project_id": pid, "verdict": verdict}
+
+                summary: Optional[Dict[str, int]] = None
+                if settle and verdicts:
+                    try:
+                        decisions = {pid: v["decision"] for pid, v in verdicts.items()}
+                        jobs = _settlement_jobs(db, wallet, decisions, datetime.utcnow())
+                        if jobs:
+                            summary = settle_jobs(db, wallet, jobs)
+                    except Exception as e:
+                        db.rollback()
+                        print(f"[VERDICT_BATCH] settlement {chunk[0]}..{chunk[-1]} failed: {e}")
+                        yield {"event": "settle_error", "project_ids": list(verdicts), "detail": str(e)}
+                if summary:
+                    for k in escrows:
+                        escrows[k] += summary[k]
+                yield {
+                    "event": "progress",
+                    "done": min(lo + chunk_size, len(project_ids)),
+                    "projects": len(project_ids),
+                    "escrows": summary or {"submitted": 0, "settled": 0, "failed": 0},
+                }
+            finally:
+                release_projects(db, claimed, owner)
+    finally:
+        db.close()
+
+    print(
+        f"[VERDICT_BATCH] {len(project_ids)} project(s): {totals['SUCCESS']} success, "
+        f"{totals['FAILURE']} failure, {errors} error(s), {skipped} skipped, "
+        f"{deferred} deferred, escrows {escrows}"
+    )
+    yield {
+        "event": "done",
+        "projects": len(project_ids),
+        "success": totals["SUCCESS"],
+        "failure": totals["FAILURE"],
+        "errors": errors,
+        "skipped": skipped,
+        "deferred": deferred,
+        "escrows": escrows,
+    }
@@ -0,0 +1,237 @@
+# verdict_simulator.py
+"""
+Simulateur « what-if » du verdict, en lecture seule.
+
+Rejouer decide_project_verdict projet par projet est lent (ORM, IA vision)
+et écrit en base (statuts, réputation, ancrage). Ici :
+  1. une requête charge pour tous les projets les composantes déjà stockées
+     (project_evidence_stats : moyennes GPS / réputation / CV, nombre
+     d'evidences) et le volume des donations, dans des tableaux NumPy
+  2. chaque configuration (poids GPS / réputation / CV, poids evidence vs
+     ONG, seuil, evidences minimum) est évaluée pour tous les projets en une
+     opération matricielle, par paquets de configurations (mémoire bornée)
+  3. par configuration : succès, bascules par rapport à la configuration
+     actuelle (settings.VERDICT_*), volumes libérés / remboursés (XRP)
+Aucune écriture : la session est seulement lue puis fermée.
+
+Même formule que trust_optimizer (compute_components_from_stats puis
+decide_project_verdict), à un détail près : le score ONG est celui d'un
+premier verdict (0.7 par défaut), le 0.3 de compute_ong_trust_score venant
+du statut FAILED posé par le verdict lui-même.
+
+    python verdict_simulator.py --threshold 0.6 0.65 0.7 0.75 \\
+        --gps-weight 0.3 0.4 0.5 --rep-weight 0.2 0.3 --evidence-weight 0.5 0.6 0.7 \\
+        --min-evidences 1 2 3 [--top 20] [--sort flips] [--csv configs.csv]
+"""
+import argparse
+import csv
+import time
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Donation, DonationStatus, Project, ProjectEvidenceStats
+from settings import settings
+
+# éléments max d'une matrice projets x configurations (float64)
+_MAX_CELLS = 4_000_000
+
+_PARAMS = ("gps_weight", "rep_weight", "cv_weight", "evidence_weight", "threshold", "min_evidences")
+
+
+@dataclass
+class VerdictInputs:
+    project_ids: np.ndarray
+    gps: np.ndarray
+    rep: np.ndarray
+    cv: np.ndarray
+    evidence_count: np.ndarray
+    volume_xrp: np.ndarray  # donations non échouées
+
+
+def load_inputs(db: Session) -> VerdictInputs:
+    """Composantes stockées de tous les projets (une requête)."""
+    volumes = (
+        db.query(Donation.project_id, func.sum(Donation.amount_xrp).label("volume"))
+        .filter(Donation.status != DonationStatus.FAILED)
+        .group_by(Donation.project_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            Project.id,
+            func.coalesce(ProjectEvidenceStats.evidence_count, 0),
+            func.coalesce(ProjectEvidenceStats.gps_score_sum, 0.0),
+            func.coalesce(ProjectEvidenceStats.reputation_sum, 0.0),
+            func.coalesce(ProjectEvidenceStats.cv_score_sum, 0.0),
+            func.coalesce(ProjectEvidenceStats.cv_scored_count, 0),
+            func.coalesce(volumes.c.volume, 0.0),
+        )
+        .outerjoin(ProjectEvidenceStats, ProjectEvidenceStats.project_id == Project.id)
+        .outerjoin(volumes, volumes.c.project_id == Project.id)
+        .order_by(Project.id)
+        .all()
+    )
+    table = np.array(rows, dtype=np.float64).reshape(-1, 7)
+    ids, n, gps_sum, rep_sum, cv_sum, cv_n, volume = table.T
+
+    # compute_components_from_stats
+    safe_n = np.maximum(n, 1)
+    cv = np.where(cv_n > 0, cv_sum / np.maximum(cv_n, 1), 0.5)
+    return VerdictInputs(
+        project_ids=ids.astype(np.int64),
+        gps=gps_sum / safe_n,
+        rep=rep_sum / safe_n,
+        cv=cv,
+        evidence_count=n.astype(np.int64),
+        volume_xrp=volume,
+    )
+
+
+def current_config() -> Dict[str, np.ndarray]:
+    return {
+        "gps_weight": np.array([settings.VERDICT_GPS_WEIGHT]),
+        "rep_weight": np.array([settings.VERDICT_REP_WEIGHT]),
+        "cv_weight": np.array([settings.VERDICT_CV_WEIGHT]),
+        "evidence_weight": np.array([settings.VERDICT_EVIDENCE_WEIGHT]),
+        "threshold": np.array([settings.VERDICT_SUCCESS_THRESHOLD]),
+        "min_evidences": np.array([settings.VERDICT_MIN_EVIDENCES]),
+    }
+
+
+def config_grid(
+    gps_weights: Sequence[float],
+    rep_weights: Sequence[float],
+    evidence_weights: Sequence[float],
+    thresholds: Sequence[float],
+    min_evidences: Sequence[int],
+) -> Dict[str, np.ndarray]:
+    """Produit cartésien ; poids CV = 1 - GPS - réputation (combinaisons < 0 écartées)."""
+    g, r, e, t, m = (
+        a.ravel()
+        for a in np.meshgrid(gps_weights, rep_weights, evidence_weights, thresholds, min_evidences, indexing="ij")
+    )
+    c = 1.0 - g - r
+    keep = c >= -1e-9
+    return {
+        "gps_weight": g[keep],
+        "rep_weight": r[keep],
+        "cv_weight": np.maximum(c[keep], 0.0),
+        "evidence_weight": e[keep],
+        "threshold": t[keep],
+        "min_evidences": m[keep].astype(np.int64),
+    }
+
+
+def decide(inputs: VerdictInputs, configs: Dict[str, np.ndarray], ong_score: float) -> np.ndarray:
+    """Matrice booléenne (projets, configurations) : True = SUCCESS."""
+    evidence = (
+        inputs.gps[:, None] * configs["gps_weight"]
+        + inputs.rep[:, None] * configs["rep_weight"]
+        + inputs.cv[:, None] * configs["cv_weight"]
+    )
+    n = inputs.evidence_count[:, None]
+    evidence = np.where(n > 0, evidence, 0.0)
+    w = configs["evidence_weight"]
+    combined = w * evidence + (1 - w) * ong_score
+    return (combined >= configs["threshold"]) & (n >= configs["min_evidences"])
+
+
+def simulate(
+    inputs: VerdictInputs,
+    configs: Dict[str, np.ndarray],
+    ong_score: float = 0.7,
+) -> Dict[str, np.ndarray]:
+    """
+    Indicateurs par configuration : successes, flips_to_success,
+    flips_to_failure (vs configuration actuelle), released_xrp, refunded_xrp.
+    """
+    n_configs = len(configs["threshold"])
+    n_projects = len(inputs.project_ids)
+    baseline = decide(inputs, current_config(), ong_score)[:, 0]
+    base_f = baseline.astype(np.float64)
+    total_volume = inputs.volume_xrp.sum()
+
+    out = {
+        "successes": np.zeros(n_configs, dtype=np.int64),
+        "flips_to_success": np.zeros(n_configs, dtype=np.int64),
+        "flips_to_failure": np.zeros(n_configs, dtype=np.int64),
+        "released_xrp": np.zeros(n_configs),
+        "refunded_xrp": np.zeros(n_configs),
+    }
+    chunk = max(1, _MAX_CELLS // max(1, n_projects))
+    for lo in range(0, n_configs, chunk):
+        part = {k: v[lo:lo + chunk] for k, v in configs.items()}
+        success = decide(inputs, part, ong_score).astype(np.float64)
+        successes = success.sum(axis=0)
+        kept = base_f @ success  # SUCCESS dans les deux
+        released = inputs.volume_xrp @ success
+        hi = lo + success.shape[1]
+        out["successes"][lo:hi] = successes
+        out["flips_to_success"][lo:hi] = successes - kept
+        out["flips_to_failure"][lo:hi] = base_f.sum() - kept
+        out["released_xrp"][lo:hi] = released
+        out["refunded_xrp"][lo:hi] = total_volume - released
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation what-if des paramètres du verdict (lecture seule)")
+    parser.add_argument("--gps-weight", type=float, nargs="+", default=[settings.VERDICT_GPS_WEIGHT])
+    parser.add_argument("--rep-weight", type=float, nargs="+", default=[settings.VERDICT_REP_WEIGHT])
+    parser.add_argument("--evidence-weight", type=float, nargs="+", default=[settings.VERDICT_EVIDENCE_WEIGHT])
+    parser.add_argument("--threshold", type=float, nargs="+", default=[settings.VERDICT_SUCCESS_THRESHOLD])
+    parser.add_argument("--min-evidences", type=int, nargs="+", default=[settings.VERDICT_MIN_EVIDENCES])
+    parser.add_argument("--ong-score", type=float, default=0.7)
+    parser.add_argument("--sort", choices=["flips", "released", "refunded", "successes"], default="flips")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--csv", help="écrit toutes les configurations dans ce fichier")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        inputs = load_inputs(db)
+    finally:
+        db.close()
+    t_load = time.perf_counter() - t0
+
+    configs = config_grid(args.gps_weight, args.rep_weight, args.evidence_weight, args.threshold, args.min_evidences)
+    t0 = time.perf_counter()
+    results = simulate(inputs, configs, args.ong_score)
+    t_sim = time.perf_counter() - t0
+    print(
+        f"[SIMULATOR] {len(inputs.project_ids)} project(s), {len(configs['threshold'])} configuration(s), "
+        f"load {t_load:.2f} s, simulation {t_sim:.2f} s"
+    )
+
+    flips = results["flips_to_success"] + results["flips_to_failure"]
+    key = {
+        "flips": flips,
+        "released": -results["released_xrp"],
+        "refunded": -results["refunded_xrp"],
+        "successes": -results["successes"],
+    }[args.sort]
+    for i in np.argsort(key, kind="stable")[: args.top]:
+        params = " ".join(f"{p}={configs[p][i]:g}" for p in _PARAMS)
+        print(
+            f"[SIMULATOR] {params} | success={results['successes'][i]} "
+            f"+{results['flips_to_success'][i]}/-{results['flips_to_failure'][i]} "
+            f"released={results['released_xrp'][i]:.2f} refunded={results['refunded_xrp'][i]:.2f}"
+        )
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(list(_PARAMS) + list(results))
+            for i in range(len(configs["threshold"])):
+                writer.writerow([configs[p][i] for p in _PARAMS] + [results[k][i] for k in results])
+        print(f"[SIMULATOR] written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
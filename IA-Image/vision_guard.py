@@ -0,0 +1,286 @@
+# vision_guard.py
+"""
+Scoring IA vision sous budget de latence.
+
+Une image lente ou bloquée (téléchargement distant, CLIP figé) ne doit pas
+tenir le verdict sans borne :
+  - les images sont scorées en parallèle (pool de VISION_WORKERS threads)
+  - chaque image a VISION_ITEM_TIMEOUT_S à partir de son démarrage, et le
+    lot s'arrête à l'échéance globale du verdict ; une image en retard est
+    abandonnée (le thread finit en arrière-plan, son score est mis en cache)
+  - disjoncteur : après VISION_BREAKER_FAILURES échecs / timeouts
+    consécutifs, plus aucun appel pendant VISION_BREAKER_RESET_S, puis un
+    seul appel d'essai. Il s'ouvre aussi dès que le pool est saturé : tous
+    ses threads tenus par des appels abandonnés, une nouvelle image ne
+    démarrerait jamais
+  - repli : score déjà calculé pour la même image (cache mémoire), sinon
+    l'evidence reste non scorée (retentée au prochain verdict) et le verdict
+    utilise la moyenne des CV déjà scorés (0.5 sans aucun)
+ScoreBatch indique ce qui a été dégradé ; le verdict le publie.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+from settings import settings
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = settings.VISION_BREAKER_FAILURES,
+        reset_s: float = settings.VISION_BREAKER_RESET_S,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_s:
+                return False
+            # semi-ouvert : un seul appel d'essai
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def trip(self) -> None:
+        """Ouvre le circuit sans attendre le seuil d'échecs."""
+        with self._lock:
+            if self._opened_at is None or self._probing:
+                print("[VISION_GUARD] circuit open: vision pool saturated")
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    print(f"[VISION_GUARD] circuit open after {self._failures} failure(s)")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+@dataclass
+class ScoreBatch:
+    scores: Dict[int, float] = field(default_factory=dict)  # indice -> score
+    cached_ids: Set[int] = field(default_factory=set)  # repris du cache
+    # indice -> "timed_out" | "failed" | "skipped" (disjoncteur ouvert ou
+    # échéance atteinte avant l'appel)
+    unscored: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def scored(self) -> int:
+        return len(self.scores)
+
+    @property
+    def cached(self) -> int:
+        return len(self.cached_ids)
+
+    @property
+    def timed_out(self) -> int:
+        return sum(1 for r in self.unscored.values() if r == "timed_out")
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.unscored.values() if r == "failed")
+
+    @property
+    def skipped(self) -> int:
+        return sum(1 for r in self.unscored.values() if r == "skipped")
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.unscored)
+
+    def subset(self, indices: List[int]) -> "ScoreBatch":
+        """Résultat des seuls `indices`, renumérotés 0..n-1 (lot multi-projets)."""
+        local = {i: n for n, i in enumerate(indices)}
+        return ScoreBatch(
+            scores={local[i]: v for i, v in self.scores.items() if i in local},
+            cached_ids={local[i] for i in self.cached_ids if i in local},
+            unscored={local[i]: r for i, r in self.unscored.items() if i in local},
+        )
+
+    def summary(self) -> dict:
+        return {
+            "scored": self.scored,
+            "cached": self.cached,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+
+
+class GuardedScorer:
+    def __init__(
+        self,
+        workers: int = settings.VISION_WORKERS,
+        item_timeout_s: float = settings.VISION_ITEM_TIMEOUT_S,
+        cache_size: int = settings.VISION_CACHE_SIZE,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.workers = workers
+        self.item_timeout_s = item_timeout_s
+        self.cache_size = cache_size
+        self.breaker = breaker or CircuitBreaker()
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # appels abandonnés (timeout) qui tiennent encore un thread du pool
+        self._hung: Set[Future] = set()
+
+    # ---------- Cache ----------
+
+    def _cached(self, url: str) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(url)
+            if score is not None:
+                self._cache.move_to_end(url)
+            return score
+
+    def _remember(self, url: str, score: float) -> None:
+        with self._lock:
+            self._cache[url] = score
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ---------- Appels ----------
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="vision")
+        return self._pool
+
+    def _abandon(self, future: Future) -> None:
+        with self._lock:
+            self._hung.add(future)
+        future.add_done_callback(self._release)
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._hung.discard(future)
+
+    @property
+    def saturated(self) -> bool:
+        with self._lock:
+            return len(self._hung) >= self.workers
+
+    def _call(self, scorer: Callable[[str], float], url: str, started_at: List[float]) -> float:
+        started_at.append(time.monotonic())
+        score = float(scorer(url))
+        # même abandonné par le verdict : servira au prochain
+        self._remember(url, score)
+        return score
+
+    def score_many(
+        self,
+        urls: List[str],
+        scorer: Callable[[str], float],
+        deadline: Optional[float] = None,
+    ) -> ScoreBatch:
+        """
+        Scores des images `urls` avant l'échéance `deadline` (time.monotonic(),
+        défaut : VERDICT_DEADLINE_S). Les indices absents de
+        ScoreBatch.scores restent non scorés.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + settings.VERDICT_DEADLINE_S
+        batch = ScoreBatch()
+        if self.saturated:
+            self.breaker.trip()
+        # future -> [instant de démarrage] (rempli par le thread du pool)
+        started: Dict[Future, List[float]] = {}
+        running: Dict[Future, int] = {}
+
+        for i, url in enumerate(urls):
+            score = self._cached(url)
+            if score is not None:
+                batch.scores[i] = score
+                batch.cached_ids.add(i)
+                continue
+            if not self.breaker.allow():
+                batch.unscored[i] = "skipped"
+                continue
+            started_at: List[float] = []
+            future = self._executor().submit(self._call, scorer, url, started_at)
+            started[future] = started_at
+            running[future] = i
+
+        while running:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            # prochaine échéance : fin du budget ou timeout d'une image (une
+            # image pas encore démarrée n'expire pas avant now + timeout)
+            horizon = min(
+                [deadline]
+                + [(started[f][0] if started[f] else now) + self.item_timeout_s for f in running]
+            )
+            timeout = max(0.0, horizon - now)
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                i = running.pop(future)
+                try:
+                    batch.scores[i] = future.result()
+                    self.breaker.record_success()
+                except Exception as e:
+                    print(f"[VISION_GUARD] Error analyzing image {urls[i]}: {e}")
+                    batch.unscored[i] = "failed"
+                    self.breaker.record_failure()
+
+            now = time.monotonic()
+            for future in [f for f in running if started[f] and now - started[f][0] >= self.item_timeout_s]:
+                i = running.pop(future)
+                print(f"[VISION_GUARD] Timeout analyzing image {urls[i]}")
+                batch.unscored[i] = "timed_out"
+                self.breaker.record_failure()
+                self._abandon(future)
+
+            if self.saturated:
+                self.breaker.trip()
+            if self.breaker.is_open:
+                # backend dégradé : les images encore en file ne partent pas
+                for future in [f for f in running if f.cancel()]:
+                    batch.unscored[running.pop(future)] = "skipped"
+
+        # échéance globale : ce qui reste (en cours ou en file) est abandonné
+        for future, i in running.items():
+            if future.cancel() or not started[future]:
+                batch.unscored[i] = "skipped"
+            else:
+                batch.unscored[i] = "timed_out"
+                self.breaker.record_failure()
+                self._abandon(future)
+        return batch
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            # les appels figés ne sont pas attendus
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            with self._lock:
+                self._hung.clear()
+
+
+vision_guard = GuardedScorer()
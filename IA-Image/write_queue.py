@@ -0,0 +1,184 @@
+# write_queue.py
+"""
+File d'écriture "group commit".
+
+Chaque requête HTTP (evidence, donation) dépose une opération d'écriture dans
+la file ; un thread unique les regroupe et les exécute dans UNE seule
+transaction toutes les WRITE_QUEUE_MAX_DELAY_MS millisecondes ou dès que
+WRITE_QUEUE_MAX_BATCH opérations sont en attente.
+
+La requête n'est acquittée qu'une fois le commit du batch effectué
+(donc durable) : on paie un fsync par batch au lieu d'un par requête.
+
+Les requêtes SQL d'une opération sont comptées pour la requête HTTP qui
+l'a déposée (db_metrics), pas comme du travail de fond.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, sessionmaker
+
+import db_metrics
+from database import SessionLocal
+from settings import settings
+
+# Une opération reçoit la session du batch et renvoie son résultat
+WriteOp = Callable[[Session], Any]
+
+_STOP = object()
+
+# opération, son Future, stats SQL de la requête qui l'a déposée
+_Item = Tuple[WriteOp, Future, Optional[db_metrics.RequestQueryStats]]
+
+
+class GroupCommitQueue:
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        max_batch: int = 100,
+        max_delay_ms: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # petites stats pour le debug / monitoring
+        self.batches = 0
+        self.ops = 0
+
+    # ---------- API publique ----------
+
+    def submit(self, op: WriteOp) -> Future:
+        """
+        Dépose une opération dans la file et renvoie un Future résolu
+        une fois le batch qui la contient commité.
+        """
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((op, fut, db_metrics.current()))
+        return fut
+
+    def run(self, op: WriteOp, timeout: Optional[float] = None) -> Any:
+        """Version bloquante : attend que l'opération soit durable."""
+        return self.submit(op).result(timeout=timeout)
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    # ---------- Thread de flush ----------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="group-commit", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> Tuple[List[_Item], bool]:
+        """Bloque sur le premier élément, puis remplit le batch jusqu'au délai."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        stopping = False
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            batch.append(item)
+        return batch, stopping
+
+    def _loop(self) -> None:
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: List[_Item]) -> None:
+        # expire_on_commit=False : les objets renvoyés restent lisibles
+        # par les requêtes après la fermeture de la session
+        db: Session = self.session_factory(expire_on_commit=False)
+        try:
+            results = []
+            for op, _, stats in batch:
+                with db_metrics.attributed_to(stats):
+                    results.append(op(db))
+                    # SQL de l'opération émis ici plutôt qu'au commit commun
+                    db.flush()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.close()
+            print(f"[WRITE_QUEUE] Batch of {len(batch)} failed ({e}), retrying one by one")
+            self._flush_one_by_one(batch)
+            return
+        db.close()
+
+        self.batches += 1
+        self.ops += len(batch)
+        for (_, fut, _), res in zip(batch, results):
+            fut.set_result(res)
+
+    def _flush_one_by_one(self, batch: List[_Item]) -> None:
+        # Une opération fautive ne doit pas faire échouer tout le batch
+        for op, fut, stats in batch:
+            db: Session = self.session_factory(expire_on_commit=False)
+            try:
+                with db_metrics.attributed_to(stats):
+                    res = op(db)
+                    db.commit()
+            except Exception as e:
+                db.rollback()
+                fut.set_exception(e)
+            else:
+                self.batches += 1
+                self.ops += 1
+                fut.set_result(res)
+            finally:
+                db.close()
+
+
+write_queue = GroupCommitQueue(
+    SessionLocal,
+    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+    max_delay_ms=settings.WRITE_QUEUE_MAX_DELAY_MS,
+)
+
+
+def run_write(db: Session, op: WriteOp) -> Any:
+    """
+    Exécute une opération d'écriture :
+      - via la file group-commit si WRITE_QUEUE_ENABLED
+      - sinon directement dans la session de la requête (un commit par requête)
+    """
+    if settings.WRITE_QUEUE_ENABLED:
+        return write_queue.run(op)
+    res = op(db)
+    db.commit()
+    return res
+
@@ -0,0 +1,319 @@
+# xrpl_async.py
+"""
+Accès XRPL partagé, asynchrone, à connexions persistantes.
+
+XRPLConnectionPool :
+  - N connexions websocket ouvertes une fois et réutilisées (round-robin)
+    au lieu d'un aller-retour HTTP neuf par appel (fee, account_info,
+    submit, polling tx)
+  - une connexion dédiée abonnée au flux "ledger" et aux transactions du
+    compte plateforme : la validation d'une tx est notifiée par le flux
+    au lieu d'être pollée
+  - implémente l'interface Client de xrpl-py (_request_impl) : toutes les
+    fonctions xrpl.asyncio (autofill, submit, ...) l'acceptent
+  - tourne dans son propre event loop (thread dédié) ; le code synchrone
+    (endpoints FastAPI, TxPipeline, worker d'outbox) passe par
+    request() / run() qui ont la même forme qu'un JsonRpcClient
+  - attentes bornées : sans notification du flux pendant
+    XRPL_STREAM_CHECK_S, wait_for_tx vérifie la tx et le ledger validé
+    par requête ("expired" au-delà de LastLedgerSequence, même flux
+    coupé) et rend ("unknown", {}) après XRPL_TX_WAIT_TIMEOUT_S ; run()
+    a toujours un timeout
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import threading
+from typing import Any, AsyncIterator, Coroutine, Dict, List, Optional, Tuple
+
+from xrpl.asyncio.clients import AsyncWebsocketClient
+from xrpl.asyncio.clients.client import REQUEST_TIMEOUT, Client
+from xrpl.asyncio.transaction import autofill_and_sign, submit
+from xrpl.models.requests import Ledger, Subscribe, Tx
+from xrpl.models.requests.request import Request
+from xrpl.models.requests.subscribe import StreamParameter
+from xrpl.models.response import Response
+from xrpl.models.transactions import Transaction
+
+from settings import settings
+
+# (TransactionResult, résultat brut) ; TransactionResult = "expired" si la
+# tx n'a pas été validée avant son LastLedgerSequence, "unknown" si on n'a
+# pas pu le savoir avant le timeout
+TxOutcome = Tuple[str, dict]
+
+
+class _PooledWebsocket(AsyncWebsocketClient):
+    def drain(self) -> None:
+        # xrpl-py empile aussi chaque réponse dans la file des messages :
+        # sur une connexion longue durée utilisée seulement en requête,
+        # on la vide pour ne pas accumuler
+        messages = self._messages
+        while messages is not None and not messages.empty():
+            messages.get_nowait()
+            messages.task_done()
+
+
+class _StreamWebsocket(AsyncWebsocketClient):
+    async def messages(self, poll_s: float = 1.0) -> AsyncIterator[dict]:
+        """
+        Messages du flux tant que la connexion est ouverte. `async for` sur
+        AsyncWebsocketClient attend indéfiniment sur sa file une fois la
+        connexion coupée : ici on revérifie l'état toutes les poll_s.
+        """
+        while self.is_open():
+            try:
+                yield await asyncio.wait_for(self._messages.get(), poll_s)
+            except asyncio.TimeoutError:
+                continue
+
+
+class XRPLConnectionPool(Client):
+    def __init__(
+        self,
+        url: str,
+        size: int = 4,
+        accounts: Optional[List[str]] = None,
+        reconnect_delay: float = 2.0,
+        tx_wait_timeout: float = settings.XRPL_TX_WAIT_TIMEOUT_S,
+        stream_check_s: float = settings.XRPL_STREAM_CHECK_S,
+    ):
+        super().__init__(url)
+        self.size = size
+        self.accounts = list(accounts or [])
+        self.reconnect_delay = reconnect_delay
+        self.tx_wait_timeout = tx_wait_timeout
+        self.stream_check_s = stream_check_s
+
+        self._conns = [_PooledWebsocket(url) for _ in range(size)]
+        self._rr = itertools.cycle(self._conns)
+        self._stream: Optional[_StreamWebsocket] = None
+
+        # état alimenté par le flux "ledger"
+        self.ledger_index = 0
+        self.fee_base: Optional[int] = None
+
+        # tx_hash -> (Future, LastLedgerSequence)
+        self._tx_waiters: Dict[str, Tuple[asyncio.Future, int]] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stream_task: Optional[asyncio.Task] = None
+
+    # ---------- Cycle de vie ----------
+
+    def start(self) -> None:
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=loop.run_forever, name="xrpl-pool", daemon=True
+            )
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._open(loop), loop).result()
+            self._loop = loop
+
+    async def _open(self, loop: asyncio.AbstractEventLoop) -> None:
+        await asyncio.gather(*(c.open() for c in self._conns))
+        await self._subscribe()
+        self._stream_task = loop.create_task(self._consume_stream())
+
+    async def _subscribe(self) -> None:
+        self._stream = _StreamWebsocket(self.url)
+        await self._stream.open()
+        resp = await self._stream.request(
+            Subscribe(streams=[StreamParameter.LEDGER], accounts=self.accounts)
+        )
+        self._on_ledger(resp.result)
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+
+        async def _close():
+            if self._stream_task is not None:
+                self._stream_task.cancel()
+            conns = list(self._conns) + ([self._stream] if self._stream else [])
+            await asyncio.gather(
+                *(c.close() for c in conns if c.is_open()), return_exceptions=True
+            )
+
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+
+    # ---------- Flux ledger / transactions ----------
+
+    async def ensure_account(self, address: str) -> None:
+        """Abonne le flux aux tx d'un compte supplémentaire (ex. wallet donateur)."""
+        if address in self.accounts:
+            return
+        self.accounts.append(address)
+        if self._stream is not None and self._stream.is_open():
+            await self._stream.request(Subscribe(accounts=[address]))
+
+    def _on_ledger(self, msg: dict) -> None:
+        index = msg.get("ledger_index")
+        if index is None:
+            return
+        self.ledger_index = int(index)
+        if "fee_base" in msg:
+            self.fee_base = int(msg["fee_base"])
+
+        # tx non vues et dont la fenêtre est dépassée : définitivement perdues
+        for tx_hash, (fut, last_ledger) in list(self._tx_waiters.items()):
+            if self.ledger_index > last_ledger and not fut.done():
+                fut.set_result(("expired", {}))
+
+    def _on_transaction(self, msg: dict) -> None:
+        if not msg.get("validated"):
+            return
+        tx_hash = msg.get("hash") or msg.get("transaction", {}).get("hash")
+        waiter = self._tx_waiters.get(tx_hash)
+        if waiter is None or waiter[0].done():
+            return
+        waiter[0].set_result((msg["meta"]["TransactionResult"], msg))
+
+    async def _consume_stream(self) -> None:
+        while True:
+            try:
+                async for msg in self._stream.messages():
+                    kind = msg.get("type")
+                    if kind == "ledgerClosed":
+                        self._on_ledger(msg)
+                    elif kind == "transaction":
+                        self._on_transaction(msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[XRPL_POOL] stream error: {e}")
+
+            # connexion perdue : on se réabonne puis on revérifie les tx en
+            # attente (des validations ont pu passer pendant la coupure)
+            print(f"[XRPL_POOL] stream lost, resubscribing in {self.reconnect_delay}s")
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._subscribe()
+            except Exception as e:
+                print(f"[XRPL_POOL] resubscribe failed: {e}")
+                continue
+            for tx_hash, (_, last_ledger) in list(self._tx_waiters.items()):
+                await self._poll_tx(tx_hash, last_ledger)
+
+    async def _check_tx(self, tx_hash: str) -> None:
+        resp = await self._request_impl(Tx(transaction=tx_hash))
+        r = resp.result
+        waiter = self._tx_waiters.get(tx_hash)
+        if waiter and not waiter[0].done() and resp.is_successful() and r.get("validated"):
+            waiter[0].set_result((r["meta"]["TransactionResult"], r))
+
+    # ---------- API async ----------
+
+    async def _request_impl(
+        self, request: Request, *, timeout: float = REQUEST_TIMEOUT
+    ) -> Response:
+        conn = next(self._rr)
+        if not conn.is_open():
+            await conn.open()
+        try:
+            return await conn._request_impl(request, timeout=timeout)
+        finally:
+            conn.drain()
+
+    async def _poll_tx(self, tx_hash: str, last_ledger: int) -> None:
+        """Vérifie par requête ce que le flux aurait dû notifier."""
+        try:
+            await self._check_tx(tx_hash)
+            waiter = self._tx_waiters.get(tx_hash)
+            if waiter is None or waiter[0].done():
+                return
+            resp = await self._request_impl(Ledger(ledger_index="validated"))
+            index = resp.result.get("ledger_index")
+            if resp.is_successful() and index is not None and int(index) > last_ledger:
+                if not waiter[0].done():
+                    waiter[0].set_result(("expired", {}))
+        except Exception as e:
+            print(f"[XRPL_POOL] tx check failed for {tx_hash}: {e}")
+
+    async def wait_for_tx(
+        self,
+        tx_hash: str,
+        last_ledger: int,
+        account: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> TxOutcome:
+        """
+        Attend la validation de tx_hash via le flux. Sans notification
+        pendant stream_check_s, vérifie par requête (tx + ledger validé) ;
+        ("unknown", {}) après timeout secondes (défaut : tx_wait_timeout).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.tx_wait_timeout if timeout is None else timeout)
+        fut = loop.create_future()
+        self._tx_waiters[tx_hash] = (fut, last_ledger)
+        try:
+            if account is not None:
+                await self.ensure_account(account)
+            # la tx a pu être validée avant l'enregistrement du waiter
+            await self._poll_tx(tx_hash, last_ledger)
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    print(f"[XRPL_POOL] no outcome for {tx_hash} (ledger {self.ledger_index}, last {last_ledger})")
+                    return "unknown", {}
+                try:
+                    return await asyncio.wait_for(asyncio.shield(fut), min(self.stream_check_s, remaining))
+                except asyncio.TimeoutError:
+                    # flux muet ou coupé : on ne dépend pas de lui pour conclure
+                    await self._poll_tx(tx_hash, last_ledger)
+        finally:
+            self._tx_waiters.pop(tx_hash, None)
+
+    async def submit_and_wait_async(self, tx: Transaction, wallet) -> dict:
+        signed = await autofill_and_sign(tx, self, wallet, check_fee=True)
+        prelim = (await submit(signed, self)).result
+        engine_result = prelim.get("engine_result", "")
+        if engine_result.startswith(("tem", "tef", "tel")):
+            return {**prelim, "validated": False}
+        result, raw = await self.wait_for_tx(
+            signed.get_hash(), signed.last_ledger_sequence, wallet.address
+        )
+        return {**raw, "engine_result": result}
+
+    # ---------- Pont synchrone ----------
+
+    def run(self, coro: Coroutine, timeout: float = REQUEST_TIMEOUT) -> Any:
+        """Exécute coro dans le loop du pool ; annulée au-delà de timeout secondes."""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def request(self, request: Request) -> Response:
+        """Même forme que JsonRpcClient.request (utilisé par TxPipeline)."""
+        return self.run(self._request_impl(request), REQUEST_TIMEOUT + 1.0)
+
+    def wait_validated(
+        self, tx_hash: str, last_ledger: int, account: Optional[str] = None
+    ) -> TxOutcome:
+        # wait_for_tx se borne lui-même ; marge pour une requête en cours
+        return self.run(
+            self.wait_for_tx(tx_hash, last_ledger, account),
+            self.tx_wait_timeout + REQUEST_TIMEOUT,
+        )
+
+    def submit_and_wait(self, tx: Transaction, wallet) -> dict:
+        """Équivalent de xrpl.transaction.submit_and_wait (autofill par le serveur)."""
+        return self.run(
+            self.submit_and_wait_async(tx, wallet),
+            self.tx_wait_timeout + 4 * REQUEST_TIMEOUT,
+        )
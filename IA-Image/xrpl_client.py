@@ -1,7 +1,8 @@
 # xrpl_client.py
-from xrpl.clients import JsonRpcClient
 from xrpl.wallet import Wallet
 from settings import settings
+from xrpl_async import XRPLConnectionPool
+from xrpl_sim import SimulatedLedger
 
 # En mode mock, on n'utilise PAS de vrai wallet XRPL
 if settings.XRPL_MOCK:
@@ -13,7 +14,30 @@ if settings.XRPL_MOCK:
     client = None
     # adresse factice juste pour identifier la plateforme / donateur
     platform_wallet = DummyWallet("rMOCKPLATFORMADDRESS123456789")
+elif settings.XRPL_SIMULATOR:
+    # ledger simulé en mémoire : vrai parcours de signature / soumission
+    try:
+        platform_wallet = Wallet.from_seed(settings.PLATFORM_SEED)
+    except Exception:
+        print("[XRPL_SIM] PLATFORM_SEED invalide, wallet éphémère")
+        platform_wallet = Wallet.create()
+    fund_drops = int(settings.XRPL_SIM_FUND_XRP * 1_000_000)
+    client = SimulatedLedger(
+        close_interval=settings.XRPL_SIM_CLOSE_INTERVAL_S,
+        latency_s=settings.XRPL_SIM_LATENCY_MS / 1000.0,
+        failure_rate=settings.XRPL_SIM_FAILURE_RATE,
+        lost_response_rate=settings.XRPL_SIM_LOST_RESPONSE_RATE,
+        auto_fund_drops=fund_drops,
+    )
+    client.fund(platform_wallet.address, fund_drops)
+    client.start()
 else:
     # vrai mode XRPL
-    client = JsonRpcClient(settings.XRPL_RPC_URL)
-    platform_wallet = Wallet.from_seed(settings.PLATFORM_SEED)
\ No newline at end of file
+    platform_wallet = Wallet.from_seed(settings.PLATFORM_SEED)
+    # pool websocket partagé (ouvert au premier appel), abonné aux
+    # fermetures de ledger et aux tx du compte plateforme
+    client = XRPLConnectionPool(
+        settings.XRPL_WS_URL,
+        size=settings.XRPL_WS_POOL_SIZE,
+        accounts=[platform_wallet.address],
+    )
\ No newline at end of file
@@ -0,0 +1,543 @@
+# xrpl_sim.py
+"""
+Simulateur de ledger XRPL en mémoire, pour les tests de charge hors ligne.
+
+XRPL_MOCK renvoie des dicts figés (Sequence aléatoire, finish/cancel
+toujours OK) : on ne peut pas mesurer le vrai parcours des escrows.
+SimulatedLedger rejoue un ledger avec état :
+  - comptes (solde en drops, Sequence, OwnerCount, réserve)
+  - objets Escrow (Amount, Destination, Condition, CancelAfter / FinishAfter)
+    indexés par (owner, Sequence de création)
+  - EscrowCreate / EscrowFinish / EscrowCancel / Payment (et AccountSet
+    sans effet, pour les Memo d'ancrage) avec les codes
+    rippled (tec* consomment fee + Sequence, tef / tem / tel non)
+  - fee minimum par type comme rippled : EscrowFinish avec Fulfillment =
+    base * (33 + taille / 16), sinon base (telINSUF_FEE_P en dessous)
+  - crypto-conditions PREIMAGE-SHA-256 encodées en DER exigées
+    (Condition / Fulfillment mal formés : temMALFORMED)
+  - signatures vérifiées, file terPRE_SEQ, LastLedgerSequence (tefMAX_LEDGER)
+  - fermeture de ledger périodique (ou manuelle avec close_interval=0) et
+    horloge décalable (advance_time) pour atteindre les CancelAfter
+  - latence par requête et injection de pannes : requête perdue avant
+    traitement (failure_rate) ou traitée mais réponse perdue
+    (lost_response_rate, le cas qui teste l'idempotence de l'outbox)
+
+Sous-ensemble de l'API rippled utilisé par le service : account_info,
+account_objects (type escrow, paginé par marker), fee, ledger, server_info,
+submit, tx. L'objet a la même forme qu'un JsonRpcClient (request()) et
+expose ledger_index / wait_validated comme le pool xrpl_async, donc
+TxPipeline, tx_cache et l'outbox l'utilisent tels quels. Activé par XRPL_SIMULATOR=true (avec XRPL_MOCK=false).
+"""
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from xrpl.core.binarycodec import decode, encode_for_signing
+from xrpl.core.keypairs import derive_classic_address, is_valid_message
+from xrpl.models.requests.request import Request
+from xrpl.models.response import Response, ResponseStatus, ResponseType
+
+RIPPLE_EPOCH = 946684800
+
+# préfixe DER des crypto-conditions PREIMAGE-SHA-256 (32 octets)
+_DER_CONDITION_PREFIX = "A0258020"
+_DER_CONDITION_SUFFIX = "810120"
+_DER_FULFILLMENT_PREFIX = "A0228020"
+
+
+class SimulatedNetworkError(ConnectionError):
+    pass
+
+
+@dataclass
+class _Account:
+    balance: int  # drops
+    sequence: int = 1
+    owner_count: int = 0
+
+
+@dataclass
+class _Escrow:
+    owner: str
+    sequence: int
+    destination: str
+    amount: int
+    condition: Optional[str]
+    cancel_after: Optional[int]
+    finish_after: Optional[int]
+    index: str = ""
+    previous_txn_id: str = ""
+
+
+@dataclass
+class _TxRecord:
+    tx_json: Dict[str, Any]
+    engine_result: str
+    ledger_index: Optional[int] = None  # posé à la fermeture du ledger
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+def _tx_hash(blob: str) -> str:
+    # SHA-512Half(préfixe "TXN\0" + blob), comme Transaction.get_hash()
+    return hashlib.sha512(bytes.fromhex("54584E00" + blob)).hexdigest()[:64].upper()
+
+
+def _escrow_index(owner: str, sequence: int) -> str:
+    return hashlib.sha512(f"escrow:{owner}:{sequence}".encode()).hexdigest()[:64].upper()
+
+
+def _is_der_condition(condition: str) -> bool:
+    c = condition.upper()
+    return (
+        len(c) == len(_DER_CONDITION_PREFIX) + 64 + len(_DER_CONDITION_SUFFIX)
+        and c.startswith(_DER_CONDITION_PREFIX)
+        and c.endswith(_DER_CONDITION_SUFFIX)
+    )
+
+
+def _fulfillment_preimage(fulfillment: str) -> Optional[bytes]:
+    """Préimage d'un fulfillment DER PREIMAGE-SHA-256 (32 octets), sinon None."""
+    f = fulfillment.upper()
+    if f.startswith(_DER_FULFILLMENT_PREFIX) and len(f) == len(_DER_FULFILLMENT_PREFIX) + 64:
+        return bytes.fromhex(f[len(_DER_FULFILLMENT_PREFIX):])
+    return None
+
+
+def _condition_of(preimage: bytes) -> str:
+    return _DER_CONDITION_PREFIX + hashlib.sha256(preimage).hexdigest().upper() + _DER_CONDITION_SUFFIX
+
+
+def minimum_fee(tx: Dict[str, Any], base_fee: int) -> int:
+    """Fee minimum d'une tx selon rippled (coût de vérification du fulfillment)."""
+    fulfillment = tx.get("Fulfillment")
+    if tx.get("TransactionType") == "EscrowFinish" and fulfillment:
+        return base_fee * (33 + (len(fulfillment) // 2) // 16)
+    return base_fee
+
+
+class SimulatedLedger:
+    def __init__(
+        self,
+        close_interval: float = 1.0,
+        latency_s: float = 0.0,
+        failure_rate: float = 0.0,
+        lost_response_rate: float = 0.0,
+        base_fee: int = 10,
+        reserve_base: int = 1_000_000,
+        reserve_inc: int = 200_000,
+        auto_fund_drops: int = 0,
+        verify_signatures: bool = True,
+        seed: Optional[int] = None,
+    ):
+        self.close_interval = close_interval
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self.lost_response_rate = lost_response_rate
+        self.base_fee = base_fee
+        self.reserve_base = reserve_base
+        self.reserve_inc = reserve_inc
+        # > 0 : un compte inconnu est créé à la volée avec ce solde
+        # (destinations ONG fictives des tests de charge)
+        self.auto_fund_drops = auto_fund_drops
+        self.verify_signatures = verify_signatures
+        self._rng = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._closed = threading.Condition(self._lock)
+
+        self.accounts: Dict[str, _Account] = {}
+        self.escrows: Dict[Tuple[str, int], _Escrow] = {}
+        self.txs: Dict[str, _TxRecord] = {}
+        self._open_txs: List[str] = []
+        # tx terPRE_SEQ en attente : (compte, Sequence) -> (hash, tx_json)
+        self._held: Dict[Tuple[str, int], Tuple[str, Dict[str, Any]]] = {}
+
+        # ledger_index = dernier ledger validé (même attribut que le pool)
+        self.ledger_index = 1
+        self._time_offset = 0.0
+        self.close_time = self.ripple_now()
+
+        self.stats: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Horloge / fermeture de ledger ----------
+
+    def ripple_now(self) -> int:
+        return int(time.time() + self._time_offset) - RIPPLE_EPOCH
+
+    def advance_time(self, seconds: float) -> None:
+        """Avance l'horloge du ledger (CancelAfter / FinishAfter)."""
+        with self._lock:
+            self._time_offset += seconds
+
+    def close_ledger(self) -> int:
+        with self._lock:
+            self.ledger_index += 1
+            self.close_time = self.ripple_now()
+            for tx_hash in self._open_txs:
+                self.txs[tx_hash].ledger_index = self.ledger_index
+            self._open_txs = []
+            # les tx en attente hors fenêtre ne passeront plus jamais
+            for key, (_, tx) in list(self._held.items()):
+                if tx.get("LastLedgerSequence", self.ledger_index + 1) <= self.ledger_index:
+                    del self._held[key]
+            self._closed.notify_all()
+            return self.ledger_index
+
+    def start(self) -> None:
+        if self._thread is not None or self.close_interval <= 0:
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(self.close_interval):
+                self.close_ledger()
+
+        self._thread = threading.Thread(target=_loop, name="xrpl-sim", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    # ---------- Comptes ----------
+
+    def fund(self, address: str, drops: int) -> None:
+        with self._lock:
+            acct = self.accounts.get(address)
+            if acct is None:
+                self.accounts[address] = _Account(balance=drops)
+            else:
+                acct.balance += drops
+
+    def _account(self, address: str) -> Optional[_Account]:
+        acct = self.accounts.get(address)
+        if acct is None and self.auto_fund_drops > 0:
+            acct = self.accounts[address] = _Account(balance=self.auto_fund_drops)
+        return acct
+
+    def _reserve(self, acct: _Account) -> int:
+        return self.reserve_base + self.reserve_inc * acct.owner_count
+
+    # ---------- Application des transactions ----------
+
+    def _preflight(self, tx: Dict[str, Any]) -> Optional[str]:
+        if self.verify_signatures:
+            pubkey = tx.get("SigningPubKey", "")
+            signature = tx.get("TxnSignature")
+            if not signature or derive_classic_address(pubkey) != tx["Account"]:
+                return "temBAD_SIGNATURE"
+            message = bytes.fromhex(encode_for_signing(tx))
+            if not is_valid_message(message, bytes.fromhex(signature), pubkey):
+                return "temBAD_SIGNATURE"
+        if tx.get("TransactionType") == "EscrowCreate" and "Condition" in tx:
+            if not _is_der_condition(tx["Condition"]):
+                return "temMALFORMED"
+        if tx.get("TransactionType") == "EscrowFinish":
+            # Condition et Fulfillment vont ensemble, fulfillment DER valide
+            if ("Condition" in tx) != ("Fulfillment" in tx):
+                return "temMALFORMED"
+            if "Fulfillment" in tx and _fulfillment_preimage(tx["Fulfillment"]) is None:
+                return "temMALFORMED"
+        if int(tx.get("Fee", 0)) < minimum_fee(tx, self.base_fee):
+            return "telINSUF_FEE_P"
+        if tx.get("LastLedgerSequence", self.ledger_index + 1) <= self.ledger_index:
+            return "tefMAX_LEDGER"
+        return None
+
+    def _do_escrow_create(self, acct: _Account, tx: Dict[str, Any], tx_hash: str) -> str:
+        amount = int(tx["Amount"])
+        cancel_after = tx.get("CancelAfter")
+        finish_after = tx.get("FinishAfter")
+        if cancel_after is None and finish_after is None and "Condition" not in tx:
+            return "temMALFORMED"
+        if cancel_after is not None and finish_after is not None and cancel_after <= finish_after:
+            return "temBAD_EXPIRATION"
+        if cancel_after is not None and cancel_after <= self.close_time:
+            return "tecNO_PERMISSION"
+        if self._account(tx["Destination"]) is None:
+            return "tecNO_DST"
+        if acct.balance - amount < self._reserve(acct) + self.reserve_inc:
+            return "tecUNFUNDED"
+
+        key = (tx["Account"], tx["Sequence"])
+        self.escrows[key] = _Escrow(
+            owner=tx["Account"],
+            sequence=tx["Sequence"],
+            destination=tx["Destination"],
+            amount=amount,
+            condition=tx.get("Condition"),
+            cancel_after=cancel_after,
+            finish_after=finish_after,
+            index=_escrow_index(*key),
+            previous_txn_id=tx_hash,
+        )
+        acct.balance -= amount
+        acct.owner_count += 1
+        return "tesSUCCESS"
+
+    def _do_escrow_finish(self, tx: Dict[str, Any]) -> str:
+        escrow = self.escrows.get((tx["Owner"], tx["OfferSequence"]))
+        if escrow is None:
+            return "tecNO_TARGET"
+        if escrow.finish_after is not None and self.close_time <= escrow.finish_after:
+            return "tecNO_PERMISSION"
+        if escrow.cancel_after is not None and self.close_time >= escrow.cancel_after:
+            return "tecNO_PERMISSION"
+        if escrow.condition is not None:
+            fulfillment = tx.get("Fulfillment")
+            if not fulfillment or tx["Condition"].upper() != escrow.condition.upper():
+                return "tecCRYPTOCONDITION_ERROR"
+            if _condition_of(_fulfillment_preimage(fulfillment)) != escrow.condition.upper():
+                return "tecCRYPTOCONDITION_ERROR"
+
+        self._account(escrow.destination).balance += escrow.amount
+        self._release_escrow(escrow)
+        return "tesSUCCESS"
+
+    def _do_escrow_cancel(self, tx: Dict[str, Any]) -> str:
+        escrow = self.escrows.get((tx["Owner"], tx["OfferSequence"]))
+        if escrow is None:
+            return "tecNO_TARGET"
+        if escrow.cancel_after is None or self.close_time < escrow.cancel_after:
+            return "tecNO_PERMISSION"
+        self.accounts[escrow.owner].balance += escrow.amount
+        self._release_escrow(escrow)
+        return "tesSUCCESS"
+
+    def _release_escrow(self, escrow: _Escrow) -> None:
+        del self.escrows[(escrow.owner, escrow.sequence)]
+        self.accounts[escrow.owner].owner_count -= 1
+
+    def _do_payment(self, acct: _Account, tx: Dict[str, Any]) -> str:
+        amount = tx["Amount"]
+        if not isinstance(amount, str):
+            return "temBAD_CURRENCY"  # XRP seulement
+        amount = int(amount)
+        if acct.balance - amount < self._reserve(acct):
+            return "tecUNFUNDED_PAYMENT"
+        dest = self._account(tx["Destination"])
+        if dest is None:
+            if amount < self.reserve_base:
+                return "tecNO_DST_INSUF_XRP"
+            dest = self.accounts[tx["Destination"]] = _Account(balance=0)
+        acct.balance -= amount
+        dest.balance += amount
+        return "tesSUCCESS"
+
+    def _apply(self, tx_hash: str, tx: Dict[str, Any]) -> str:
+        """Applique une tx dont la Sequence est la bonne. Appelé sous verrou."""
+        acct = self.accounts[tx["Account"]]
+        fee = int(tx["Fee"])
+        if acct.balance < fee:
+            return "terINSUF_FEE_B"
+
+        kind = tx["TransactionType"]
+        if kind == "EscrowCreate":
+            result = self._do_escrow_create(acct, tx, tx_hash)
+        elif kind == "EscrowFinish":
+            result = self._do_escrow_finish(tx)
+        elif kind == "EscrowCancel":
+            result = self._do_escrow_cancel(tx)
+        elif kind == "Payment":
+            result = self._do_payment(acct, tx)
+        elif kind == "AccountSet":
+            # flags non simulés : sert de porteur de Memo (ancrage)
+            result = "tesSUCCESS"
+        else:
+            result = "temUNKNOWN"
+
+        if result.startswith("tem"):
+            return result
+        # tes / tec : fee payé, Sequence consommée, tx incluse au prochain ledger
+        acct.balance -= fee
+        acct.sequence += 1
+        self.txs[tx_hash] = _TxRecord(
+            tx_json={**tx, "hash": tx_hash},
+            engine_result=result,
+            meta={"TransactionResult": result},
+        )
+        self._open_txs.append(tx_hash)
+        return result
+
+    def _submit(self, blob: str) -> Dict[str, Any]:
+        tx = decode(blob)
+        tx_hash = _tx_hash(blob)
+        base = {"tx_blob": blob, "tx_json": {**tx, "hash": tx_hash}}
+
+        if tx_hash in self.txs:
+            # re-soumission d'un blob déjà appliqué
+            return {**base, "engine_result": "tefALREADY"}
+        error = self._preflight(tx)
+        if error is not None:
+            return {**base, "engine_result": error}
+
+        acct = self._account(tx["Account"])
+        if acct is None:
+            return {**base, "engine_result": "terNO_ACCOUNT"}
+        if tx["Sequence"] < acct.sequence:
+            return {**base, "engine_result": "tefPAST_SEQ"}
+        if tx["Sequence"] > acct.sequence:
+            self._held[(tx["Account"], tx["Sequence"])] = (tx_hash, tx)
+            return {**base, "engine_result": "terPRE_SEQ"}
+
+        result = self._apply(tx_hash, tx)
+        # la Sequence suivante a pu arriver avant celle-ci
+        while (tx["Account"], acct.sequence) in self._held:
+            held_hash, held_tx = self._held.pop((tx["Account"], acct.sequence))
+            if self._apply(held_hash, held_tx).startswith("tem"):
+                break
+        return {**base, "engine_result": result}
+
+    # ---------- API rippled ----------
+
+    def _escrow_object(self, e: _Escrow) -> Dict[str, Any]:
+        obj = {
+            "LedgerEntryType": "Escrow",
+            "Account": e.owner,
+            "Destination": e.destination,
+            "Amount": str(e.amount),
+            "Sequence": e.sequence,
+            "PreviousTxnID": e.previous_txn_id,
+            "index": e.index,
+        }
+        if e.condition is not None:
+            obj["Condition"] = e.condition
+        if e.cancel_after is not None:
+            obj["CancelAfter"] = e.cancel_after
+        if e.finish_after is not None:
+            obj["FinishAfter"] = e.finish_after
+        return obj
+
+    def _account_objects(self, req: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        account = req["account"]
+        if account not in self.accounts:
+            return False, {"error": "actNotFound"}
+        if req.get("type") not in (None, "escrow"):
+            return True, {"account": account, "account_objects": [], "ledger_index": self.ledger_index}
+        # marker = index de l'objet où reprendre (ordre stable par index)
+        objs = sorted(
+            (e for (owner, _), e in self.escrows.items() if owner == account),
+            key=lambda e: e.index,
+        )
+        marker = req.get("marker")
+        if marker:
+            objs = [e for e in objs if e.index >= marker]
+        limit = int(req.get("limit") or 200)
+        page, rest = objs[:limit], objs[limit:]
+        result = {
+            "account": account,
+            "account_objects": [self._escrow_object(e) for e in page],
+            "ledger_index": self.ledger_index,
+            "validated": True,
+        }
+        if rest:
+            result["marker"] = rest[0].index
+        return True, result
+
+    def _handle(self, req: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        method = req["method"]
+        if method == "account_info":
+            acct = self.accounts.get(req["account"])
+            if acct is None:
+                return False, {"error": "actNotFound"}
+            return True, {
+                "account_data": {
+                    "Account": req["account"],
+                    "Balance": str(acct.balance),
+                    "Sequence": acct.sequence,
+                    "OwnerCount": acct.owner_count,
+                },
+                "ledger_current_index": self.ledger_index + 1,
+            }
+        if method == "account_objects":
+            return self._account_objects(req)
+        if method == "fee":
+            return True, {
+                "current_ledger_size": str(len(self._open_txs)),
+                "current_queue_size": str(len(self._held)),
+                "drops": {
+                    "base_fee": str(self.base_fee),
+                    "median_fee": str(self.base_fee * 50),
+                    "minimum_fee": str(self.base_fee),
+                    "open_ledger_fee": str(self.base_fee),
+                },
+                "ledger_current_index": self.ledger_index + 1,
+            }
+        if method == "ledger":
+            current = req.get("ledger_index") == "current"
+            return True, {
+                "ledger_index": self.ledger_index + (1 if current else 0),
+                "validated": not current,
+            }
+        if method == "server_info":
+            return True, {
+                "info": {
+                    "build_version": "simulated",
+                    "validated_ledger": {
+                        "seq": self.ledger_index,
+                        "base_fee_xrp": self.base_fee / 1_000_000,
+                        "reserve_base_xrp": self.reserve_base / 1_000_000,
+                        "reserve_inc_xrp": self.reserve_inc / 1_000_000,
+                    },
+                }
+            }
+        if method == "submit":
+            return True, self._submit(req["tx_blob"])
+        if method == "tx":
+            record = self.txs.get(req["transaction"])
+            if record is None:
+                return False, {"error": "txnNotFound"}
+            validated = record.ledger_index is not None
+            result = {**record.tx_json, "validated": validated}
+            if validated:
+                result["ledger_index"] = record.ledger_index
+                result["meta"] = record.meta
+            return True, result
+        return False, {"error": "unknownCmd"}
+
+    def request(self, request: Request) -> Response:
+        """Même forme que JsonRpcClient.request."""
+        method = request.method.value
+        self.stats[method] = self.stats.get(method, 0) + 1
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise SimulatedNetworkError(f"simulated failure on {method}")
+
+        req = request.to_dict()
+        with self._lock:
+            ok, result = self._handle(req)
+
+        if self.lost_response_rate and self._rng.random() < self.lost_response_rate:
+            raise SimulatedNetworkError(f"simulated lost response on {method}")
+        return Response(
+            status=ResponseStatus.SUCCESS if ok else ResponseStatus.ERROR,
+            result=result,
+            type=ResponseType.RESPONSE,
+        )
+
+    def wait_validated(
+        self, tx_hash: str, last_ledger: int, account: Optional[str] = None
+    ) -> Tuple[str, dict]:
+        """Attend l'inclusion de tx_hash dans un ledger fermé (sans polling)."""
+        with self._closed:
+            while True:
+                record = self.txs.get(tx_hash)
+                if record is not None and record.ledger_index is not None:
+                    return record.engine_result, {
+                        **record.tx_json,
+                        "validated": True,
+                        "ledger_index": record.ledger_index,
+                        "meta": record.meta,
+                    }
+                if self.ledger_index > last_ledger:
+                    return "expired", {}
+                self._closed.wait()
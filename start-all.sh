@@ -21,6 +21,8 @@ if [ ! -d "venv" ]; then
 fi
 source venv/bin/activate
 pip install -q -r requirements.txt
+# entraînement uniquement si aucun checkpoint n'est enregistré
+python train_model.py train --if-missing
 python governance-api.py &
 GOVERNANCE_PID=$!
 echo -e "${GREEN}✅ Governance AI démarré (PID: $GOVERNANCE_PID)${NC}"